@@ -0,0 +1,193 @@
+#-*- coding: utf-8 -*-
+import bisect
+import sys
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+from token_table import MISSING
+
+# flags of an aligned mention, or-ed together
+START_OFF = 1  # the mention does not start where its first token starts
+END_OFF = 2  # the mention does not end where its last token ends
+NO_TOKEN = 4  # the mention covers no token
+CROSS_SEGMENT = 8  # the first and last tokens are in different segments
+FLAG_NAMES = [(START_OFF, 'start off token boundary'), (END_OFF, 'end off token boundary'),
+              (NO_TOKEN, 'no token'), (CROSS_SEGMENT, 'crosses segments')]
+
+
+def describe(flags):
+    """Readable form of the flags of a mention."""
+    return ', '.join(name for flag, name in FLAG_NAMES if flags & flag) or 'aligned'
+
+
+def _column(values):
+    """Token offsets with MISSING for None, as given by tokenized() or a TokenTable."""
+    return [MISSING if value is None else value for value in values]
+
+
+def _align_numpy(token_onsets, token_offsets, starts, ends):
+    if hasattr(token_onsets, 'typecode'):  # array.array columns of a TokenTable, viewed without a copy
+        onsets = numpy.frombuffer(token_onsets, dtype=numpy.int32)
+        offsets = numpy.frombuffer(token_offsets, dtype=numpy.int32)
+    else:
+        onsets = numpy.array(_column(token_onsets), dtype=numpy.int64)
+        offsets = numpy.array(_column(token_offsets), dtype=numpy.int64)
+    positions = numpy.flatnonzero((onsets != MISSING) & (offsets != MISSING))
+    positions = positions[numpy.argsort(onsets[positions], kind='mergesort')]
+    onsets = onsets[positions]
+    offsets = offsets[positions]
+    starts = numpy.asarray(starts, dtype=numpy.int64)
+    ends = numpy.asarray(ends, dtype=numpy.int64)
+    first = numpy.searchsorted(offsets, starts, 'left')  # first token ending at or after the mention start
+    last = numpy.searchsorted(onsets, ends, 'right') - 1  # last token starting at or before the mention end
+    empty = first > last
+    flags = numpy.where(empty, NO_TOKEN, 0).astype(numpy.int8)
+    if len(positions):
+        first_ = numpy.where(empty, 0, first)
+        last_ = numpy.where(empty, 0, last)
+        flags |= numpy.where(~empty & (onsets[first_] != starts), START_OFF, 0).astype(numpy.int8)
+        flags |= numpy.where(~empty & (offsets[last_] != ends), END_OFF, 0).astype(numpy.int8)
+    first[empty] = -1
+    last[empty] = -1
+    return positions, first, last, flags
+
+
+def _align_bisect(token_onsets, token_offsets, starts, ends):
+    onsets = _column(token_onsets)
+    offsets = _column(token_offsets)
+    positions = [k for k in range(len(onsets)) if onsets[k] != MISSING and offsets[k] != MISSING]
+    positions.sort(key=lambda k: onsets[k])
+    onsets = [onsets[k] for k in positions]
+    offsets = [offsets[k] for k in positions]
+    first = []
+    last = []
+    flags = []
+    for start_char, end_char in zip(starts, ends):
+        f = bisect.bisect_left(offsets, start_char)
+        l = bisect.bisect_right(onsets, end_char) - 1
+        if f > l:
+            first.append(-1)
+            last.append(-1)
+            flags.append(NO_TOKEN)
+            continue
+        first.append(f)
+        last.append(l)
+        flags.append((START_OFF if onsets[f] != start_char else 0) | (END_OFF if offsets[l] != end_char else 0))
+    return positions, first, last, flags
+
+
+def align_spans(token_onsets, token_offsets, starts, ends):
+    """Align character spans with tokens, all spans of a document in one batch.
+
+    Tokens of a document do not overlap, so once ordered by onset their
+    offsets are ordered too, and the tokens of every span are found with two
+    binary searches: numpy.searchsorted over the whole batch when numpy is
+    installed, bisect span by span otherwise. A token belongs to a span when
+    their character spans overlap, both ends being inclusive as in LTF/LAF.
+
+    Inputs
+    ------
+    token_onsets : sequence of int
+        Character onsets of tokens, None or MISSING when missing, e.g. from
+        tokenized() or TokenTable.onsets.
+    token_offsets : sequence of int
+        Character offsets of tokens, same.
+    starts : sequence of int
+        start_char of every span.
+    ends : sequence of int
+        end_char of every span.
+
+    Outputs
+    -------
+    positions : sequence of int
+        Indices of the tokens with both offsets, ordered by onset.
+    first : sequence of int
+        Index in positions of the first token of every span, -1 if none.
+    last : sequence of int
+        Index in positions of the last token of every span, -1 if none.
+    flags : sequence of int
+        START_OFF, END_OFF and NO_TOKEN of every span.
+    """
+    if numpy is not None:
+        return _align_numpy(token_onsets, token_offsets, starts, ends)
+    return _align_bisect(token_onsets, token_offsets, starts, ends)
+
+
+def align_mentions(table, mentions):
+    """Token span of every mention of a document.
+
+    Inputs
+    ------
+    table : token_table.TokenTable
+        Tokens of the document, e.g. LTFDocument.token_table().
+    mentions : list
+        Mentions of the form (entity_id, type, extent, start_char, end_char, ...),
+        e.g. LAFDocument.mentions() or streaming.Mention records.
+
+    Outputs
+    -------
+    first_tokens : list of int
+        Index in table of the first token of every mention, -1 if none.
+    last_tokens : list of int
+        Index in table of the last token of every mention, -1 if none.
+    flags : list of int
+        START_OFF, END_OFF, NO_TOKEN and CROSS_SEGMENT of every mention.
+    """
+    positions, first, last, flags = align_spans(table.onsets, table.offsets,
+                                                [int(mention[3]) for mention in mentions],
+                                                [int(mention[4]) for mention in mentions])
+    first_tokens = [positions[f] if f >= 0 else -1 for f in first]
+    last_tokens = [positions[l] if l >= 0 else -1 for l in last]
+    flags = [int(flag) for flag in flags]
+    for i in range(len(flags)):
+        if first_tokens[i] >= 0 and table.segment[first_tokens[i]] != table.segment[last_tokens[i]]:
+            flags[i] |= CROSS_SEGMENT
+    return [int(k) for k in first_tokens], [int(k) for k in last_tokens], flags
+
+
+def anchor_mismatches(table, mentions, first_tokens, last_tokens, flags):
+    """Token anchored mentions whose offsets cover other tokens than their anchors.
+
+    Inputs
+    ------
+    table : token_table.TokenTable
+    mentions : list of streaming.Mention
+        Mentions with start_token and end_token, the others are skipped.
+    first_tokens, last_tokens, flags :
+        align_mentions(table, mentions), mentions with flags set are skipped.
+
+    Outputs
+    -------
+    problems : list of tuples
+        (entity_id, problem).
+    """
+    problems = []
+    for mention, first, last, flag in zip(mentions, first_tokens, last_tokens, flags):
+        if flag or (mention.start_token is None and mention.end_token is None):
+            continue
+        if (table.token_id(first), table.token_id(last)) != (mention.start_token, mention.end_token):
+            problems.append((mention.entity_id, 'offsets cover %s to %s, anchored on %s to %s'
+                             % (table.token_id(first), table.token_id(last), mention.start_token,
+                                mention.end_token)))
+    return problems
+
+if __name__ == '__main__':
+    if len(sys.argv) != 3:
+        print 'USAGE: python align.py <ltf file> <laf file>'
+        print 'this script will list the mentions of a laf file that are off the token boundaries of its ltf file, or whose start_token/end_token do not match their offsets'
+    else:
+        from streaming import StreamingLAFDocument, StreamingLTFDocument
+        table = StreamingLTFDocument(sys.argv[1]).token_table()
+        mentions = StreamingLAFDocument(sys.argv[2]).mentions()
+        first_tokens, last_tokens, flags = align_mentions(table, mentions)
+        for mention, flag in zip(mentions, flags):
+            if flag:
+                print mention.entity_id + ': ' + describe(flag)
+        mismatches = anchor_mismatches(table, mentions, first_tokens, last_tokens, flags)
+        for entity_id, problem in mismatches:
+            print entity_id + ': ' + problem
+        print '%d mentions, %d off token boundaries, %d off their anchors' % (
+            len(mentions), sum(1 for flag in flags if flag), len(mismatches))
@@ -0,0 +1,171 @@
+#-*- coding: utf-8 -*-
+import json
+import math
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+from cli_options import pop_flag, pop_option
+from instrument import setup_logging
+from synth_corpus import make_corpus
+import trans_hau
+import transfer_hausa
+import transfer_yoruba
+
+# documents x segments per document x tokens per segment, growing segments
+# per document shows behaviour that is not linear in the document size
+SCALES = '10x20x20,10x80x20,10x320x20,40x80x20'
+
+
+def parse_scales(text):
+    """'10x20x20,10x80x20' -> [(10, 20, 20), (10, 80, 20)]"""
+    return [tuple(int(value) for value in scale.split('x')) for scale in text.split(',') if scale]
+
+
+def scale_name(scale):
+    return '%dx%dx%d' % scale
+
+
+def run_trans_hau(corpus, outdir, stream):
+    for ltf, laf in corpus:
+        trans_hau.split_pair(ltf, laf, outdir, outdir, stream)
+
+
+def run_transfer_yoruba(corpus, outdir, stream):
+    for ltf, laf in corpus:
+        transfer_yoruba.split_pair(ltf, laf, outdir, outdir, stream)
+
+
+def run_transfer_hausa(corpus, outdir, stream):
+    for ltf, laf in corpus:
+        transfer_hausa.split_document(ltf, 'ltf', outdir)
+
+PATHS = [('trans_hau', run_trans_hau), ('transfer_yoruba', run_transfer_yoruba),
+         ('transfer_hausa', run_transfer_hausa)]
+
+
+def corpus_dir(workdir, scale, density, seed):
+    """Generate the corpus of a scale once, later runs reuse it."""
+    path = os.path.join(workdir, 'corpus-%s-%g-%d' % (scale_name(scale), density, seed))
+    counts_path = os.path.join(path, 'counts.json')
+    if not os.path.exists(counts_path):
+        documents, segments, tokens = scale
+        counts = make_corpus(path, documents, segments, tokens, density, seed)
+        with open(counts_path, 'w') as f:
+            json.dump(counts, f)
+    with open(counts_path) as f:
+        counts = json.load(f)
+    pairs = []
+    for f in sorted(os.listdir(path)):
+        if f.endswith('.ltf.xml'):
+            pairs.append((os.path.join(path, f), os.path.join(path, f.replace('.ltf.', '.laf.'))))
+    return pairs, counts
+
+
+def time_path(func, corpus, workdir, stream, repeat):
+    """Best wall time of repeat runs, each one writing into a fresh directory."""
+    best = None
+    for r in range(repeat):
+        outdir = tempfile.mkdtemp(dir=workdir)
+        try:
+            start = time.time()
+            func(corpus, outdir, stream)
+            seconds = time.time() - start
+        finally:
+            shutil.rmtree(outdir)
+        best = seconds if best is None else min(best, seconds)
+    return best
+
+
+def run_benchmark(scales, workdir, paths=None, density=0.1, seed=0, stream=False, repeat=3):
+    """Time every path on the corpus of every scale.
+
+    Outputs
+    -------
+    report : dict
+        path -> scale name -> seconds, counts and per second rates of
+        documents, segments and tokens.
+    """
+    report = {}
+    for scale in scales:
+        corpus, counts = corpus_dir(workdir, scale, density, seed)
+        for name, func in PATHS:
+            if paths is not None and name not in paths:
+                continue
+            seconds = time_path(func, corpus, workdir, stream, repeat)
+            entry = {'seconds': seconds, 'counts': counts}
+            entry['per_second'] = dict((key, counts[key] / seconds if seconds > 0 else 0.0)
+                                       for key in ('documents', 'segments', 'tokens'))
+            report.setdefault(name, {})[scale_name(scale)] = entry
+    return report
+
+
+def scaling_exponents(results, scales):
+    """Slope of log(seconds) against log(segments) between consecutive scales.
+
+    1 means the path is linear in the corpus size, 2 quadratic. Consecutive
+    scales with the same number of segments are skipped.
+    """
+    exponents = []
+    for a, b in zip(scales, scales[1:]):
+        ra = results.get(scale_name(a))
+        rb = results.get(scale_name(b))
+        if ra is None or rb is None:
+            continue
+        na = ra['counts']['segments']
+        nb = rb['counts']['segments']
+        if na == nb or ra['seconds'] <= 0 or rb['seconds'] <= 0:
+            continue
+        exponents.append((scale_name(a), scale_name(b),
+                          math.log(rb['seconds'] / ra['seconds']) / math.log(float(nb) / na)))
+    return exponents
+
+
+def print_report(report, scales, baseline=None):
+    for name, func in PATHS:
+        if name not in report:
+            continue
+        print name
+        for scale in scales:
+            entry = report[name].get(scale_name(scale))
+            if entry is None:
+                continue
+            line = '  %-12s %9.3fs %10.1f docs/s %10.1f segs/s %11.1f tokens/s' % (
+                scale_name(scale), entry['seconds'], entry['per_second']['documents'],
+                entry['per_second']['segments'], entry['per_second']['tokens'])
+            old = (baseline or {}).get(name, {}).get(scale_name(scale))
+            if old is not None and entry['seconds'] > 0:
+                line += '   x%.2f vs baseline' % (old['seconds'] / entry['seconds'])
+            print line
+        for a, b, exponent in scaling_exponents(report[name], scales):
+            print '  scaling %s -> %s: time ~ segments^%.2f' % (a, b, exponent)
+
+if __name__ == '__main__':
+    scales = parse_scales(pop_option(sys.argv, '--scales', SCALES))
+    paths = pop_option(sys.argv, '--paths')  # comma separated, all of them by default
+    density = pop_option(sys.argv, '--density', 0.1, float)
+    seed = pop_option(sys.argv, '--seed', 0, int)
+    repeat = pop_option(sys.argv, '--repeat', 3, int)
+    stream = pop_flag(sys.argv, '--stream')
+    baseline_path = pop_option(sys.argv, '--baseline')  # compare with a report saved by --save
+    save_path = pop_option(sys.argv, '--save')
+    if len(sys.argv) != 2:
+        print 'USAGE: python benchmark.py [--scales DxSxT,...] [--paths trans_hau,transfer_yoruba,transfer_hausa] [--density p] [--seed N] [--repeat N] [--stream] [--baseline file] [--save file] <work dir>'
+        print 'this script will time the split scripts on synthetic corpora of growing size, generated once in the work dir'
+    else:
+        setup_logging('error')  # the split functions log skipped annotations and segments
+        workdir = sys.argv[1]
+        if not os.path.isdir(workdir):
+            os.makedirs(workdir)
+        report = run_benchmark(scales, workdir, paths and paths.split(','), density, seed, stream, repeat)
+        baseline = None
+        if baseline_path is not None:
+            with open(baseline_path) as f:
+                baseline = json.load(f)
+        print_report(report, scales, baseline)
+        if save_path is not None:
+            with open(save_path, 'w') as f:
+                json.dump(report, f, indent=1, sort_keys=True, separators=(',', ': '))
+                f.write('\n')
@@ -0,0 +1,49 @@
+#-*- coding: utf-8 -*-
+
+
+def pop_flag(argv, flag):
+    """Remove a boolean flag such as --stream from argv.
+
+    Inputs
+    ------
+    argv : list of str
+        Command line, usually sys.argv. Modified in place.
+    flag : str
+        Flag to look for.
+
+    Outputs
+    -------
+    present : bool
+        Whether the flag was given.
+    """
+    present = flag in argv
+    while flag in argv:
+        argv.remove(flag)
+    return present
+
+
+def pop_option(argv, option, default=None, type=str):
+    """Remove an `--option value` pair from argv and return the value.
+
+    The positional arguments left in argv keep their order, so the split
+    scripts can go on checking len(sys.argv) as before.
+
+    Inputs
+    ------
+    argv : list of str
+        Command line, usually sys.argv. Modified in place.
+    option : str
+        Option name, e.g. '--workers'.
+    default : optional
+        Value returned when the option is absent.
+    type : callable, optional
+        Conversion applied to the value.
+    """
+    value = default
+    while option in argv:
+        i = argv.index(option)
+        if i + 1 >= len(argv):
+            raise ValueError('%s needs a value' % option)
+        value = type(argv[i + 1])
+        del argv[i:i + 2]
+    return value
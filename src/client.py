@@ -0,0 +1,99 @@
+#-*- coding: utf-8 -*-
+import json
+import os
+import socket
+import sys
+
+from cli_options import pop_flag, pop_option
+from instrument import log_report, setup_logging, write_report
+from parallel import report_failures
+from split_tools import SPLIT_TOOLS
+
+
+def send_message(sock_file, message):
+    """Write one message of the protocol: a JSON object on a line."""
+    sock_file.write(json.dumps(message) + '\n')
+    sock_file.flush()
+
+
+def read_message(sock_file):
+    """Read one message of the protocol, None at the end of the stream."""
+    line = sock_file.readline()
+    if not line:
+        return None
+    return json.loads(line)
+
+
+def request(socket_path, message):
+    """Send a request to a running daemon and wait for its reply."""
+    sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    sock.connect(socket_path)
+    try:
+        sock_file = sock.makefile('rwb')
+        send_message(sock_file, message)
+        reply = read_message(sock_file)
+    finally:
+        sock.close()
+    if reply is None:
+        raise IOError('the daemon at %s closed the connection' % socket_path)
+    return reply
+
+
+def run(socket_path, tool, args, options=None):
+    """Have a daemon run one tool, paths made absolute since the daemon has its own working dir.
+
+    Outputs
+    -------
+    reply : dict
+        See daemon.split_request and daemon.match_request, with ok, seconds
+        and error when the request failed.
+    """
+    args = [os.path.abspath(arg) + ('/' if arg.endswith('/') else '') for arg in args]
+    return request(socket_path, {'tool': tool, 'args': args, 'options': options or {}})
+
+if __name__ == '__main__':
+    stream = pop_flag(sys.argv, '--stream')
+    manifest_path = pop_option(sys.argv, '--manifest')
+    stats_path = pop_option(sys.argv, '--stats')
+    mode = pop_option(sys.argv, '--mode', 'copy')  # match_xml_yoruba options
+    threads = pop_option(sys.argv, '--threads', 8, int)
+    match = pop_option(sys.argv, '--match', 'id')
+    unsupported = [arg for arg in sys.argv[1:] if arg.startswith('--')]  # options of the scripts the daemon lacks
+    if unsupported or len(sys.argv) < 3:
+        if unsupported:
+            print 'unsupported option %s, run the script itself for it' % ', '.join(unsupported)
+        print 'USAGE: python client.py [--stream] [--manifest file] [--stats file] <socket file> <trans_hau|trans_tur|trans_ben> <ltf dir> <laf dir> <ltf_split dir> <laf_split dir>'
+        print '       python client.py [--stream] [--manifest file] [--stats file] <socket file> transfer_yoruba <input dir> <ltf_split dir> <laf_split dir>'
+        print '       python client.py [--mode m] [--threads N] [--match m] <socket file> match_xml_yoruba <input file><ltf_split dir><ltf_match dir><laf_split dir><laf_match dir>'
+        print '       python client.py <socket file> ping|shutdown'
+        print 'this script will run a split or match job in a daemon started by daemon.py, as the script itself would'
+        print 'split jobs run on the workers of the daemon and only take the options above, not --state, --split-large, --pair-cache, --shard-size or --pipeline'
+    else:
+        socket_path = sys.argv[1]
+        tool = sys.argv[2]
+        options = {'stream': stream, 'mode': mode, 'threads': threads, 'match': match,
+                   'manifest': manifest_path and os.path.abspath(manifest_path)}  # written by the daemon
+        reply = run(socket_path, tool, sys.argv[3:], options)
+        if not reply['ok']:
+            sys.stderr.write(reply['error'])
+            sys.exit(2)
+        if tool in SPLIT_TOOLS:
+            setup_logging('info')
+            for f in reply['orphans']:
+                print 'no matching file for ' + f
+            log_report(reply['report'])
+            if stats_path is not None:
+                write_report(reply['report'], stats_path)
+            if report_failures(reply['failures']):
+                sys.exit(1)
+        elif tool == 'match_xml_yoruba':
+            summary = reply['summary']
+            for src in summary['missing']:
+                print 'missing ' + src
+            print '%d segments matched, %d unmatched, %d files placed, %d missing, %d failed in %.3fs' % (
+                sum(summary['matched'].values()), len(summary['unmatched']), sum(summary['placed'].values()),
+                len(summary['missing']), len(summary['failed']), reply['seconds'])
+            if summary['failed']:
+                sys.exit(1)
+        else:
+            print ', '.join('%s %s' % (key, reply[key]) for key in sorted(reply))
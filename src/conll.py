@@ -0,0 +1,158 @@
+#-*- coding: utf-8 -*-
+import os
+import sys
+
+from align import align_spans
+from cli_options import pop_flag, pop_option
+from discovery import LTF_SUFFIX, discover_pairs
+from parallel import build_manifest, report_failures, run_jobs, write_manifest
+from streaming import StreamingLAFDocument, StreamingLTFDocument
+from trans_hau import LAFDocument, LTFDocument, load_doc
+
+
+def bio_labels(token_onsets, token_offsets, mentions):
+    """Label tokens with the BIO scheme from character offsets.
+
+    A token belongs to a mention when their character spans overlap, both
+    ends being inclusive as in LTF/LAF. The tokens of all the mentions are
+    found in one batch, see align.align_spans. When mentions overlap, the
+    one starting first (the longest on a tie) keeps its tokens and the other
+    is dropped.
+
+    Inputs
+    ------
+    token_onsets : sequence of int
+        Character onsets of tokens, None when missing.
+    token_offsets : sequence of int
+        Character offsets of tokens, None when missing.
+    mentions : list
+        Mentions of the form (entity_id, type, extent, start_char, end_char),
+        e.g. LAFDocument.mentions() or streaming.Mention records.
+
+    Outputs
+    -------
+    labels : list of str
+        'O', 'B-<type>' or 'I-<type>' for every token.
+    unaligned : list of str
+        Ids of the mentions covering no token or overlapping a kept mention.
+    """
+    labels = ['O'] * len(token_onsets)
+    starts = [int(mention[3]) for mention in mentions]
+    ends = [int(mention[4]) for mention in mentions]
+    positions, first, last, flags = align_spans(token_onsets, token_offsets, starts, ends)
+    unaligned = []
+    for i in sorted(range(len(mentions)), key=lambda i: (starts[i], -ends[i])):
+        covered = positions[first[i]:last[i] + 1] if first[i] >= 0 else []
+        if not len(covered) or any(labels[k] != 'O' for k in covered):
+            unaligned.append(mentions[i][0])
+            continue
+        labels[covered[0]] = 'B-' + mentions[i][1]
+        for k in covered[1:]:
+            labels[k] = 'I-' + mentions[i][1]
+    return labels, unaligned
+
+
+def tagged_sentences(ltf_doc, mentions):
+    """Align the mentions of a document with its tokens, one sentence per segment.
+
+    Inputs
+    ------
+    ltf_doc : LTFDocument or streaming.StreamingLTFDocument
+        Tokenized document.
+    mentions : list
+        Mentions of the document, see bio_labels.
+
+    Outputs
+    -------
+    sentences : list of lists
+        For every segment, the (token, token_onset, token_offset, label) of
+        its tokens.
+    unaligned : list of str
+        See bio_labels.
+    """
+    table = ltf_doc.token_table()
+    tokens, token_ids, token_onsets, token_offsets = table.tokenized()
+    labels, unaligned = bio_labels(token_onsets, token_offsets, mentions)
+    sentences = []
+    for s in range(len(table.seg_ids)):
+        first, last = table.segment_range(s)
+        sentences.append(zip(tokens[first:last], token_onsets[first:last], token_offsets[first:last],
+                             labels[first:last]))
+    return sentences, unaligned
+
+
+def bio_bytes(doc_id, sentences):
+    """Serialize sentences in the ne-tagger input format.
+
+    One token per line, 'token doc_id:onset-offset label', and an empty line
+    after every sentence. Whitespace inside a token would shift the columns,
+    it is replaced by '_'.
+    """
+    lines = []
+    for sentence in sentences:
+        if not sentence:
+            continue
+        for token, onset, offset, label in sentence:
+            token = u'_'.join(token.split()) or u'_'
+            lines.append(u'%s %s:%s-%s %s\n' % (token, doc_id, onset, offset, label))
+        lines.append(u'\n')
+    return u''.join(lines).encode('utf-8')
+
+
+def emit_pair(ltf_path, laf_path, bio_path, stream=False):
+    """Write the ne-tagger input of one ltf/laf document pair.
+
+    Inputs
+    ------
+    ltf_path : str
+        LTF document.
+    laf_path : str
+        LAF document of ltf_path.
+    bio_path : str
+        Output file.
+    stream : bool, optional
+        Read both documents with iterparse instead of loading whole trees.
+
+    Outputs
+    -------
+    summary : dict
+        doc_id, bio_file, the number of sentences, tokens and mentions, and
+        the ids of the mentions that could not be aligned.
+    """
+    ltf_doc = load_doc(ltf_path, StreamingLTFDocument if stream else LTFDocument)
+    laf_doc = load_doc(laf_path, StreamingLAFDocument if stream else LAFDocument)
+    mentions = laf_doc.mentions()
+    sentences, unaligned = tagged_sentences(ltf_doc, mentions)
+    with open(bio_path, 'wb') as f:
+        f.write(bio_bytes(ltf_doc.doc_id, sentences))
+    return {'doc_id': ltf_doc.doc_id, 'bio_file': bio_path, 'sentences': len(sentences),
+            'tokens': sum(len(sentence) for sentence in sentences), 'mentions': len(mentions),
+            'unaligned': unaligned}
+
+if __name__ == '__main__':
+    stream = pop_flag(sys.argv, '--stream')  # iterparse ltf and laf files, see streaming.py
+    workers = pop_option(sys.argv, '--workers', 1, int)  # one document per job, see parallel.py
+    chunksize = pop_option(sys.argv, '--chunksize', 1, int)
+    manifest_path = pop_option(sys.argv, '--manifest')
+    if len(sys.argv) != 4:
+        print 'USAGE: python conll.py [--stream] [--workers N] [--chunksize N] [--manifest file] <ltf dir> <laf dir> <bio dir>'
+        print 'this script will turn LDC ltf and laf document files into ne-tagger input, one <doc id>.bio file per document'
+    else:
+        ltf_dir = sys.argv[1]
+        laf_dir = sys.argv[2]
+        bio_dir = sys.argv[3]
+        pairs, ltf_orphans, laf_orphans, cached = discover_pairs(ltf_dir, laf_dir)
+        for f in ltf_orphans:
+            print 'no laf file for ' + f
+        jobs = [(ltf, laf, os.path.join(bio_dir, os.path.basename(ltf)[:-len(LTF_SUFFIX)] + '.bio'), stream)
+                for ltf, laf in pairs]
+        results = run_jobs(emit_pair, jobs, workers, chunksize)
+        for args, result, error, seconds in results:
+            if result is not None:
+                for entity_id in result['unaligned']:
+                    print 'unaligned mention ' + entity_id + ' in ' + result['doc_id']
+        manifest = build_manifest(results, ['ltf', 'laf', 'bio', 'stream'])
+        if manifest_path is not None:
+            write_manifest(manifest, manifest_path)
+        if report_failures(manifest):
+            sys.exit(1)
@@ -0,0 +1,168 @@
+#-*- coding: utf-8 -*-
+import multiprocessing
+import os
+import socket
+import SocketServer
+import sys
+import threading
+import time
+import traceback
+
+from cli_options import pop_option
+from client import read_message, request, send_message
+from discovery import discover_pairs
+from instrument import log, run_report, setup_logging
+from parallel import build_manifest, iter_jobs, write_manifest
+import match_xml_yoruba
+from split_tools import JOB_NAMES, SPLIT_TOOLS, split_module
+
+
+def _native(value):
+    """JSON strings as str, as the scripts get their arguments, also under python 2."""
+    return value.encode('utf-8') if isinstance(value, unicode) else value
+
+
+def split_request(pool, tool, args, options):
+    """Split every document pair of a directory on the shared pool.
+
+    Inputs
+    ------
+    pool : multiprocessing.Pool
+        Workers shared by every request.
+    tool : str
+        One of SPLIT_TOOLS.
+    args : list of str
+        Positional arguments of the tool: <ltf dir> <laf dir> <ltf_split dir>
+        <laf_split dir>, or <input dir> <ltf_split dir> <laf_split dir> for
+        transfer_yoruba.
+    options : dict
+        stream, and manifest, a path to write the manifest to. The other
+        options of the scripts (--state, --split-large, --pair-cache, ...)
+        are not supported, client.py refuses them.
+
+    Outputs
+    -------
+    reply : dict
+        report of the run, see instrument.run_report, and failures: the
+        manifest without the documents split fine, see
+        parallel.build_manifest, so that the reply stays small.
+    """
+    module = split_module(tool)
+    single_dir = SPLIT_TOOLS[tool][1]
+    if single_dir:
+        args = [args[0]] + list(args)
+    if len(args) != 4:
+        raise ValueError('%s takes %d directories' % (tool, 3 if single_dir else 4))
+    ltf_dir, laf_dir, ltf_split_result_path, laf_split_result_path = args
+    start = time.time()
+    pairs, ltf_orphans, laf_orphans, cached = discover_pairs(ltf_dir, laf_dir)
+    discovery_seconds = time.time() - start
+    jobs = [(ltf, laf, ltf_split_result_path, laf_split_result_path, bool(options.get('stream')), False)
+            for ltf, laf in pairs]
+    results = list(iter_jobs(module.split_pair, jobs, pool=pool))
+    manifest = build_manifest(results, JOB_NAMES)
+    if options.get('manifest') is not None:
+        write_manifest(manifest, options['manifest'])
+    manifest['documents'] = [entry for entry in manifest['documents'] if entry['error'] is not None]
+    return {'failures': manifest,
+            'report': run_report(results, time.time() - start, discovery_seconds),
+            'orphans': ltf_orphans + laf_orphans}
+
+
+def match_request(args, options):
+    """Run match_xml_yoruba.xml2lxf, in the thread of the request."""
+    if len(args) != 5:
+        raise ValueError('match_xml_yoruba takes an elisa file and 4 directories')
+    summary = match_xml_yoruba.xml2lxf(*(list(args) + [options.get('mode', 'copy'), options.get('threads', 8),
+                                                       options.get('match', 'id')]))
+    return {'summary': summary}
+
+
+class DaemonHandler(SocketServer.StreamRequestHandler):
+    """Serve the requests of one connection, one JSON line each, see client.py."""
+    def handle(self):
+        while True:
+            try:
+                message = read_message(self.rfile)
+            except ValueError:
+                send_message(self.wfile, {'ok': False, 'error': 'not a JSON line'})
+                return
+            if message is None:
+                return
+            tool = message.get('tool')
+            args = [_native(arg) for arg in message.get('args', [])]
+            options = dict((_native(key), _native(value)) for key, value in message.get('options', {}).items())
+            start = time.time()
+            try:
+                if tool == 'ping':
+                    reply = {'pid': os.getpid(), 'workers': self.server.workers}
+                elif tool == 'shutdown':
+                    send_message(self.wfile, {'ok': True})
+                    threading.Thread(target=self.server.shutdown).start()
+                    return
+                elif tool in SPLIT_TOOLS:
+                    reply = split_request(self.server.pool, tool, args, options)
+                elif tool == 'match_xml_yoruba':
+                    reply = match_request(args, options)
+                else:
+                    raise ValueError('unknown tool %s' % tool)
+                reply['ok'] = True
+            except Exception:
+                reply = {'ok': False, 'error': traceback.format_exc()}
+            reply['seconds'] = time.time() - start
+            log.info('%s %s in %.3fs', tool, 'done' if reply['ok'] else 'failed', reply['seconds'])
+            send_message(self.wfile, reply)
+
+
+class Daemon(SocketServer.ThreadingMixIn, SocketServer.UnixStreamServer):
+    """
+    Unix socket server running split and match jobs in a warm process.
+
+    The split scripts and lxml are imported once and the worker processes
+    are forked once, when the daemon starts. Every connection is served by
+    its own thread, and the documents of all the requests share the pool, so
+    concurrent requests stay within the worker budget.
+
+    Inputs
+    ------
+    socket_path : str
+        Unix socket to listen on, replaced if no daemon answers there.
+    workers : int, optional
+        Worker processes.
+    """
+    daemon_threads = True
+
+    def __init__(self, socket_path, workers=1):
+        if os.path.exists(socket_path):
+            try:
+                request(socket_path, {'tool': 'ping'})
+                raise IOError('a daemon already listens on %s' % socket_path)
+            except socket.error:
+                os.remove(socket_path)  # left behind by a daemon that died
+        self.workers = max(workers, 1)
+        for tool in SPLIT_TOOLS:
+            split_module(tool)  # loaded once, before the workers fork
+        self.pool = multiprocessing.Pool(self.workers)
+        SocketServer.UnixStreamServer.__init__(self, socket_path, DaemonHandler)
+
+    def server_close(self):
+        SocketServer.UnixStreamServer.server_close(self)
+        self.pool.close()
+        self.pool.join()
+        if os.path.exists(self.server_address):
+            os.remove(self.server_address)
+
+if __name__ == '__main__':
+    workers = pop_option(sys.argv, '--workers', 1, int)  # processes shared by all the requests
+    log_level = pop_option(sys.argv, '--log-level', 'info')
+    if len(sys.argv) != 2:
+        print 'USAGE: python daemon.py [--workers N] [--log-level level] <socket file>'
+        print 'this script will serve split and match jobs sent by client.py over a unix socket, until a shutdown request'
+    else:
+        setup_logging(log_level)
+        server = Daemon(sys.argv[1], workers)
+        log.info('listening on %s with %d workers', sys.argv[1], server.workers)
+        try:
+            server.serve_forever()
+        finally:
+            server.server_close()
@@ -0,0 +1,127 @@
+#-*- coding: utf-8 -*-
+import json
+import os
+import time
+
+try:
+    from os import scandir  # python 3.5+
+except ImportError:
+    try:
+        from scandir import scandir  # the scandir backport
+    except ImportError:
+        scandir = None
+
+LTF_SUFFIX = '.ltf.xml'
+LAF_SUFFIX = '.laf.xml'
+CACHE_VERSION = 1
+RACY_SECONDS = 2.0  # a directory changed this close to a scan may have changed again within the mtime resolution
+
+
+def file_names(path):
+    """Names of the regular files directly in path."""
+    if scandir is not None:
+        return [entry.name for entry in scandir(path) if entry.is_file()]
+    return [name for name in os.listdir(path) if os.path.isfile(os.path.join(path, name))]
+
+
+def _native(path):
+    """Paths read back from JSON as str, as a scan gives them, also under python 2."""
+    return path if isinstance(path, str) else path.encode('utf-8')
+
+
+def _documents(path, suffix):
+    """doc_id -> file name of the files of path ending with suffix."""
+    return dict((name[:-len(suffix)], name) for name in file_names(path) if name.endswith(suffix))
+
+
+def list_documents(path, suffix):
+    """Files of path ending with suffix, e.g. LTF_SUFFIX, sorted by document id."""
+    documents = _documents(path, suffix)
+    return [os.path.join(path, documents[doc_id]) for doc_id in sorted(documents)]
+
+
+def scan_pairs(ltf_dir, laf_dir):
+    """Pair the LTF and LAF files of two directories by document id.
+
+    The document id is the file name without .ltf.xml or .laf.xml. The two
+    directories may be the same. Subdirectories are not searched.
+
+    Outputs
+    -------
+    pairs : list of tuples
+        (ltf path, laf path), sorted by document id.
+    ltf_orphans : list of str
+        LTF files with no LAF file.
+    laf_orphans : list of str
+        LAF files with no LTF file.
+    """
+    ltfs = _documents(ltf_dir, LTF_SUFFIX)
+    lafs = _documents(laf_dir, LAF_SUFFIX)
+    pairs = [(os.path.join(ltf_dir, ltfs[doc_id]), os.path.join(laf_dir, lafs[doc_id]))
+             for doc_id in sorted(ltfs) if doc_id in lafs]
+    ltf_orphans = [os.path.join(ltf_dir, ltfs[doc_id]) for doc_id in sorted(ltfs) if doc_id not in lafs]
+    laf_orphans = [os.path.join(laf_dir, lafs[doc_id]) for doc_id in sorted(lafs) if doc_id not in ltfs]
+    return pairs, ltf_orphans, laf_orphans
+
+
+def _dir_key(ltf_dir, laf_dir):
+    return [os.path.abspath(ltf_dir), os.path.abspath(laf_dir)]
+
+
+def _dir_mtimes(ltf_dir, laf_dir):
+    return [os.stat(ltf_dir).st_mtime, os.stat(laf_dir).st_mtime]
+
+
+def _load_cache(cache_path, ltf_dir, laf_dir):
+    """Cached scan of the two directories, None when missing or out of date."""
+    try:
+        with open(cache_path) as f:
+            cache = json.load(f)
+    except (IOError, OSError, ValueError):
+        return None
+    if cache.get('version') != CACHE_VERSION or cache.get('dirs') != _dir_key(ltf_dir, laf_dir):
+        return None
+    mtimes = _dir_mtimes(ltf_dir, laf_dir)
+    if cache.get('mtimes') != mtimes or max(mtimes) > cache['scanned'] - RACY_SECONDS:
+        return None
+    return cache
+
+
+def discover_pairs(ltf_dir, laf_dir, cache_path=None):
+    """scan_pairs, skipped when a cache of an earlier scan is still valid.
+
+    Adding, removing or renaming a file changes the mtime of its directory,
+    so the cache holds while both directory mtimes are those it recorded.
+    Editing a file in place does not change the pairs, the run state takes
+    care of those, see run_state.py.
+
+    Inputs
+    ------
+    ltf_dir : str
+    laf_dir : str
+    cache_path : str, optional
+        JSON file the pairs are kept in between runs.
+
+    Outputs
+    -------
+    pairs, ltf_orphans, laf_orphans : see scan_pairs.
+    cached : bool
+        Whether the scan was skipped.
+    """
+    if cache_path is not None:
+        cache = _load_cache(cache_path, ltf_dir, laf_dir)
+        if cache is not None:
+            pairs = [(_native(ltf), _native(laf)) for ltf, laf in cache['pairs']]
+            return (pairs, [_native(path) for path in cache['ltf_orphans']],
+                    [_native(path) for path in cache['laf_orphans']], True)
+        mtimes = _dir_mtimes(ltf_dir, laf_dir)
+        scanned = time.time()
+    pairs, ltf_orphans, laf_orphans = scan_pairs(ltf_dir, laf_dir)
+    if cache_path is not None:
+        cache = {'version': CACHE_VERSION, 'dirs': _dir_key(ltf_dir, laf_dir), 'mtimes': mtimes,
+                 'scanned': scanned, 'pairs': pairs, 'ltf_orphans': ltf_orphans, 'laf_orphans': laf_orphans}
+        temp = cache_path + '.tmp'
+        with open(temp, 'w') as f:
+            json.dump(cache, f)
+        os.rename(temp, cache_path)
+    return pairs, ltf_orphans, laf_orphans, False
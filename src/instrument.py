@@ -0,0 +1,338 @@
+#-*- coding: utf-8 -*-
+import json
+import logging
+import resource
+import sys
+import time
+
+try:
+    import tracemalloc  # python 3, or the pytracemalloc backport
+except ImportError:
+    tracemalloc = None
+
+STAGES = ['discovery', 'ltf_parse', 'laf_parse', 'assign', 'serialize', 'write']
+COUNTS = ['documents', 'segments', 'tokens', 'mentions']
+LOG_LEVELS = {'debug': logging.DEBUG, 'info': logging.INFO, 'warning': logging.WARNING, 'error': logging.ERROR}
+
+log = logging.getLogger('xml_transfer')
+
+PROC_STATUS = '/proc/self/status'
+PROC_CLEAR_REFS = '/proc/self/clear_refs'
+TOP_ALLOCATIONS = 10
+_profile_memory = False
+_profile_stages = False
+
+
+def setup_logging(level='info'):
+    """Send the log of the scripts to stdout, where their prints used to go.
+
+    Per segment messages are logged at debug level and only formatted when
+    that level is on, see split_segments.
+    """
+    handler = logging.StreamHandler(sys.stdout)
+    handler.setFormatter(logging.Formatter('%(message)s'))
+    log.addHandler(handler)
+    log.setLevel(LOG_LEVELS[level])
+    log.propagate = False
+
+
+class StageClock(object):
+    """
+    Accumulates the time spent in each stage of a split.
+
+    lap(stage) charges the time elapsed since the previous lap to stage, so
+    a loop can be cut into stages with one clock read per boundary. The time
+    a lazy segment generator takes to produce the next segment is charged by
+    the lap at the top of the loop body.
+
+    Attributes
+    ----------
+    seconds : dict
+        stage -> seconds.
+    """
+    def __init__(self):
+        self.seconds = dict((stage, 0.0) for stage in STAGES)
+        self.last = time.time()
+
+    def lap(self, stage):
+        now = time.time()
+        self.seconds[stage] += now - self.last
+        self.last = now
+
+    def resume(self):
+        """Start the next stage now, leaving out the time since the last lap, e.g. spent in a queue."""
+        self.last = time.time()
+
+    def add(self, seconds):
+        """Add the stage seconds of another clock, e.g. from a summary."""
+        for stage, value in seconds.items():
+            self.seconds[stage] = self.seconds.get(stage, 0.0) + value
+
+    def merge(self, summary):
+        """Add what another clock put in a summary, see summary()."""
+        self.add(summary.get('stages', {}))
+
+    def summary(self):
+        """Entries of the clock for a split summary."""
+        return {'stages': self.seconds}
+
+
+def _status_kb(field):
+    """A kB field of /proc/self/status, None when it can not be read."""
+    try:
+        with open(PROC_STATUS) as f:
+            for line in f:
+                if line.startswith(field + ':'):
+                    return int(line.split()[1])
+    except (IOError, OSError):
+        pass
+    return None
+
+
+def current_rss_kb():
+    """Resident set size of this process in kB."""
+    rss = _status_kb('VmRSS')
+    return rss if rss is not None else resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+
+def peak_rss_kb():
+    """Peak resident set size in kB since the last reset_peak_rss, or since the process started."""
+    peak = _status_kb('VmHWM')
+    return peak if peak is not None else resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+
+def reset_peak_rss():
+    """Bring the peak RSS down to the current RSS, returns False where Linux does not support it."""
+    try:
+        with open(PROC_CLEAR_REFS, 'w') as f:
+            f.write('5')
+        return True
+    except (IOError, OSError):
+        return False
+
+
+def _top_allocations(statistics):
+    return [[str(stat.traceback), stat.size, stat.count] for stat in statistics[:TOP_ALLOCATIONS]]
+
+
+class MemoryClock(StageClock):
+    """
+    StageClock that also records the peak RSS of its document.
+
+    The peak is reset through /proc/self/clear_refs when the clock is
+    created, so the document gets the highest RSS reached while it was
+    split. Without that support (not Linux, kernel before 4.0) the peaks are
+    those of the whole process so far, and only grow. Memory Python keeps in
+    its free lists after an earlier document is reused without raising the
+    RSS; run one document per process for exact per document figures, as
+    memprofile.py does.
+
+    When tracemalloc is available the Python allocations are traced as well
+    and the top allocating lines of the document are reported. lxml trees
+    are allocated by libxml2 and only show up in the RSS.
+
+    With stages, every lap also records the peak RSS of the stage, resets
+    it, and adds the lines that allocated the most during the stage to its
+    top allocations. This probes /proc and takes a tracemalloc snapshot at
+    every segment boundary, which slows the split down many times.
+
+    Attributes
+    ----------
+    start_kb : int
+        RSS when the clock was created.
+    merged_kb : int
+        Highest peak of the summaries merged, e.g. from split_large_pair workers.
+    peak_kb : dict
+        stage -> peak RSS in kB, with stages.
+    stage_allocations : dict
+        stage -> traceback -> [bytes, blocks] allocated during the stage,
+        with stages and tracemalloc.
+    """
+    def __init__(self, stages=False):
+        self.start_kb = current_rss_kb()
+        self.stages = stages
+        self.peak_kb = dict((stage, 0) for stage in STAGES)
+        self.stage_allocations = dict((stage, {}) for stage in STAGES)
+        self.merged_kb = 0
+        self.resets = reset_peak_rss()
+        if tracemalloc is not None and not tracemalloc.is_tracing():
+            tracemalloc.start()
+        self.snapshot = tracemalloc.take_snapshot() if stages and tracemalloc is not None else None
+        StageClock.__init__(self)
+
+    def lap(self, stage):
+        StageClock.lap(self, stage)
+        if not self.stages:
+            return
+        self.peak_kb[stage] = max(self.peak_kb[stage], peak_rss_kb())
+        if self.resets:
+            reset_peak_rss()
+        if self.snapshot is not None:
+            snapshot = tracemalloc.take_snapshot()
+            allocations = self.stage_allocations[stage]
+            for stat in snapshot.compare_to(self.snapshot, 'lineno')[:TOP_ALLOCATIONS]:
+                if stat.size_diff > 0:
+                    entry = allocations.setdefault(str(stat.traceback), [0, 0])
+                    entry[0] += stat.size_diff
+                    entry[1] += max(stat.count_diff, 0)
+            self.snapshot = snapshot
+        self.last = time.time()  # leave the probing out of the next stage
+
+    def merge(self, summary):
+        StageClock.merge(self, summary)
+        memory = summary.get('memory')
+        if memory is not None:
+            for stage, peak in memory.get('peak_kb', {}).items():
+                self.peak_kb[stage] = max(self.peak_kb.get(stage, 0), peak)
+            for stage, top in memory.get('stage_allocations', {}).items():
+                allocations = self.stage_allocations.setdefault(stage, {})
+                for line, size, count in top:
+                    entry = allocations.setdefault(line, [0, 0])
+                    entry[0] += size
+                    entry[1] += count
+            self.merged_kb = max(self.merged_kb, memory['peak'])
+
+    def summary(self):
+        peak = max([peak_rss_kb(), self.merged_kb] + list(self.peak_kb.values()))
+        memory = {'start_kb': self.start_kb, 'peak': peak, 'peak_resets': self.resets}
+        if self.stages:
+            memory['peak_kb'] = self.peak_kb
+            if tracemalloc is not None:
+                memory['stage_allocations'] = dict(
+                    (stage, sorted([[line] + entry for line, entry in allocations.items()],
+                                   key=lambda top: -top[1])[:TOP_ALLOCATIONS])
+                    for stage, allocations in self.stage_allocations.items())
+        if tracemalloc is not None:
+            memory['top_allocations'] = _top_allocations(tracemalloc.take_snapshot().statistics('lineno'))
+        entries = StageClock.summary(self)
+        entries['memory'] = memory
+        return entries
+
+
+def profile_memory(enabled=True, stages=False):
+    """Make new_clock return MemoryClocks, in this process and the workers it forks later.
+
+    With stages they also record the peak RSS and top allocations of every
+    stage, see MemoryClock.
+    """
+    global _profile_memory, _profile_stages
+    _profile_memory = enabled
+    _profile_stages = stages
+
+
+def new_clock():
+    """A StageClock, or a MemoryClock when memory profiling is on."""
+    return MemoryClock(_profile_stages) if _profile_memory else StageClock()
+
+
+def run_report(results, wall_seconds, discovery_seconds=0.0):
+    """Aggregate the stage times and counts of a run.
+
+    Inputs
+    ------
+    results : list of tuples
+        run_jobs results whose summaries hold stages, segments, tokens and
+        mentions. Documents resumed from a run state are only counted as
+        resumed, and those whose LAF files alone were rewritten as relabeled.
+    wall_seconds : float
+        Duration of the whole run.
+    discovery_seconds : float, optional
+        Time spent finding the input files.
+
+    Outputs
+    -------
+    report : dict
+        seconds per stage (summed over the workers), counts, throughput of
+        each count per wall clock second, failed, resumed and relabeled documents. With
+        memory profiling, also the peak RSS of each stage over the documents
+        and the document with the highest peak.
+    """
+    clock = StageClock()
+    clock.seconds['discovery'] = discovery_seconds
+    counts = dict((count, 0) for count in COUNTS)
+    failed = 0
+    resumed = 0
+    relabeled = 0
+    memory = None
+    for args, result, error, seconds in results:
+        if result is None:
+            failed += 1
+            continue
+        if result.get('resumed'):
+            resumed += 1
+            continue
+        if 'relabeled' in result:
+            relabeled += 1
+            continue
+        counts['documents'] += 1
+        for count in COUNTS[1:]:
+            counts[count] += result.get(count, 0)
+        clock.add(result.get('stages', {}))
+        if 'memory' in result:
+            if memory is None:
+                memory = {'peak_kb': dict((stage, 0) for stage in STAGES), 'largest': None}
+            for stage, peak in result['memory'].get('peak_kb', {}).items():
+                memory['peak_kb'][stage] = max(memory['peak_kb'][stage], peak)
+            if memory['largest'] is None or result['memory']['peak'] > memory['largest'][1]:
+                memory['largest'] = [result.get('doc_id'), result['memory']['peak']]
+    rates = dict((count, counts[count] / wall_seconds if wall_seconds > 0 else 0.0) for count in COUNTS)
+    report = {'wall_seconds': wall_seconds, 'stage_seconds': clock.seconds, 'counts': counts,
+              'per_second': rates, 'failed': failed, 'resumed': resumed,
+              'relabeled': relabeled}
+    if memory is not None:
+        report['memory'] = memory
+    return report
+
+
+def log_report(report):
+    """Log a run report in a few lines at info level."""
+    log.info('%d documents, %d segments, %d tokens, %d mentions in %.3fs (%d failed, %d resumed, %d relabeled)',
+             report['counts']['documents'], report['counts']['segments'], report['counts']['tokens'],
+             report['counts']['mentions'], report['wall_seconds'], report['failed'], report['resumed'],
+             report.get('relabeled', 0))
+    log.info('per second: ' + ', '.join('%s %.1f' % (count, report['per_second'][count]) for count in COUNTS))
+    log.info('stage seconds: ' + ', '.join('%s %.3f' % (stage, report['stage_seconds'][stage])
+                                           for stage in STAGES))
+    if 'memory' in report and any(report['memory']['peak_kb'].values()):
+        log.info('peak rss MB: ' + ', '.join('%s %.1f' % (stage, report['memory']['peak_kb'][stage] / 1024.0)
+                                             for stage in STAGES[1:]))
+    if 'memory' in report:
+        log.info('highest peak: %s, %.1f MB', report['memory']['largest'][0],
+                 report['memory']['largest'][1] / 1024.0)
+
+
+def prometheus_text(report, prefix='xml_transfer'):
+    """Render a run report in the Prometheus textfile exposition format."""
+    lines = ['# TYPE %s_stage_seconds gauge' % prefix]
+    for stage in STAGES:
+        lines.append('%s_stage_seconds{stage="%s"} %.6f' % (prefix, stage, report['stage_seconds'][stage]))
+    lines.append('# TYPE %s_items gauge' % prefix)
+    for count in COUNTS:
+        lines.append('%s_items{kind="%s"} %d' % (prefix, count, report['counts'][count]))
+    lines.append('# TYPE %s_items_per_second gauge' % prefix)
+    for count in COUNTS:
+        lines.append('%s_items_per_second{kind="%s"} %.6f' % (prefix, count, report['per_second'][count]))
+    lines.append('# TYPE %s_wall_seconds gauge' % prefix)
+    lines.append('%s_wall_seconds %.6f' % (prefix, report['wall_seconds']))
+    lines.append('# TYPE %s_failed_documents gauge' % prefix)
+    lines.append('%s_failed_documents %d' % (prefix, report['failed']))
+    lines.append('# TYPE %s_resumed_documents gauge' % prefix)
+    lines.append('%s_resumed_documents %d' % (prefix, report['resumed']))
+    lines.append('# TYPE %s_relabeled_documents gauge' % prefix)
+    lines.append('%s_relabeled_documents %d' % (prefix, report.get('relabeled', 0)))
+    if 'memory' in report and any(report['memory']['peak_kb'].values()):
+        lines.append('# TYPE %s_stage_peak_rss_bytes gauge' % prefix)
+        for stage in STAGES[1:]:
+            lines.append('%s_stage_peak_rss_bytes{stage="%s"} %d'
+                         % (prefix, stage, report['memory']['peak_kb'][stage] * 1024))
+    return '\n'.join(lines) + '\n'
+
+
+def write_report(report, path):
+    """Write a run report, as a Prometheus textfile when path ends with .prom, as JSON otherwise."""
+    with open(path, 'w') as f:
+        if path.endswith('.prom'):
+            f.write(prometheus_text(report))
+        else:
+            json.dump(report, f, indent=1, sort_keys=True, separators=(',', ': '))
+            f.write('\n')
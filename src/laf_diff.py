@@ -0,0 +1,241 @@
+#-*- coding: utf-8 -*-
+import bisect
+import hashlib
+import sys
+
+from cli_options import pop_option
+from ltf_index import load_index
+from mention_index import MentionIndex
+from parallel import iter_jobs
+from serialize import laf_bytes, write_bytes
+from streaming import Mention, StreamingLAFDocument
+
+
+def mention_digest(type, extent):
+    """Short md5 of the type and extent of a mention, all a relabel needs to tell two versions apart."""
+    return hashlib.md5((u'%s\t%s' % (type, extent or u'')).encode('utf-8')).hexdigest()[:16]
+
+
+def compact_mentions(mentions):
+    """Mentions as [entity_id, digest, start_char, end_char] lists, offsets as ints, see mention_digest.
+
+    Inputs
+    ------
+    mentions : iterable
+        Mentions of the form (entity_id, type, extent, start_char, end_char, ...),
+        e.g. StreamingLAFDocument.iter_mentions() or MentionIndex.mentions().
+    """
+    return [[mention[0], mention_digest(mention[1], mention[2]), int(mention[3]), int(mention[4])]
+            for mention in mentions]
+
+
+def laf_digests(laf_doc, mentions):
+    """What the run state keeps of a LAF document to relabel it later.
+
+    Inputs
+    ------
+    laf_doc : LAFDocument or StreamingLAFDocument
+        The document, for the attributes of its DOC.
+    mentions : iterable
+        Its mentions in document order, see compact_mentions.
+
+    Outputs
+    -------
+    digests : dict
+        doc, the DOC id and lang, and mentions, the compact_mentions() in
+        document order.
+    """
+    return {'doc': [laf_doc.doc_id, laf_doc.lang], 'mentions': compact_mentions(mentions)}
+
+
+def reordered(old_mentions, new_mentions):
+    """Whether the mentions both versions share come in another order, see compact_mentions."""
+    old_keys = [tuple(mention) for mention in old_mentions]
+    new_keys = [tuple(mention) for mention in new_mentions]
+    common = set(old_keys) & set(new_keys)
+    return [key for key in old_keys if key in common] != [key for key in new_keys if key in common]
+
+
+def diff_mentions(old_mentions, new_mentions):
+    """Compare two versions of the mentions of a document by id.
+
+    Inputs
+    ------
+    old_mentions : list
+        compact_mentions() of the old version.
+    new_mentions : list
+        Same, for the new version.
+
+    Outputs
+    -------
+    spans : list of tuples
+        (start_char, end_char) of every mention added, removed or changed
+        (type, extent or offsets), old and new offsets both given for a
+        mention that moved. Sorted.
+    """
+    def by_id(mentions):
+        mentions_by_id = {}
+        for mention in mentions:
+            key = (mention[1], mention[2], mention[3])
+            mentions_by_id.setdefault(mention[0], []).append(key)
+        for keys in mentions_by_id.values():
+            keys.sort()
+        return mentions_by_id
+    old = by_id(old_mentions)
+    new = by_id(new_mentions)
+    spans = set()
+    for entity_id in set(old) | set(new):
+        old_keys = old.get(entity_id, [])
+        new_keys = new.get(entity_id, [])
+        if old_keys != new_keys:
+            spans.update((key[1], key[2]) for key in old_keys + new_keys)
+    return sorted(spans)
+
+
+def affected_segments(index, spans):
+    """Return the segments whose character span overlaps a changed mention.
+
+    A mention belongs to the segment containing it, so every segment that
+    held the old version of a changed mention or holds the new one overlaps
+    its span.
+
+    Inputs
+    ------
+    index : collections.OrderedDict
+        seg_id -> ltf_index.IndexEntry, see ltf_index.load_index.
+    spans : list of tuples
+        (start_char, end_char) from diff_mentions.
+
+    Outputs
+    -------
+    seg_ids : list of str
+        In file order.
+    """
+    entries = [entry for entry in index.values() if entry.start_char is not None and entry.end_char is not None]
+    by_start = sorted(entries, key=lambda entry: entry.start_char)
+    starts = [entry.start_char for entry in by_start]
+    hit = set()
+    for start_char, end_char in spans:
+        # segments start in order and do not overlap, only the one before the span can reach into it
+        i = max(bisect.bisect_right(starts, start_char) - 1, 0)
+        while i < len(by_start) and by_start[i].start_char <= max(start_char, end_char):
+            if by_start[i].end_char >= min(start_char, end_char):
+                hit.add(by_start[i].seg_id)
+            i += 1
+    return [seg_id for seg_id in index if seg_id in hit]
+
+
+def relabel_pair(ltf_path, laf_path, laf_split_result_path, old_digests, prefix=''):
+    """Rewrite the segment LAF files touched by a change of the LAF document.
+
+    The segment LTF files and the LAF files of the other segments are left
+    as they are; the rewritten files are byte for byte what splitting the
+    whole pair again would give. A change of the DOC attributes, or of the
+    order of the mentions kept, shows in every segment file, so the pair
+    has to be split again instead.
+
+    Inputs
+    ------
+    ltf_path : str
+        LTF document, unchanged since the segment files were written.
+    laf_path : str
+        New version of the LAF document.
+    laf_split_result_path : str
+        Directory holding the segment LAF files.
+    old_digests : dict
+        laf_digests() of the LAF document the segment files were written from.
+    prefix : str, optional
+        Prefix of the segment file names, doc_id + '_' for trans_hau.py and
+        trans_tur.py, '' for trans_ben.py.
+
+    Outputs
+    -------
+    summary : dict or None
+        laf_files rewritten, the change in the number of mentions written
+        (mentions_delta) and the laf_digests() of the new version
+        (laf_digests). None when the pair has to be split again, nothing
+        written then.
+    """
+    laf_doc = StreamingLAFDocument(laf_path)
+    new_mentions = laf_doc.mentions()
+    new_digests = laf_digests(laf_doc, new_mentions)
+    if not isinstance(old_digests, dict) or old_digests['doc'] != new_digests['doc']:  # or recorded by an older version
+        return None
+    old_mentions = old_digests['mentions']
+    if reordered(old_mentions, new_digests['mentions']):
+        return None
+    index = load_index(ltf_path, write=False)  # never write a sidecar into the input corpus
+    seg_ids = affected_segments(index, diff_mentions(old_mentions, new_digests['mentions']))
+    old_index = MentionIndex.from_mentions(Mention(mention[0], None, None, mention[2], mention[3], None, None,
+                                                   None, None)
+                                           for mention in old_mentions)  # only counted
+    new_index = MentionIndex.from_mentions(new_mentions)
+    laf_files = []
+    delta = 0
+    for seg_id in seg_ids:
+        entry = index[seg_id]
+        laff = laf_split_result_path+'/'+prefix+seg_id+'.'+'laf.xml'
+        mentions = new_index.contained(entry.start_char, entry.end_char)
+        write_bytes(laff, laf_bytes(prefix+seg_id, laf_doc.lang, mentions))
+        laf_files.append(laff)
+        delta += len(mentions) - len(old_index.contained(entry.start_char, entry.end_char))
+    return {'laf_files': laf_files, 'mentions_delta': delta, 'laf_digests': new_digests}
+
+
+def relabel_changed(state, changed, prefix_doc_id, workers=1, chunksize=1):
+    """Run relabel_pair over the pairs a run state found with only their LAF changed.
+
+    Inputs
+    ------
+    state : run_state.RunState
+        State the pairs come from, updated as they complete.
+    changed : list of tuples
+        (args, record) from RunState.split.
+    prefix_doc_id : bool
+        Segment files are named doc_id + '_' + seg_id rather than seg_id.
+    workers : int, optional
+        See parallel.iter_jobs.
+    chunksize : int, optional
+        See parallel.iter_jobs.
+
+    Outputs
+    -------
+    results : list of tuples
+        (args, summary, None, seconds) for the relabeled pairs, summary being
+        the recorded one updated, with relabeled listing the rewritten files.
+    failed : list of tuples
+        Job arguments of the pairs to split again, see relabel_pair.
+    """
+    jobs = []
+    for job, record in changed:
+        prefix = record['summary']['doc_id'] + '_' if prefix_doc_id else ''
+        jobs.append((job[0], job[1], job[3], record['laf_digests'], prefix))
+    results = []
+    failed = []
+    for (job, record), (args, result, error, seconds) in zip(changed, iter_jobs(relabel_pair, jobs, workers,
+                                                                                  chunksize)):
+        if error is not None or result is None:
+            failed.append(job)
+            continue
+        summary = dict(record['summary'])
+        summary['mentions'] += result['mentions_delta']
+        state.done(job, summary, result['laf_digests'])
+        summary = dict(summary, relabeled=result['laf_files'])
+        results.append((job, summary, None, seconds))
+    return results, failed
+
+if __name__ == '__main__':
+    prefix = pop_option(sys.argv, '--prefix', '')
+    if len(sys.argv) != 5:
+        print 'USAGE: python laf_diff.py [--prefix str] <old laf file> <new laf file> <ltf file> <laf_split dir>'
+        print 'this script will rewrite only the segment laf files touched by a change of the laf document'
+    else:
+        old_doc = StreamingLAFDocument(sys.argv[1])
+        summary = relabel_pair(sys.argv[3], sys.argv[2], sys.argv[4], laf_digests(old_doc, old_doc.iter_mentions()),
+                               prefix)
+        if summary is None:
+            print 'the DOC attributes or the order of the mentions changed, split the pair again'
+            sys.exit(1)
+        for laff in summary['laf_files']:
+            print laff
+        print str(len(summary['laf_files'])) + ' segment laf files rewritten'
@@ -0,0 +1,175 @@
+#-*- coding: utf-8 -*-
+import collections
+import mmap
+import os
+import re
+import sys
+
+from lxml import etree
+
+from ltf_ranges import scan_segments
+from serialize import LTF_HEAD, LTF_TAIL, escape_attribute, write_bytes
+
+
+INDEX_SUFFIX = '.idx'
+INDEX_HEADER = '#ltf_index v1 size=%d mtime=%.6f\n'
+TOKEN_START = re.compile(br'<TOKEN\b')
+
+# Where a segment sits in its LTF file. byte_end is just after '</SEG>',
+# tail_end where the whitespace after it stops (next '<SEG' or '</TEXT>').
+IndexEntry = collections.namedtuple('IndexEntry', ['seg_id', 'byte_start', 'byte_end', 'tail_end',
+                                                   'start_char', 'end_char', 'tokens'])
+
+
+def index_path_for(xmlf):
+    """Sidecar index path of an LTF file."""
+    return xmlf + INDEX_SUFFIX
+
+
+def build_index(xmlf):
+    """Scan an LTF file once and locate all of its segments.
+
+    Inputs
+    ------
+    xmlf : str
+        LTF XML file.
+
+    Outputs
+    -------
+    index : collections.OrderedDict
+        seg_id -> IndexEntry, in file order.
+    """
+    segments, text_end = scan_segments(xmlf)
+    index = collections.OrderedDict()
+    if not segments:
+        return index
+    with open(xmlf, 'rb') as f:
+        data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        try:
+            for k, (seg_id, byte_start, byte_end, start_char, end_char) in enumerate(segments):
+                tail_end = segments[k + 1][1] if k + 1 < len(segments) else text_end
+                tokens = len(TOKEN_START.findall(data, byte_start, byte_end))
+                index[seg_id] = IndexEntry(seg_id, byte_start, byte_end, tail_end, start_char, end_char, tokens)
+        finally:
+            data.close()
+    return index
+
+
+def _stamp(xmlf):
+    stat = os.stat(xmlf)
+    return INDEX_HEADER % (stat.st_size, stat.st_mtime)
+
+
+def write_index(xmlf, index, index_path=None):
+    """Write the sidecar index of an LTF file, one tab separated line per segment."""
+    index_path = index_path or index_path_for(xmlf)
+    lines = [_stamp(xmlf)]
+    for entry in index.values():
+        lines.append('\t'.join('' if value is None else str(value) for value in entry) + '\n')
+    with open(index_path, 'w') as f:
+        f.write(''.join(lines))
+
+
+def read_index(xmlf, index_path=None):
+    """Read the sidecar index of an LTF file.
+
+    Outputs
+    -------
+    index : collections.OrderedDict or None
+        seg_id -> IndexEntry, None when there is no sidecar or when the LTF
+        file changed since it was written.
+    """
+    index_path = index_path or index_path_for(xmlf)
+    if not os.path.exists(index_path):
+        return None
+    with open(index_path) as f:
+        if f.readline() != _stamp(xmlf):
+            return None
+        index = collections.OrderedDict()
+        for line in f:
+            fields = line.rstrip('\n').split('\t')
+            values = [None if value == '' else int(value) for value in fields[1:]]
+            index[fields[0]] = IndexEntry(fields[0], *values)
+    return index
+
+
+def load_index(xmlf, index_path=None, write=True):
+    """Return the index of an LTF file, from its sidecar when it is up to date.
+
+    Inputs
+    ------
+    xmlf : str
+        LTF XML file.
+    index_path : str, optional
+        Sidecar path, xmlf + '.idx' by default.
+    write : bool, optional
+        Write the sidecar when it had to be rebuilt.
+    """
+    index = read_index(xmlf, index_path)
+    if index is None:
+        index = build_index(xmlf)
+        if write:
+            try:
+                write_index(xmlf, index, index_path)
+            except (IOError, OSError):
+                pass  # read-only input, the index is still usable in memory
+    return index
+
+
+def segment_bytes(xmlf, entry, tail=True):
+    """Return the original bytes of a segment, with its tail by default."""
+    with open(xmlf, 'rb') as f:
+        f.seek(entry.byte_start)
+        return f.read((entry.tail_end if tail else entry.byte_end) - entry.byte_start)
+
+
+def fetch_segment(xmlf, seg_id, index=None):
+    """Parse one segment of an LTF file by seeking to it.
+
+    Inputs
+    ------
+    xmlf : str
+        LTF XML file.
+    seg_id : str
+        Id of the segment.
+    index : dict, optional
+        Index of xmlf, loaded with load_index when not given.
+
+    Outputs
+    -------
+    segment : lxml.etree.Element
+        SEG element with its tail.
+    """
+    if index is None:
+        index = load_index(xmlf)
+    text = etree.fromstring(b'<TEXT>' + segment_bytes(xmlf, index[seg_id]) + b'</TEXT>')
+    return text[0]
+
+
+def extract_segment(xmlf, seg_id, out, doc_id, index=None):
+    """Write a one segment LTF document copying the segment bytes verbatim.
+
+    The wrapper is the one the split scripts write; the segment itself is
+    the original text of xmlf, quoting and character references included.
+    """
+    if index is None:
+        index = load_index(xmlf)
+    write_bytes(out, b''.join([LTF_HEAD % escape_attribute(doc_id),
+                               segment_bytes(xmlf, index[seg_id]),
+                               LTF_TAIL]))
+
+
+if __name__ == '__main__':
+    if len(sys.argv) < 2:
+        print 'USAGE: python ltf_index.py <ltf file or dir> ...'
+        print 'this script will write a <file>.idx segment index next to every ltf file'
+    else:
+        for path in sys.argv[1:]:
+            if os.path.isdir(path):
+                xmlfs = [os.path.join(path, f) for f in sorted(os.listdir(path)) if f.endswith('ltf.xml')]
+            else:
+                xmlfs = [path]
+            for xmlf in xmlfs:
+                index = build_index(xmlf)
+                write_index(xmlf, index)
+                print xmlf + ': ' + str(len(index)) + ' segments'
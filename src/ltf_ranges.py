@@ -0,0 +1,130 @@
+#-*- coding: utf-8 -*-
+import mmap
+import re
+
+from lxml import etree
+
+
+SEG_START = re.compile(br'<SEG\b[^>]*>')
+SEG_END = re.compile(br'</SEG\s*>')
+TEXT_END = re.compile(br'</TEXT\s*>')
+ATTRIBUTE = re.compile(br'''([A-Za-z_:][-\w.:]*)\s*=\s*(?:"([^"]*)"|'([^']*)')''')
+
+
+def tag_attributes(tag):
+    """Return the attributes of a raw start tag as a dict of str."""
+    attributes = {}
+    for match in ATTRIBUTE.finditer(tag):
+        value = match.group(2) if match.group(2) is not None else match.group(3)
+        attributes[match.group(1).decode('utf-8')] = value.decode('utf-8')
+    return attributes
+
+
+def scan_segments(xmlf):
+    """Locate every SEG of an LTF file without parsing it.
+
+    Inputs
+    ------
+    xmlf : str
+        LTF XML file to scan.
+
+    Outputs
+    -------
+    segments : list of tuples
+        (seg_id, byte_start, byte_end, start_char, end_char) in file order.
+        byte_start is the offset of '<SEG', byte_end the offset just after
+        '</SEG>'; start_char and end_char are ints, None when missing.
+    text_end : int
+        Byte offset of '</TEXT>' after the last segment, where the tail of
+        the last segment ends.
+    """
+    with open(xmlf, 'rb') as f:
+        data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        try:
+            segments = []
+            pos = 0
+            while True:
+                start = SEG_START.search(data, pos)
+                if start is None:
+                    break
+                end = SEG_END.search(data, start.end())
+                if end is None:
+                    raise ValueError('unterminated SEG at byte %d of %s' % (start.start(), xmlf))
+                attributes = tag_attributes(start.group(0)[4:])
+                start_char = attributes.get('start_char')
+                end_char = attributes.get('end_char')
+                segments.append((attributes.get('id'), start.start(), end.end(),
+                                 None if start_char is None else int(start_char),
+                                 None if end_char is None else int(end_char)))
+                pos = end.end()
+            text_end = TEXT_END.search(data, pos)
+            text_end = pos if text_end is None else text_end.start()
+        finally:
+            data.close()
+    return segments, text_end
+
+
+def byte_ranges(xmlf, n):
+    """Cut an LTF file into at most n byte ranges on SEG boundaries.
+
+    Ranges hold whole segments with their tails and have roughly the same
+    size in bytes, so that they can be parsed by separate workers.
+
+    Inputs
+    ------
+    xmlf : str
+        LTF XML file.
+    n : int
+        Number of ranges wanted.
+
+    Outputs
+    -------
+    ranges : list of tuples
+        (byte_start, byte_end, start_char, end_char), start_char and end_char
+        bounding the character offsets of the segments in the range.
+    """
+    segments, text_end = scan_segments(xmlf)
+    if not segments:
+        return []
+    bounds = [segment[1] for segment in segments] + [text_end]
+    target = float(text_end - bounds[0]) / max(n, 1)
+    groups = []
+    first = 0
+    for i in range(len(segments)):
+        if len(groups) < n - 1 and bounds[i + 1] - bounds[first] >= target:
+            groups.append((first, i + 1))
+            first = i + 1
+    if first < len(segments):
+        groups.append((first, len(segments)))
+    ranges = []
+    for first, last in groups:
+        start_chars = [segment[3] for segment in segments[first:last] if segment[3] is not None]
+        end_chars = [segment[4] for segment in segments[first:last] if segment[4] is not None]
+        ranges.append((bounds[first], bounds[last],
+                       min(start_chars) if start_chars else None,
+                       max(end_chars) if end_chars else None))
+    return ranges
+
+
+def segments_in_range(xmlf, byte_start, byte_end):
+    """Parse the segments held in a byte range of an LTF file.
+
+    Inputs
+    ------
+    xmlf : str
+        LTF XML file.
+    byte_start : int
+        Offset of the first '<SEG' of the range.
+    byte_end : int
+        Offset where the range stops, as given by byte_ranges.
+
+    Outputs
+    -------
+    segments : list of lxml.etree.Element
+        SEG elements, tails included, in file order.
+    """
+    with open(xmlf, 'rb') as f:
+        f.seek(byte_start)
+        data = f.read(byte_end - byte_start)
+    text = etree.fromstring(b'<TEXT>' + data + b'</TEXT>')
+    return [segment for segment in text if segment.tag == 'SEG']
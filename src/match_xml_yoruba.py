@@ -5,33 +5,162 @@ reload(sys)
 sys.setdefaultencoding('utf8')
 import sys
 import os
-import subprocess
-from bs4 import BeautifulSoup
 
+from lxml import etree
 
-def xml2lxf(xml, ltf_split, ltf_match, laf_split, laf_match):
-    soup = BeautifulSoup(open(xml).read(), 'html.parser')
-    for segment in soup.find_all("parallel"):
-        name = segment.segment_source['id']
-        cmd = ['cp', ltf_split
-               +name+'.ltf.xml', ltf_match]
-        subprocess.call(cmd)
-        cmd = ['cp', laf_split
-               +name+'.laf.xml', laf_match]
-        subprocess.call(cmd)
+from cli_options import pop_option
+from instrument import log, setup_logging
+from materialize import MODES, SAME, materialize
+from segment_match import SegmentMatcher
+
+PARALLEL_TAGS = ('parallel', 'PARALLEL')
+SOURCE_TAGS = ('segment_source', 'SEGMENT_SOURCE')
+TEXT_TAGS = ('full_text', 'FULL_TEXT', 'orig_raw_source', 'ORIG_RAW_SOURCE', 'original_text', 'ORIGINAL_TEXT')
+MATCHES = ['id', 'text', 'fuzzy']
+
+
+def source_text(elem):
+    """Text of a segment_source element, from its first text child or all its text."""
+    for child in elem:
+        if child.tag in TEXT_TAGS:
+            return child.text or u''
+    return u''.join(elem.itertext())
+
+
+def parallel_segments(xml):
+    """Lazily generate the source segment of every parallel element of an ELISA file.
+
+    The segment is the first segment_source inside the parallel element.
+    The file is read with iterparse and every parallel element is dropped
+    once its segment is out, so memory does not grow with the file.
+
+    Inputs
+    ------
+    xml : str or file
+        ELISA XML file.
+
+    Outputs
+    -------
+    segments : tuple generator
+        (segment id, source text) in file order.
+    """
+    name = None
+    text = None
+    depth = 0
+    for event, elem in etree.iterparse(xml, events=('start', 'end'), tag=PARALLEL_TAGS + SOURCE_TAGS,
+                                       recover=True, huge_tree=True):
+        if elem.tag in PARALLEL_TAGS:
+            if event == 'start':
+                depth += 1
+                continue
+            depth -= 1
+            if depth > 0:
+                continue  # nested parallel, its outer element decides
+            if name is None:
+                raise ValueError('parallel element without segment_source id on line %s of %s'
+                                 % (elem.sourceline, xml))
+            yield name, text
+            name = None
+            elem.clear()
+            while elem.getprevious() is not None:
+                del elem.getparent()[0]
+        elif event == 'end' and depth > 0 and name is None:
+            name = elem.get('id')
+            text = source_text(elem)
+
+
+def segment_ids(xml):
+    """Lazily generate the segment id of every parallel element of an ELISA file, see parallel_segments."""
+    for name, text in parallel_segments(xml):
+        yield name
+
+
+def matched_names(xml, ltf_split, match='id', summary=None):
+    """Lazily generate the split file name of every parallel segment of an ELISA file.
+
+    Inputs
+    ------
+    match : str, optional
+        'id' takes the segment id as the file name. 'text' looks the source
+        text up among the ORIGINAL_TEXT of the split ltf files, so that
+        segments renumbered by a release are still found, and 'fuzzy' falls
+        back to near duplicates of the text, see segment_match.
+    summary : dict, optional
+        Gets matched, the number of segments per way they were matched, and
+        unmatched, the ids of the segments with no split file.
+    """
+    if summary is None:
+        summary = {}
+    summary['matched'] = {}
+    summary['unmatched'] = []
+    matcher = None
+    if match != 'id':
+        matcher = SegmentMatcher.from_dir(ltf_split, fuzzy=match == 'fuzzy')
+    for seg_id, text in parallel_segments(xml):
+        if matcher is None:
+            name, how = seg_id, 'id'
+        else:
+            name, how = matcher.match(seg_id, text)
+        if name is None:
+            summary['unmatched'].append(seg_id)
+            log.debug('no split file for segment %s', seg_id)
+            continue
+        summary['matched'][how] = summary['matched'].get(how, 0) + 1
+        yield name
+
+
+def xml2lxf(xml, ltf_split, ltf_match, laf_split, laf_match, mode='copy', threads=8, match='id'):
+    """Put the segment ltf and laf files of every parallel segment of an ELISA file in the match dirs.
+
+    Outputs
+    -------
+    summary : dict
+        See materialize.materialize, the ltf and laf files together, and
+        matched_names.
+    """
+    if match not in MATCHES:
+        raise ValueError('unknown match %s, expected one of %s' % (match, ', '.join(MATCHES)))
+    matched = {}
+
+    def pairs():
+        for name in matched_names(xml, ltf_split, match, matched):
+            yield ltf_split +name+'.ltf.xml', os.path.join(ltf_match, name+'.ltf.xml')
+            yield laf_split +name+'.laf.xml', os.path.join(laf_match, name+'.laf.xml')
+    summary = materialize(pairs(), mode, threads)
+    summary.update(matched)
+    return summary
 
 
 if __name__ == '__main__':
-    if len(sys.argv) != 6:
-        print 'USAGE:python match_xml_yoruba.py <input file><ltf_split dir><ltf_match dir><laf_split dir><laf_match dir>'
+    mode = pop_option(sys.argv, '--mode', 'copy')  # hardlink, symlink or clone instead of copying the bytes
+    threads = pop_option(sys.argv, '--threads', 8, int)
+    match = pop_option(sys.argv, '--match', 'id')  # text or fuzzy find renumbered segments by their text
+    log_level = pop_option(sys.argv, '--log-level', 'info')  # debug shows every unmatched segment
+    if match not in MATCHES or mode not in MODES or len(sys.argv) != 6:
+        if match not in MATCHES:
+            print 'unknown --match %s' % match
+        if mode not in MODES:
+            print 'unknown --mode %s' % mode
+        print 'USAGE:python match_xml_yoruba.py [--mode copy|hardlink|symlink|clone] [--threads N] [--match id|text|fuzzy] [--log-level level] <input file><ltf_split dir><ltf_match dir><laf_split dir><laf_match dir>'
         print 'this script will match all files in elisa file & LDC file and put result in match dir'
     else:
+        setup_logging(log_level)
         in_file = sys.argv[1]
         ltf_split = sys.argv[2]
         ltf_match = sys.argv[3]
         laf_split = sys.argv[4]
         laf_match = sys.argv[5]
-        xml2lxf(in_file, ltf_split, ltf_match, laf_split, laf_match)
+        summary = xml2lxf(in_file, ltf_split, ltf_match, laf_split, laf_match, mode, threads, match)
+        for src in summary['missing']:
+            print 'missing ' + src
+        for src, error in summary['failed']:
+            print 'failed ' + src + ': ' + error
+        print '%d segments matched (%s), %d unmatched' % (sum(summary['matched'].values()), ', '.join(
+            '%d by %s' % (summary['matched'][how], how) for how in sorted(summary['matched'])) or 'none',
+            len(summary['unmatched']))
+        placed = ', '.join('%d by %s' % (summary['placed'][m], m) for m in MODES + [SAME] if summary['placed'][m])
+        print '%d files placed (%s), %d missing, %d failed' % (sum(summary['placed'].values()), placed or 'none',
+                                                               len(summary['missing']), len(summary['failed']))
 
 
 
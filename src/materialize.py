@@ -0,0 +1,154 @@
+#-*- coding: utf-8 -*-
+import collections
+import errno
+import fcntl
+import os
+import shutil
+from multiprocessing.pool import ThreadPool
+
+MODES = ['copy', 'hardlink', 'symlink', 'clone']
+SAME = 'same'  # dst already is src, left as it is
+FICLONE = 0x40049409  # linux/fs.h, btrfs, xfs with reflink=1, ...
+COPY_BUFFER = 1024 * 1024
+
+
+def _copy(src, dst):
+    with open(src, 'rb') as fsrc:
+        with open(dst, 'wb') as fdst:
+            shutil.copyfileobj(fsrc, fdst, COPY_BUFFER)
+
+
+def _clone(src, dst):
+    """Copy on write clone of src, raises IOError where the filesystem can not share the blocks."""
+    with open(src, 'rb') as fsrc:
+        with open(dst, 'wb') as fdst:
+            fcntl.ioctl(fdst.fileno(), FICLONE, fsrc.fileno())
+
+
+def _replace(dst):
+    """Remove dst, so that writing it never goes through a link made by an earlier run into the source."""
+    try:
+        os.remove(dst)
+    except OSError as e:
+        if e.errno != errno.ENOENT:
+            raise
+
+
+def place_file(src, dst, mode='copy'):
+    """Make dst hold the content of src.
+
+    hardlink falls back to a copy across filesystems and clone wherever the
+    filesystem has no copy on write support. When dst already is src, the
+    same path or a hardlink, it is left alone: replacing it would delete
+    the only copy.
+
+    Inputs
+    ------
+    src : str
+        Existing file.
+    dst : str
+        Destination file, replaced when it exists.
+    mode : str, optional
+        One of MODES.
+
+    Outputs
+    -------
+    mode : str
+        How the file was actually placed, SAME when it was already there.
+    """
+    if os.path.exists(dst) and not os.path.islink(dst) and os.path.samefile(src, dst):
+        return SAME
+    _replace(dst)
+    if mode == 'hardlink':
+        try:
+            os.link(src, dst)
+            return mode
+        except OSError as e:
+            if e.errno not in (errno.EXDEV, errno.EPERM, errno.EMLINK):
+                raise
+    elif mode == 'symlink':
+        os.symlink(os.path.abspath(src), dst)
+        return mode
+    elif mode == 'clone':
+        try:
+            _clone(src, dst)
+            return mode
+        except (IOError, OSError):
+            pass
+    elif mode != 'copy':
+        raise ValueError('unknown mode %s, expected one of %s' % (mode, ', '.join(MODES)))
+    _copy(src, dst)
+    return 'copy'
+
+
+def _place(job):
+    src, dst, mode = job
+    if not os.path.isfile(src):
+        return src, None, None
+    return src, place_file(src, dst, mode), None
+
+
+def materialize(pairs, mode='copy', threads=8):
+    """Place many files at once, in this process.
+
+    The files are placed by a pool of threads so that the reads and writes
+    of several files overlap; there is no process per file as with cp.
+
+    Inputs
+    ------
+    pairs : iterable of tuples
+        (source file, destination file). When several pairs have the same
+        destination, only the last one is placed, as a sequence of copies
+        would leave it, and no two threads write the same file.
+    mode : str, optional
+        See place_file.
+    threads : int, optional
+        Number of files placed at the same time.
+
+    Outputs
+    -------
+    summary : dict
+        placed, the number of files placed per actual mode (SAME
+        included), missing, the sources that do not exist, failed, (source,
+        error) of the files that could not be placed, and duplicates, the
+        number of pairs dropped for a later one with the same destination.
+    """
+    if mode not in MODES:
+        raise ValueError('unknown mode %s, expected one of %s' % (mode, ', '.join(MODES)))
+    summary = {'placed': dict((m, 0) for m in MODES + [SAME]), 'missing': [], 'failed': [], 'duplicates': 0}
+    by_dst = collections.OrderedDict()
+    for src, dst in pairs:
+        key = os.path.normpath(dst)
+        if key in by_dst:
+            summary['duplicates'] += 1
+            del by_dst[key]  # the last pair takes the place of the first
+        by_dst[key] = (src, dst)
+
+    def place(job):
+        try:
+            return _place(job)
+        except (IOError, OSError) as e:
+            return job[0], None, str(e)
+
+    jobs = [(src, dst, mode) for src, dst in by_dst.values()]
+    if threads <= 1:
+        outcomes = (place(job) for job in jobs)
+        pool = None
+    else:
+        pool = ThreadPool(threads)
+        outcomes = pool.imap_unordered(place, jobs, 64)
+    try:
+        for src, placed, error in outcomes:
+            if error is not None:
+                summary['failed'].append((src, error))
+            elif placed is None:
+                summary['missing'].append(src)
+            else:
+                summary['placed'][placed] += 1
+    finally:
+        if pool is not None:
+            pool.close()
+            pool.join()
+    summary['missing'].sort()
+    summary['failed'].sort()
+    return summary
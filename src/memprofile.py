@@ -0,0 +1,158 @@
+#-*- coding: utf-8 -*-
+import json
+import multiprocessing
+import os
+import shutil
+import sys
+import tempfile
+
+from cli_options import pop_flag, pop_option
+from instrument import STAGES, current_rss_kb, peak_rss_kb, profile_memory, reset_peak_rss, setup_logging
+from synth_corpus import make_corpus
+import trans_hau
+import transfer_hausa
+import transfer_yoruba
+
+SIZES = '50,200,800,3200'  # segments of the single document of each corpus
+
+
+def split_trans_hau(ltf, laf, outdir, stream):
+    return trans_hau.split_pair(ltf, laf, outdir, outdir, stream)
+
+
+def split_transfer_yoruba(ltf, laf, outdir, stream):
+    return transfer_yoruba.split_pair(ltf, laf, outdir, outdir, stream)
+
+
+def split_transfer_hausa(ltf, laf, outdir, stream):
+    return transfer_hausa.split_document(ltf, 'ltf', outdir)
+
+PATHS = [('trans_hau', split_trans_hau), ('transfer_yoruba', split_transfer_yoruba),
+         ('transfer_hausa', split_transfer_hausa)]
+
+
+def profile_document(name, ltf, laf, stream, stages=False):
+    """Split one document and measure the memory it took, run in a fresh process.
+
+    Outputs
+    -------
+    profile : dict
+        start_kb, the RSS before the split, peak_kb, the peak RSS during it,
+        and with stages, stage_peak_kb when the path reports per stage peaks.
+    """
+    profile_memory(True, stages)
+    func = dict(PATHS)[name]
+    outdir = tempfile.mkdtemp()
+    try:
+        start_kb = current_rss_kb()
+        resets = reset_peak_rss()
+        summary = func(ltf, laf, outdir, stream)
+        peak_kb = peak_rss_kb()
+    finally:
+        shutil.rmtree(outdir)
+    profile = {'start_kb': start_kb, 'peak_kb': peak_kb, 'peak_resets': resets}
+    if 'memory' in summary:
+        profile['top_allocations'] = summary['memory'].get('top_allocations')
+        if 'peak_kb' in summary['memory']:
+            profile['stage_peak_kb'] = summary['memory']['peak_kb']
+            profile['stage_allocations'] = summary['memory'].get('stage_allocations')
+    return profile
+
+
+def sweep(sizes, workdir, paths=None, tokens=20, density=0.1, seed=0, stream=False, stages=False):
+    """Profile every path on one document of every size, each in its own process.
+
+    Outputs
+    -------
+    report : dict
+        path -> str(segments) -> profile, see profile_document, with the
+        input size in bytes.
+    """
+    report = {}
+    for size in sizes:
+        corpus = os.path.join(workdir, 'memory-%dx%d-%g-%d' % (size, tokens, density, seed))
+        if not os.path.isdir(corpus):
+            make_corpus(corpus, 1, size, tokens, density, seed)
+        ltf = os.path.join(corpus, 'SYN_000000.ltf.xml')
+        laf = os.path.join(corpus, 'SYN_000000.laf.xml')
+        for name, func in PATHS:
+            if paths is not None and name not in paths:
+                continue
+            pool = multiprocessing.Pool(1, maxtasksperchild=1)
+            try:
+                profile = pool.apply(profile_document, (name, ltf, laf, stream, stages))
+            finally:
+                pool.close()
+                pool.join()
+            profile['input_bytes'] = os.path.getsize(ltf) + os.path.getsize(laf)
+            profile['tokens'] = size * tokens
+            report.setdefault(name, {})[str(size)] = profile
+    return report
+
+
+def growth(profiles):
+    """Least squares slope of the RSS growth against the input size, in bytes per input byte."""
+    points = [(float(profile['input_bytes']), (profile['peak_kb'] - profile['start_kb']) * 1024.0)
+              for profile in profiles]
+    if len(points) < 2:
+        return None
+    mean_x = sum(x for x, y in points) / len(points)
+    mean_y = sum(y for x, y in points) / len(points)
+    var = sum((x - mean_x) ** 2 for x, y in points)
+    if var == 0:
+        return None
+    return sum((x - mean_x) * (y - mean_y) for x, y in points) / var
+
+
+def print_report(report, sizes, baseline=None):
+    for name, func in PATHS:
+        if name not in report:
+            continue
+        print name
+        print '  %8s %9s %9s %9s %9s  %s' % ('segments', 'input MB', 'start MB', 'peak MB', 'growth', 'stage peaks MB')
+        for size in sizes:
+            profile = report[name].get(str(size))
+            if profile is None:
+                continue
+            line = '  %8d %9.2f %9.1f %9.1f %9.1f' % (size, profile['input_bytes'] / 1048576.0,
+                                                      profile['start_kb'] / 1024.0, profile['peak_kb'] / 1024.0,
+                                                      (profile['peak_kb'] - profile['start_kb']) / 1024.0)
+            if 'stage_peak_kb' in profile:
+                line += '  ' + ' '.join('%s %.1f' % (stage, profile['stage_peak_kb'][stage] / 1024.0)
+                                        for stage in STAGES[1:])
+            old = (baseline or {}).get(name, {}).get(str(size))
+            if old is not None:
+                line += '   %+.1f MB vs baseline' % ((profile['peak_kb'] - old['peak_kb']) / 1024.0)
+            print line
+        slope = growth([report[name][str(size)] for size in sizes if str(size) in report[name]])
+        if slope is not None:
+            print '  rss grows by %.1f bytes per input byte' % slope
+
+if __name__ == '__main__':
+    sizes = [int(size) for size in pop_option(sys.argv, '--sizes', SIZES).split(',')]
+    paths = pop_option(sys.argv, '--paths')  # comma separated, all of them by default
+    tokens = pop_option(sys.argv, '--tokens', 20, int)
+    density = pop_option(sys.argv, '--density', 0.1, float)
+    seed = pop_option(sys.argv, '--seed', 0, int)
+    stream = pop_flag(sys.argv, '--stream')
+    stages = pop_flag(sys.argv, '--stages')  # peak rss per stage as well, slows the splits down
+    baseline_path = pop_option(sys.argv, '--baseline')  # compare with a report saved by --save
+    save_path = pop_option(sys.argv, '--save')
+    if len(sys.argv) != 2:
+        print 'USAGE: python memprofile.py [--sizes N,...] [--paths trans_hau,transfer_yoruba,transfer_hausa] [--tokens N] [--density p] [--seed N] [--stream] [--stages] [--baseline file] [--save file] <work dir>'
+        print 'this script will measure the peak memory of splitting synthetic documents of growing size, one process per document'
+    else:
+        setup_logging('error')
+        workdir = sys.argv[1]
+        if not os.path.isdir(workdir):
+            os.makedirs(workdir)
+        report = sweep(sizes, workdir, paths and paths.split(','), tokens, density, seed, stream, stages)
+        baseline = None
+        if baseline_path is not None:
+            with open(baseline_path) as f:
+                baseline = json.load(f)
+        print_report(report, sizes, baseline)
+        if save_path is not None:
+            with open(save_path, 'w') as f:
+                json.dump(report, f, indent=1, sort_keys=True, separators=(',', ': '))
+                f.write('\n')
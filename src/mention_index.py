@@ -0,0 +1,141 @@
+#-*- coding: utf-8 -*-
+import bisect
+
+
+class MentionIndex(object):
+    """
+    Offset index over the mentions of a LAF document.
+
+    The EXTENT of every annotation is read once and the mentions are kept
+    sorted by start_char, so the mentions contained in a segment are found
+    with a bisect instead of a scan over every annotation of the document.
+
+    Inputs
+    ------
+    annotations : iterable of lxml.etree.Element
+        ANNOTATION elements, e.g. from LAFDocument.annotations().
+
+    Attributes
+    ----------
+    starts : list of int
+        Sorted start_char of the well formed mentions.
+    """
+    def __init__(self, annotations):
+        self._build(_annotation_mentions(annotations))
+
+    @classmethod
+    def from_mentions(cls, mentions, keep_records=False):
+        """Build the index from compact mention records.
+
+        Inputs
+        ------
+        mentions : iterable of streaming.Mention
+            Records, e.g. from StreamingLAFDocument.iter_mentions().
+        keep_records : bool, optional
+            contained() returns the records themselves rather than lists.
+        """
+        index = cls.__new__(cls)
+        if keep_records:
+            index._build((record.start_char, record.end_char, record) for record in mentions)
+        else:
+            index._build(_record_mentions(mentions))
+        return index
+
+    def _build(self, mentions):
+        entries = []
+        self.inverted = []  # end_char < start_char, can not be bisected on start_char
+        for order, (start_char, end_char, mention) in enumerate(mentions):
+            entry = (start_char, end_char, order, mention)
+            if end_char < start_char:
+                self.inverted.append(entry)
+            else:
+                entries.append(entry)
+        entries.sort(key=lambda entry: entry[0])
+        self.entries = entries
+        self.starts = [entry[0] for entry in entries]
+
+    def __len__(self):
+        return len(self.entries) + len(self.inverted)
+
+    def mentions(self):
+        """Every mention of the index, in the order of the LAF document."""
+        return [entry[3] for entry in sorted(self.entries + self.inverted, key=lambda entry: entry[2])]
+
+    def contained(self, start_char, end_char):
+        """Return the mentions lying inside [start_char, end_char].
+
+        A mention is contained when start_char <= mention start and
+        mention end <= end_char, the rule the split scripts always used.
+        Mentions come back in the order of the LAF document.
+
+        Inputs
+        ------
+        start_char : int or str
+            Character onset of the segment.
+        end_char : int or str
+            Character offset of the segment.
+
+        Outputs
+        -------
+        mentions : list of lists
+            Mentions of the form [entity_id, type, extent, start_char, end_char],
+            offsets kept as the strings found in the LAF file; the records
+            themselves for an index built with keep_records.
+        """
+        start_char = int(start_char)
+        end_char = int(end_char)
+        found = []
+        i = bisect.bisect_left(self.starts, start_char)
+        n = len(self.starts)
+        while i < n and self.starts[i] <= end_char:
+            entry = self.entries[i]
+            if entry[1] <= end_char:
+                found.append(entry)
+            i += 1
+        for entry in self.inverted:
+            if start_char <= entry[0] and entry[1] <= end_char:
+                found.append(entry)
+        found.sort(key=lambda entry: entry[2])
+        return [entry[3] for entry in found]
+
+    def segment_mentions(self, segment):
+        """contained() within the offsets of a SEG element, the mention lookup of split_driver.split_segments."""
+        return self.contained(segment.get('start_char'), segment.get('end_char'))
+
+    def subset(self, start_char, end_char):
+        """Return a smaller index holding only the mentions inside [start_char, end_char].
+
+        Used to route to a worker the mentions of the segments it is given;
+        contained() answers the same on the subset for any span inside
+        [start_char, end_char].
+        """
+        index = MentionIndex.__new__(MentionIndex)
+        lo = bisect.bisect_left(self.starts, start_char)
+        hi = bisect.bisect_right(self.starts, end_char)
+        index.entries = [entry for entry in self.entries[lo:hi] if entry[1] <= end_char]
+        index.starts = [entry[0] for entry in index.entries]
+        index.inverted = [entry for entry in self.inverted if start_char <= entry[0] and entry[1] <= end_char]
+        return index
+
+
+def _annotation_mentions(annotations):
+    for annotation in annotations:
+        extent = annotation.xpath('EXTENT')[0]
+        laf_start_char = extent.get('start_char')
+        laf_end_char = extent.get('end_char')
+        mention = [annotation.get('id'),
+                   annotation.get('type'),
+                   extent.text,
+                   laf_start_char,
+                   laf_end_char]
+        yield int(laf_start_char), int(laf_end_char), mention
+
+
+def _record_mentions(mentions):
+    for record in mentions:
+        mention = [record.entity_id,
+                   record.type,
+                   record.extent,
+                   record.start_attr,
+                   record.end_attr]
+        yield record.start_char, record.end_char, mention
@@ -0,0 +1,132 @@
+#-*- coding: utf-8 -*-
+import json
+import multiprocessing
+import sys
+import time
+import traceback
+
+STATE_KEYS = ['laf_digests']  # summary keys kept for the run state, left out of manifests
+
+
+def _run_job(job):
+    """Run one job and time it, turning any exception into an error string."""
+    func, args = job
+    start = time.time()
+    try:
+        result = func(*args)
+        error = None
+    except Exception:
+        result = None
+        error = traceback.format_exc()
+    return result, error, time.time() - start
+
+
+def iter_jobs(func, jobs, workers=1, chunksize=1, pool=None):
+    """Run func over every job, in a process pool when workers > 1.
+
+    A job that raises does not stop the others, its traceback is returned
+    instead of a result. Outcomes are yielded in job order as soon as they
+    are ready, whatever the order the workers finish in, so that the caller
+    can consume a result before the later jobs are done.
+
+    Inputs
+    ------
+    func : callable
+        Module level function, so that it can be sent to the workers.
+    jobs : list of tuples
+        Positional arguments of each call.
+    workers : int, optional
+        Number of processes. 1 runs everything in this process.
+    chunksize : int, optional
+        Number of jobs handed to a worker at a time.
+    pool : multiprocessing.Pool, optional
+        Pool to run the jobs on instead of a new one, e.g. shared by the
+        requests of daemon.py. It is left open and workers is ignored.
+
+    Outputs
+    -------
+    outcomes : generator of tuples
+        (args, result, error, seconds) for every job.
+    """
+    tasks = [(func, args) for args in jobs]
+    if pool is not None:
+        for args, outcome in zip(jobs, pool.imap(_run_job, tasks, chunksize)):
+            yield (args,) + outcome
+        return
+    if workers <= 1:
+        for args, task in zip(jobs, tasks):
+            yield (args,) + _run_job(task)
+        return
+    pool = multiprocessing.Pool(workers)
+    try:
+        for args, outcome in zip(jobs, pool.imap(_run_job, tasks, chunksize)):
+            yield (args,) + outcome
+    finally:
+        pool.close()
+        pool.join()
+
+
+def run_jobs(func, jobs, workers=1, chunksize=1):
+    """Run func over every job and return all the outcomes, see iter_jobs.
+
+    Outputs
+    -------
+    results : list of tuples
+        (args, result, error, seconds) for every job, in job order.
+    """
+    return list(iter_jobs(func, jobs, workers, chunksize))
+
+
+def build_manifest(results, names):
+    """Turn run_jobs results into a manifest.
+
+    Inputs
+    ------
+    results : list of tuples
+        Output of run_jobs, the jobs returning a dict summary of the document
+        (doc_id, ltf_files, laf_files, mentions, ...).
+    names : list of str
+        Name of each positional job argument, used as manifest keys.
+
+    Outputs
+    -------
+    manifest : dict
+        documents in job order, the number of failures, and collisions:
+        output files written by more than one document, whose content depends
+        on which document was split last.
+    """
+    documents = []
+    writers = {}
+    for args, result, error, seconds in results:
+        entry = dict(zip(names, args))
+        entry['seconds'] = round(seconds, 6)
+        entry['error'] = error
+        if result is not None:
+            entry.update(result)
+            for key in STATE_KEYS:
+                entry.pop(key, None)
+            for key in ('ltf_files', 'laf_files'):
+                for path in result.get(key, []):
+                    writers.setdefault(path, []).append(result.get('doc_id'))
+        documents.append(entry)
+    collisions = dict((path, doc_ids) for path, doc_ids in writers.items() if len(doc_ids) > 1)
+    return {'documents': documents,
+            'failed': sum(1 for entry in documents if entry['error'] is not None),
+            'collisions': collisions}
+
+
+def write_manifest(manifest, path):
+    """Write a manifest as JSON with sorted keys, so reruns diff cleanly."""
+    with open(path, 'w') as f:
+        json.dump(manifest, f, indent=1, sort_keys=True, separators=(',', ': '))
+        f.write('\n')
+
+
+def report_failures(manifest, out=sys.stderr):
+    """Print the failed documents of a manifest, return their number."""
+    for entry in manifest['documents']:
+        if entry['error'] is not None:
+            out.write('failed: %s\n%s' % (entry.get('ltf') or entry.get('lxf'), entry['error']))
+    for path in sorted(manifest['collisions']):
+        out.write('written by several documents: %s\n' % path)
+    return manifest['failed']
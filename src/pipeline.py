@@ -0,0 +1,168 @@
+#-*- coding: utf-8 -*-
+import collections
+import Queue
+import threading
+import time
+import traceback
+
+from serialize import write_bytes
+
+WRITE_QUEUE = 16  # batches of segment files waiting for each writer thread
+WRITE_BATCH = 64  # segment files handed to a writer thread at a time
+_DONE = object()
+
+
+def _get(queue):
+    """Queue.get for the main thread, waiting with a timeout so that Ctrl-C gets through under python 2."""
+    while True:
+        try:
+            return queue.get(True, 1.0)
+        except Queue.Empty:
+            pass
+
+
+def _put(queue, item):
+    """Queue.put, waiting with a timeout for the same reason."""
+    while True:
+        try:
+            return queue.put(item, True, 1.0)
+        except Queue.Full:
+            pass
+
+
+class _Pending(object):
+    """A split document whose files are being written."""
+    def __init__(self, args, summary, error, seconds, batches):
+        self.args = args
+        self.summary = summary
+        self.error = error
+        self.seconds = seconds
+        self.remaining = batches
+        self.write_seconds = 0.0
+        self.done = threading.Event()
+        if batches == 0:
+            self.done.set()
+
+    def outcome(self):
+        while not self.done.wait(1.0):  # a wait with a timeout can be interrupted
+            pass
+        if self.error is not None:
+            return self.args, None, self.error, self.seconds
+        if 'stages' in self.summary:
+            self.summary['stages']['write'] = self.summary['stages'].get('write', 0.0) + self.write_seconds
+        return self.args, self.summary, None, self.seconds + self.write_seconds
+
+
+def _reader(read, jobs, loaded):
+    for args in jobs:
+        start = time.time()
+        try:
+            loaded.put((args, read(args), None, time.time() - start))
+        except Exception:
+            loaded.put((args, None, traceback.format_exc(), time.time() - start))
+    loaded.put(_DONE)
+
+
+def _writer(records, lock):
+    while True:
+        record = records.get()
+        if record is _DONE:
+            return
+        pending, files = record
+        start = time.time()
+        try:
+            for path, data in files:
+                write_bytes(path, data)
+            error = None
+        except Exception:
+            error = traceback.format_exc()
+        with lock:
+            pending.write_seconds += time.time() - start
+            if error is not None and pending.error is None:
+                pending.error = error
+            pending.remaining -= 1
+            if pending.remaining == 0:
+                pending.done.set()
+
+
+def iter_pipeline(read, split, jobs, depth=4, writers=2):
+    """Run read, split and the file writes of every job as three overlapping stages.
+
+    A reader thread parses the documents of the next jobs while this thread
+    splits the current one, and a pool of writer threads writes the files
+    of the previous ones. lxml lets other threads run while it parses and
+    file writes do too, so the stages overlap in spite of the GIL. The
+    stages are connected by bounded queues: the reader stops when depth
+    parsed documents are waiting, the splitting when WRITE_QUEUE batches of
+    files are waiting for a writer, which caps the memory held in flight.
+
+    Every path goes to the writer chosen by its hash, and each writer
+    writes its batches in order, so when documents share segment file
+    names (trans_ben.py, transfer_yoruba.py) no two threads write the same
+    file and the last document wins, as when splitting one document after
+    the other.
+
+    Inputs
+    ------
+    read : callable
+        read(args) -> loaded documents, run in the reader thread.
+    split : callable
+        split(loaded, args) -> summary holding ltf_records and laf_records,
+        lists of (path, bytes), see split_segments with keep_bytes.
+    jobs : list of tuples
+        Job arguments.
+    depth : int, optional
+        Documents read ahead.
+    writers : int, optional
+        Writer threads.
+
+    Outputs
+    -------
+    outcomes : generator of tuples
+        (args, summary, error, seconds) for every job, in job order, as
+        parallel.iter_jobs gives them, once all the files of the job are
+        written. The records are popped from the summaries.
+    """
+    loaded = Queue.Queue(max(depth, 1))
+    writers = max(writers, 1)
+    queues = [Queue.Queue(WRITE_QUEUE) for k in range(writers)]
+    lock = threading.Lock()
+    threads = [threading.Thread(target=_reader, args=(read, jobs, loaded))]
+    threads += [threading.Thread(target=_writer, args=(queue, lock)) for queue in queues]
+    for thread in threads:
+        thread.daemon = True  # do not keep the process alive when the caller stops early
+        thread.start()
+    pending = collections.deque()
+    try:
+        while True:
+            item = _get(loaded)
+            if item is _DONE:
+                break
+            args, documents, error, seconds = item
+            summary = None
+            files = []
+            if error is None:
+                start = time.time()
+                try:
+                    summary = split(documents, args)
+                    files = summary.pop('ltf_records') + summary.pop('laf_records')
+                except Exception:
+                    error = traceback.format_exc()
+                seconds += time.time() - start
+            documents = None
+            routed = [[] for queue in queues]
+            for record in files:
+                routed[hash(record[0]) % writers].append(record)
+            batches = [(queues[w], routed[w][k:k + WRITE_BATCH])
+                       for w in range(writers) for k in range(0, len(routed[w]), WRITE_BATCH)]
+            job = _Pending(args, summary, error, seconds, len(batches))
+            pending.append(job)
+            for queue, batch in batches:
+                _put(queue, (job, batch))
+            while pending and pending[0].done.is_set():
+                yield pending.popleft().outcome()
+        while pending:
+            yield pending.popleft().outcome()
+    finally:
+        for queue in queues:
+            _put(queue, _DONE)
@@ -0,0 +1,190 @@
+#-*- coding: utf-8 -*-
+import hashlib
+import json
+import os
+import re
+
+HASH_BLOCK = 1 << 20
+HEAD_BYTES = 1 << 16
+RAW_TEXT_MD5 = re.compile(br'<DOC\b[^>]*?\braw_text_md5\s*=\s*["\']([0-9A-Fa-f]+)["\']')
+
+
+def file_md5(path):
+    """md5 hex digest of the content of a file."""
+    md5 = hashlib.md5()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(HASH_BLOCK), b''):
+            md5.update(block)
+    return md5.hexdigest()
+
+
+def raw_text_md5(path):
+    """raw_text_md5 attribute of the DOC element of an LTF file, None if absent."""
+    with open(path, 'rb') as f:
+        match = RAW_TEXT_MD5.search(f.read(HEAD_BYTES))
+    return None if match is None else match.group(1).decode('ascii')
+
+
+def file_fingerprint(path, previous=None):
+    """Describe the content of an input file.
+
+    The md5 of the file is only computed again when its size or mtime moved
+    since the previous fingerprint, so unchanged inputs are not read.
+
+    Inputs
+    ------
+    path : str
+        Input file.
+    previous : dict, optional
+        Fingerprint recorded by an earlier run.
+
+    Outputs
+    -------
+    fingerprint : dict
+        size, mtime, md5 and, for LTF files, raw_text_md5.
+    """
+    stat = os.stat(path)
+    if previous is not None and previous['size'] == stat.st_size and previous['mtime'] == stat.st_mtime:
+        return previous
+    return {'size': stat.st_size, 'mtime': stat.st_mtime, 'md5': file_md5(path),
+            'raw_text_md5': raw_text_md5(path)}
+
+
+def same_content(a, b):
+    return a is not None and b is not None and a['md5'] == b['md5'] and a['raw_text_md5'] == b['raw_text_md5']
+
+
+class RunState(object):
+    """
+    Persistent record of the document pairs a split script already handled.
+
+    Every finished pair appends one JSON line to the state file: the
+    fingerprints of its LTF and LAF inputs, the summary of the split and the
+    size of every file it wrote. On the next run a pair is skipped when both
+    inputs have the same content and all of its outputs are still there with
+    their recorded size; the rest (new, changed, failed, or never finished
+    because the run was interrupted) is split again. A truncated last line
+    left by a crash is ignored.
+
+    With mentions set, a digest of every mention of the LAF input is
+    recorded too, so that a pair whose LAF document alone changed can have
+    only the affected segment LAF files rewritten, see laf_diff.relabel_pair.
+
+    Inputs
+    ------
+    path : str
+        State file, created if missing.
+    tool : str
+        Name of the script, part of the key so that scripts naming their
+        outputs differently do not share records.
+    mentions : bool, optional
+        Record the mention digests of the LAF inputs.
+
+    Attributes
+    ----------
+    records : dict
+        key -> latest record.
+    """
+    def __init__(self, path, tool, mentions=False):
+        self.path = path
+        self.tool = tool
+        self.mentions = mentions
+        self.records = {}
+        self.fingerprints = {}
+        if os.path.exists(path):
+            with open(path) as f:
+                for line in f:
+                    try:
+                        record = json.loads(line)
+                    except ValueError:
+                        continue  # interrupted while writing this line
+                    self.records[record['key']] = record
+        self.f = open(path, 'a')
+
+    def key(self, job):
+        """Key of a job: the tool, both inputs and both output directories."""
+        return '\t'.join([self.tool] + [str(arg) for arg in job[:4]])
+
+    def _outputs_intact(self, record):
+        for path, size in record['outputs']:
+            if not os.path.exists(path) or os.path.getsize(path) != size:
+                return False
+        return True
+
+    def split(self, jobs):
+        """Separate the jobs to run from the ones an earlier run completed.
+
+        Inputs
+        ------
+        jobs : list of tuples
+            (ltf, laf, ltf_split, laf_split, ...) job arguments.
+
+        Outputs
+        -------
+        todo : list of tuples
+            Jobs to run, in the given order.
+        resumed : list of tuples
+            (args, summary, None, 0.0) for the skipped jobs, shaped like
+            run_jobs results; the summaries are the recorded ones with
+            resumed set.
+        changed : list of tuples
+            (args, record) for the jobs whose LAF input alone changed, their
+            outputs being intact and their old mentions recorded. Always
+            empty without mentions.
+        """
+        todo = []
+        resumed = []
+        changed = []
+        for job in jobs:
+            key = self.key(job)
+            record = self.records.get(key)
+            try:
+                ltf = file_fingerprint(job[0], record and record['ltf'])
+                laf = file_fingerprint(job[1], record and record['laf'])
+            except (IOError, OSError):
+                todo.append(job)  # let the job report the missing input
+                continue
+            self.fingerprints[key] = (ltf, laf)
+            if record is None or not same_content(record['ltf'], ltf) or not self._outputs_intact(record):
+                todo.append(job)
+            elif same_content(record['laf'], laf):
+                summary = dict(record['summary'])
+                summary['resumed'] = True
+                resumed.append((job, summary, None, 0.0))
+            elif self.mentions and record.get('laf_digests') is not None:
+                changed.append((job, record))
+            else:
+                todo.append(job)
+        return todo, resumed, changed
+
+    def done(self, job, summary, digests=None):
+        """Record a job that completed, right away so that an interruption keeps it.
+
+        digests are the laf_diff.laf_digests of the LAF input, taken out
+        of the laf_digests of summary when not given, as split_pair returns
+        them. A pair recorded without them is split again rather than
+        relabeled when its LAF changes.
+        """
+        summary_digests = summary.pop('laf_digests', None)
+        if digests is None:
+            digests = summary_digests
+        key = self.key(job)
+        if key not in self.fingerprints:
+            return
+        ltf, laf = self.fingerprints[key]
+        outputs = [(path, os.path.getsize(path)) for path in summary['ltf_files'] + summary['laf_files']]
+        record = {'key': key, 'ltf': ltf, 'laf': laf, 'summary': summary, 'outputs': outputs}
+        if self.mentions and digests is not None:
+            record['laf_digests'] = digests
+        self.records[key] = record
+        self.f.write(json.dumps(record, sort_keys=True) + '\n')
+        self.f.flush()
+
+    def close(self):
+        """Rewrite the state file with only the latest record of every key."""
+        self.f.close()
+        temp = self.path + '.tmp'
+        with open(temp, 'w') as f:
+            for key in sorted(self.records):
+                f.write(json.dumps(self.records[key], sort_keys=True) + '\n')
+        os.rename(temp, self.path)
@@ -0,0 +1,159 @@
+#-*- coding: utf-8 -*-
+import hashlib
+import os
+import re
+import unicodedata
+import zlib
+
+from lxml import etree
+
+LTF_SUFFIX = '.ltf.xml'
+SPACES = re.compile(r'\s+', re.UNICODE)
+SHINGLE = 3  # characters per n-gram of the near duplicate signatures
+PERMUTATIONS = 32
+BANDS = 8  # PERMUTATIONS / BANDS hashes per band
+THRESHOLD = 0.8  # estimated Jaccard similarity a near duplicate needs
+_PRIME = (1 << 61) - 1
+_MASK = (1 << 32) - 1
+
+
+def normalize(text):
+    """Text as compared across releases: NFC, lower case, runs of white space as one space."""
+    if isinstance(text, bytes):
+        text = text.decode('utf-8')
+    return SPACES.sub(u' ', unicodedata.normalize('NFC', text)).strip().lower()
+
+
+def text_hash(text):
+    """Digest of the normalized text, the exact match key."""
+    return hashlib.md5(normalize(text).encode('utf-8')).digest()
+
+
+def _permutations(count, seed=1):
+    """count (a, b) pairs of the universal hashes (a * x + b) % _PRIME, fixed by seed."""
+    pairs = []
+    state = seed
+    for i in range(count):
+        state = (state * 6364136223846793005 + 1442695040888963407) % (1 << 64)
+        a = state % _PRIME or 1
+        state = (state * 6364136223846793005 + 1442695040888963407) % (1 << 64)
+        pairs.append((a, state % _PRIME))
+    return pairs
+
+_PAIRS = _permutations(PERMUTATIONS)
+
+
+def minhash(text):
+    """MinHash signature of the character n-grams of the normalized text.
+
+    The fraction of equal positions of two signatures estimates the Jaccard
+    similarity of their n-gram sets.
+
+    Outputs
+    -------
+    signature : tuple of int
+        PERMUTATIONS values, None for a text shorter than SHINGLE.
+    """
+    text = normalize(text).encode('utf-8')
+    if len(text) < SHINGLE:
+        return None
+    shingles = set(zlib.crc32(text[i:i + SHINGLE]) & _MASK for i in range(len(text) - SHINGLE + 1))
+    return tuple(min((a * x + b) % _PRIME for x in shingles) for a, b in _PAIRS)
+
+
+def similarity(signature, other):
+    """Estimated Jaccard similarity of two MinHash signatures."""
+    return sum(1 for x, y in zip(signature, other) if x == y) / float(len(signature))
+
+
+def segment_text(ltf_path):
+    """ORIGINAL_TEXT of the segments of an LTF file, joined by spaces."""
+    texts = []
+    for event, elem in etree.iterparse(ltf_path, events=('end',), tag='ORIGINAL_TEXT', huge_tree=True):
+        texts.append(elem.text or u'')
+        elem.clear()
+    return u' '.join(texts)
+
+
+class SegmentMatcher(object):
+    """
+    Finds the split LTF file of an ELISA segment from its text.
+
+    Every split file is indexed by the digest of its normalized text, so an
+    exact lookup is one dict access whatever the segment ids. With fuzzy on,
+    the files are also indexed by the bands of their MinHash signature, and
+    a text without an exact match is compared with the files sharing a band
+    only, which keeps matching close to linear in the number of segments.
+
+    Attributes
+    ----------
+    by_hash : dict
+        text digest -> names of the split files with that text.
+    by_band : list of dict
+        Per band, band values -> names, when fuzzy.
+    signatures : dict
+        name -> MinHash signature, when fuzzy.
+    """
+    def __init__(self, fuzzy=False, threshold=THRESHOLD):
+        self.fuzzy = fuzzy
+        self.threshold = threshold
+        self.by_hash = {}
+        self.by_band = [{} for band in range(BANDS)]
+        self.signatures = {}
+
+    def add(self, name, text):
+        self.by_hash.setdefault(text_hash(text), []).append(name)
+        if self.fuzzy:
+            signature = minhash(text)
+            if signature is None:
+                return
+            self.signatures[name] = signature
+            for band, key in enumerate(self._bands(signature)):
+                self.by_band[band].setdefault(key, []).append(name)
+
+    @classmethod
+    def from_dir(cls, ltf_split, fuzzy=False, threshold=THRESHOLD):
+        """Index every *.ltf.xml file of a split directory under its name without the suffix."""
+        matcher = cls(fuzzy, threshold)
+        for f in sorted(os.listdir(ltf_split)):
+            if f.endswith(LTF_SUFFIX):
+                matcher.add(f[:-len(LTF_SUFFIX)], segment_text(os.path.join(ltf_split, f)))
+        return matcher
+
+    @staticmethod
+    def _bands(signature):
+        rows = PERMUTATIONS // BANDS
+        return [signature[band * rows:(band + 1) * rows] for band in range(BANDS)]
+
+    def match(self, seg_id, text):
+        """Name of the split file of an ELISA segment.
+
+        An exact text match wins, among several the one named seg_id if any.
+        Without one the most similar near duplicate is taken when fuzzy.
+
+        Outputs
+        -------
+        name : str
+            None when nothing matches.
+        how : str
+            'hash' or 'minhash', None when nothing matches.
+        """
+        names = self.by_hash.get(text_hash(text))
+        if names:
+            return (seg_id if seg_id in names else names[0]), 'hash'
+        if not self.fuzzy:
+            return None, None
+        signature = minhash(text)
+        if signature is None:
+            return None, None
+        candidates = set()
+        for band, key in enumerate(self._bands(signature)):
+            candidates.update(self.by_band[band].get(key, ()))
+        best = None
+        for name in sorted(candidates):
+            score = similarity(signature, self.signatures[name])
+            if score >= self.threshold and (best is None or score > best[0]):
+                best = (score, name)
+        if best is None:
+            return None, None
+        return best[1], 'minhash'
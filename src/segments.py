@@ -0,0 +1,65 @@
+#-*- coding: utf-8 -*-
+import collections
+import sys
+
+from mention_index import MentionIndex
+from streaming import StreamingLAFDocument, StreamingLTFDocument
+from token_table import TokenTable
+
+# One segment of a document with its mentions, what the split scripts write as a pair of segment files.
+Segment = collections.namedtuple('Segment', ['doc_id', 'seg_id', 'start_char', 'end_char', 'text', 'tokens',
+                                             'mentions'])
+
+
+def iter_segments(pairs):
+    """Split LTF/LAF document pairs in memory, one segment record at a time.
+
+    The records hold what trans_hau.py, trans_tur.py and trans_ben.py write
+    to the segment files, without serializing or parsing them again: the LTF
+    document is streamed segment by segment, see streaming.py, and every
+    segment gets the mentions lying inside its offsets, the rule of the
+    split scripts. Only the mentions of the current document and one
+    segment are held at a time.
+
+    Inputs
+    ------
+    pairs : iterable of tuples
+        (ltf, laf) paths or file objects, e.g. the pairs of
+        discovery.discover_pairs.
+
+    Outputs
+    -------
+    segments : Segment generator
+        Records (doc_id, seg_id, start_char, end_char, text, tokens, mentions)
+        in document order. Offsets are ints, None when the SEG has none,
+        text is its ORIGINAL_TEXT, tokens a token_table.TokenTable of the
+        segment and mentions a list of streaming.Mention with document
+        offsets, in LAF order; align.align_mentions(tokens, mentions) gives
+        their tokens.
+    """
+    for ltf, laf in pairs:
+        ltf_doc = StreamingLTFDocument(ltf)
+        mention_index = MentionIndex.from_mentions(StreamingLAFDocument(laf).iter_mentions(), keep_records=True)
+        for seg_ in ltf_doc.segments():
+            start_char = seg_.get('start_char')
+            end_char = seg_.get('end_char')
+            mentions = []
+            if start_char is not None and end_char is not None:
+                start_char = int(start_char)
+                end_char = int(end_char)
+                mentions = mention_index.contained(start_char, end_char)
+            original_text = seg_.find('ORIGINAL_TEXT')
+            yield Segment(ltf_doc.doc_id, seg_.get('id'), start_char, end_char,
+                          original_text.text if original_text is not None else None,
+                          TokenTable([seg_]), mentions)
+
+if __name__ == '__main__':
+    if len(sys.argv) != 3:
+        print 'USAGE: python segments.py <ltf file> <laf file>'
+        print 'this script will list the segments of an ltf/laf document pair with their tokens and mentions, as the split scripts would split them'
+    else:
+        for segment in iter_segments([(sys.argv[1], sys.argv[2])]):
+            line = u'%s_%s\t%d tokens\t%s' % (segment.doc_id, segment.seg_id, len(segment.tokens),
+                                              u' '.join(u'%s:%s' % (mention.type, mention.extent)
+                                                        for mention in segment.mentions))
+            print line.encode('utf-8')
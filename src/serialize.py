@@ -0,0 +1,131 @@
+#-*- coding: utf-8 -*-
+import re
+
+from lxml import etree
+
+
+# What LTFDocument/LAFDocument(xmlf=None, ...).write_to_file produce around
+# the segment and the mentions, pretty printed by lxml.
+LTF_HEAD = (b"<?xml version='1.0' encoding='UTF-8'?>\n"
+            b'<!DOCTYPE LCTL_TEXT SYSTEM "ltf.v1.5.dtd">\n'
+            b'<LCTL_TEXT>\n'
+            b'  <DOC id="%s">\n'
+            b'    <TEXT>')
+LTF_TAIL = (b'</TEXT>\n'
+            b'  </DOC>\n'
+            b'</LCTL_TEXT>\n')
+LAF_HEAD = (b"<?xml version='1.0' encoding='UTF-8'?>\n"
+            b'<!DOCTYPE LCTL_ANNOTATIONS SYSTEM "laf.v1.2.dtd">\n'
+            b'<LCTL_ANNOTATIONS lang="%s">\n')
+LAF_EMPTY_DOC = b'  <DOC id="%s" lang="%s"/>\n'
+LAF_DOC = b'  <DOC id="%s" lang="%s">\n'
+LAF_ANNOTATION = (b'    <ANNOTATION id="%s" task="NE" type="%s">\n'
+                  b'      <EXTENT start_char="%s" end_char="%s"%s\n'
+                  b'    </ANNOTATION>\n')
+LAF_TAIL = (b'  </DOC>\n'
+            b'</LCTL_ANNOTATIONS>\n')
+
+# etree.tostring writes non-ASCII attribute characters of a detached
+# element as hex character references, the document writer keeps them raw.
+HEX_REFERENCE = re.compile(br'&#x([0-9A-Fa-f]+);')
+
+TEXT_ESCAPES = [(b'&', b'&amp;'), (b'<', b'&lt;'), (b'>', b'&gt;'), (b'\r', b'&#13;')]
+ATTRIBUTE_ESCAPES = TEXT_ESCAPES + [(b'"', b'&quot;'), (b'\n', b'&#10;'), (b'\t', b'&#9;')]
+
+
+def _utf8(value):
+    if not isinstance(value, bytes):
+        value = value.encode('utf-8')
+    return value
+
+
+def _raw_reference(match):
+    return (b'\\U%08x' % int(match.group(1), 16)).decode('unicode-escape').encode('utf-8')
+
+
+def escape_text(value):
+    """Escape character data the way libxml2 serializes it."""
+    value = _utf8(value)
+    for char, entity in TEXT_ESCAPES:
+        if char in value:
+            value = value.replace(char, entity)
+    return value
+
+
+def escape_attribute(value):
+    """Escape an attribute value the way libxml2 serializes it."""
+    value = _utf8(value)
+    for char, entity in ATTRIBUTE_ESCAPES:
+        if char in value:
+            value = value.replace(char, entity)
+    return value
+
+
+def ltf_bytes(doc_id, segment):
+    """Serialize a one segment LTF document.
+
+    Gives the same bytes as LTFDocument(xmlf=None, segment=segment,
+    doc_id=doc_id).write_to_file(), without building a tree, and leaves
+    segment where it is. Returns None for a segment without tail, which lxml
+    would re-indent; such segments have to go through LTFDocument.
+
+    Inputs
+    ------
+    doc_id : str
+        Id of the new document.
+    segment : lxml.etree.Element
+        SEG element, with the tail it had in its document.
+
+    Outputs
+    -------
+    data : bytes or None
+    """
+    if not segment.tail:
+        return None
+    body = etree.tostring(segment, encoding='utf-8', with_tail=True)
+    if b'&#x' in body:
+        body = HEX_REFERENCE.sub(_raw_reference, body)
+    return b''.join([LTF_HEAD % escape_attribute(doc_id), body, LTF_TAIL])
+
+
+def laf_bytes(doc_id, lang, mentions):
+    """Serialize a LAF document.
+
+    Gives the same bytes as LAFDocument(xmlf=None, mentions=mentions,
+    lang=lang, doc_id=doc_id).write_to_file(), without building a tree.
+
+    Inputs
+    ------
+    doc_id : str
+        Id of the new document.
+    lang : str
+        Document language.
+    mentions : list of tuples
+        (entity_id, type, extent, start_char, end_char), extent being the
+        text of the mention.
+
+    Outputs
+    -------
+    data : bytes
+    """
+    lang = escape_attribute(lang)
+    doc_id = escape_attribute(doc_id)
+    if not mentions:
+        return LAF_HEAD % lang + LAF_EMPTY_DOC % (doc_id, lang) + b'</LCTL_ANNOTATIONS>\n'
+    parts = [LAF_HEAD % lang, LAF_DOC % (doc_id, lang)]
+    for entity_id, type, extent, start_char, end_char in mentions:
+        if extent is None:
+            extent = b'/>'
+        else:
+            extent = b'>' + escape_text(extent) + b'</EXTENT>'
+        parts.append(LAF_ANNOTATION % (escape_attribute(entity_id), escape_attribute(type),
+                                       escape_attribute(str(start_char)), escape_attribute(str(end_char)),
+                                       extent))
+    parts.append(LAF_TAIL)
+    return b''.join(parts)
+
+
+def write_bytes(xmlf, data):
+    """Write a serialized document with a single write call."""
+    with open(xmlf, 'wb') as f:
+        f.write(data)
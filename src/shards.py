@@ -0,0 +1,180 @@
+#-*- coding: utf-8 -*-
+import os
+import sys
+
+SHARD_NAME = '%s-%05d.shard'
+INDEX_NAME = '%s.index'
+WRITE_BUFFER = 1 << 22
+
+
+def segment_key(path):
+    """Key of a segment file in a shard, '<doc>_<segment>' for the split scripts."""
+    name = os.path.basename(path)
+    for suffix in ('.ltf.xml', '.laf.xml'):
+        if name.endswith(suffix):
+            return name[:-len(suffix)]
+    return name
+
+
+class ShardWriter(object):
+    """
+    Appends segment files to size-bounded shard files.
+
+    Shards are named <prefix>-00000.shard, <prefix>-00001.shard, ... and
+    hold the segment files back to back, byte for byte what the split
+    scripts would have written to <doc>_<segment>.ltf.xml or .laf.xml. A
+    new shard is started when the current one would grow past max_bytes.
+    <prefix>.index has one tab separated line per record: key, shard
+    number, byte offset and length.
+
+    Inputs
+    ------
+    directory : str
+        Output directory.
+    prefix : str
+        Shard name prefix, e.g. 'ltf' or 'laf'.
+    max_bytes : int, optional
+        Size bound of a shard.
+    """
+    def __init__(self, directory, prefix, max_bytes=1 << 28):
+        self.directory = directory
+        self.prefix = prefix
+        self.max_bytes = max_bytes
+        self.shard = -1
+        self.offset = 0
+        self.f = None
+        self.index = open(os.path.join(directory, INDEX_NAME % prefix), 'w', WRITE_BUFFER)
+
+    def _next_shard(self):
+        if self.f is not None:
+            self.f.close()
+        self.shard += 1
+        self.offset = 0
+        self.f = open(os.path.join(self.directory, SHARD_NAME % (self.prefix, self.shard)), 'wb', WRITE_BUFFER)
+
+    def add(self, key, data):
+        """Append one segment file to the current shard.
+
+        Outputs
+        -------
+        location : str
+            <shard file>@<byte offset> of the record.
+        """
+        if self.f is None or (self.offset and self.offset + len(data) > self.max_bytes):
+            self._next_shard()
+        self.f.write(data)
+        self.index.write('%s\t%d\t%d\t%d\n' % (key, self.shard, self.offset, len(data)))
+        location = '%s@%d' % (os.path.join(self.directory, SHARD_NAME % (self.prefix, self.shard)), self.offset)
+        self.offset += len(data)
+        return location
+
+    def close(self):
+        if self.f is not None:
+            self.f.close()
+        self.index.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+class ShardReader(object):
+    """
+    Reads the segment files written by a ShardWriter.
+
+    A key can come more than once, when the segment files of two documents
+    have the same name (trans_ben.py and transfer_yoruba.py name them by
+    segment id alone). Iterating gives every record; get gives the last one
+    written, the file the split scripts would have left on disk.
+
+    Inputs
+    ------
+    directory : str
+        Directory holding the shards.
+    prefix : str
+        Shard name prefix, e.g. 'ltf' or 'laf'.
+
+    Attributes
+    ----------
+    rows : list of tuples
+        (key, shard, offset, length) of every record, in write order.
+    """
+    def __init__(self, directory, prefix):
+        self.directory = directory
+        self.prefix = prefix
+        self.rows = []
+        self.entries = {}
+        with open(os.path.join(directory, INDEX_NAME % prefix)) as f:
+            for line in f:
+                key, shard, offset, length = line.rstrip('\n').split('\t')
+                self.rows.append((key, int(shard), int(offset), int(length)))
+                self.entries[key] = self.rows[-1][1:]  # the last record of a key wins
+
+    def _path(self, shard):
+        return os.path.join(self.directory, SHARD_NAME % (self.prefix, shard))
+
+    def __len__(self):
+        return len(self.rows)
+
+    def __contains__(self, key):
+        return key in self.entries
+
+    def keys(self):
+        """Key of every record in write order, repeated keys included."""
+        return [row[0] for row in self.rows]
+
+    def get(self, key):
+        """Return the bytes of one segment file."""
+        shard, offset, length = self.entries[key]
+        with open(self._path(shard), 'rb') as f:
+            f.seek(offset)
+            return f.read(length)
+
+    def __iter__(self):
+        """Iterate over (key, bytes) in write order, reading each shard sequentially."""
+        f = None
+        current = None
+        try:
+            for key, shard, offset, length in self.rows:
+                if shard != current:
+                    if f is not None:
+                        f.close()
+                    f = open(self._path(shard), 'rb', WRITE_BUFFER)
+                    current = shard
+                f.seek(offset)
+                yield key, f.read(length)
+        finally:
+            if f is not None:
+                f.close()
+
+
+def shard_records(summary, ltf_shards, laf_shards):
+    """Move the segment files kept by a split job into the shard writers.
+
+    Inputs
+    ------
+    summary : dict
+        Summary of a split run with keep_bytes, holding ltf_records and
+        laf_records, lists of (path, bytes). Both are removed from it, and
+        its ltf_files and laf_files become the locations of the records,
+        see ShardWriter.add, since the segment files are never written.
+    ltf_shards : ShardWriter
+    laf_shards : ShardWriter
+    """
+    summary['ltf_files'] = [ltf_shards.add(segment_key(path), data) for path, data in summary.pop('ltf_records')]
+    summary['laf_files'] = [laf_shards.add(segment_key(path), data) for path, data in summary.pop('laf_records')]
+
+
+if __name__ == '__main__':
+    if len(sys.argv) not in (3, 4):
+        print 'USAGE: python shards.py <shard dir> <prefix> [key]'
+        print 'this script will list the keys of a shard set, or print one segment file'
+    else:
+        reader = ShardReader(sys.argv[1], sys.argv[2])
+        if len(sys.argv) == 4:
+            sys.stdout.write(reader.get(sys.argv[3]))
+        else:
+            for key in reader.keys():
+                print key
@@ -0,0 +1,640 @@
+#-*- coding: utf-8 -*-
+import itertools
+import logging
+import os
+import sys
+import StringIO
+import time
+
+from lxml import etree
+
+from cli_options import pop_flag, pop_option
+from discovery import discover_pairs
+from instrument import log, log_report, new_clock, profile_memory, run_report, setup_logging, write_report
+from laf_diff import laf_digests, relabel_changed
+from ltf_index import fetch_segment, load_index
+from ltf_ranges import byte_ranges, segments_in_range
+from mention_index import MentionIndex
+from parallel import build_manifest, iter_jobs, report_failures, run_jobs, write_manifest
+from pipeline import iter_pipeline
+from serialize import laf_bytes, ltf_bytes, write_bytes
+from run_state import RunState
+from shards import ShardWriter, shard_records
+from split_tools import JOB_NAMES
+from streaming import StreamingLAFDocument, StreamingLTFDocument
+from token_table import TokenTable
+
+
+class Tree(object):
+    """
+    Abstract base class for classes representing annotation documents.
+    Supports both reading from and writing to XML.
+    Inputs
+    ------
+    tree : lxml.etree.ElementTree
+        ElementTree representing the XML document.
+    Attributes
+    ----------
+    xml_version : str
+        XML version of document.
+    doc_type : str
+        XML document type declaration.
+    doc_id : str
+        Document id.
+    lang : lang
+        Document language.
+    """
+    def __init__(self, tree):
+        self.tree = tree
+        self.xml_version = self.tree.docinfo.xml_version
+        self.doc_type = self.tree.docinfo.doctype
+        doc_elem = self.tree.find('//DOC')
+        self.doc_id = doc_elem.get('id')
+        self.lang = doc_elem.get('lang')
+        if self.lang is None:
+            self.lang = ''  # some version can have no lang attribute
+
+    def write_to_file(self, xmlf):
+        """
+        write document to file as XML in the correct format
+        :param xmlf: output file for XML
+        :return:
+        """
+        self.tree.write(xmlf, encoding='utf-8', pretty_print=True, xml_declaration=True)
+
+    def to_bytes(self):
+        """
+        return the bytes write_to_file would write
+        :return: str
+        """
+        xmlf = StringIO.StringIO()
+        self.write_to_file(xmlf)
+        return xmlf.getvalue()
+
+
+class LTFDocument(Tree):
+    """
+    supports reading/writing of LCTL text format (LTF) files.
+     Inputs
+    ------
+    xmlf : str
+        LTF XML file to read.
+    Attributes
+    ----------
+    tree : lxml.etree.ElementTree
+        ElementTree representing the XML document.
+    xml_version : str
+        XML version of document.
+    doc_type : str
+        XML document type declaration.
+    doc_id : str
+        Document id.
+    lang : lang
+        Document language.
+    """
+    def __init__(self, xmlf, segment=None, doc_id=None):
+        def xor(a, b):
+            return a + b == 1
+        assert(xor(xmlf is not None, segment is not None))
+        if not xmlf is None:
+            tree = etree.parse(xmlf)
+        else:
+            base_xml = """<?xml version='1.0' encoding='UTF-8'?>
+                          <!DOCTYPE LCTL_TEXT SYSTEM "ltf.v1.5.dtd">
+                          <LCTL_TEXT/>
+                       """
+            tree = etree.parse(StringIO.StringIO(base_xml))
+            root = tree.getroot()
+
+            # Create and set attributes on doc node.
+            doc = etree.SubElement(root, 'DOC')
+            doc.set('id', doc_id)
+
+            text = etree.SubElement(doc, 'TEXT')
+            seg = etree.SubElement(text, 'SEG')
+            text.replace(seg, segment)
+
+
+        super(LTFDocument, self).__init__(tree)
+        self.xmlf = xmlf
+        self._index = None
+        self._token_table = None
+
+    def segments(self):
+        """Lazily generate segments present in LTF document.
+        Outputs
+        -------
+        segments : lxml.etree.ElementTree generator
+            Generator for segments, each represented by an ElementTree.
+        """
+        for segment in self.tree.xpath('//SEG'):
+            yield segment
+
+    def segment(self, seg_id):
+        """Return one segment by id, seeking to it in the file through the
+        sidecar index (see ltf_index.py) instead of searching the parsed tree.
+        A document built from a single segment has no file, and its segment
+        is looked up in the tree.
+        """
+        if self.xmlf is None:
+            for segment in self.tree.xpath('//SEG[@id=$id]', id=seg_id):
+                return segment
+            raise KeyError(seg_id)
+        if self._index is None:
+            self._index = load_index(self.xmlf)
+        return fetch_segment(self.xmlf, seg_id, self._index)
+
+    def token_table(self):
+        """Tokens of the document as a token_table.TokenTable, built on the first call only."""
+        if self._token_table is None:
+            self._token_table = TokenTable(self.segments())
+        return self._token_table
+
+    def tokenized(self):
+        """Extract tokens.
+        All returned indices assume 0-indexing.
+        Outputs
+        -------
+        tokens : list of str
+            Tokens.
+        token_ids : list of str
+            Token ids.
+        token_onsets : list of int
+            Character onsets of tokens.
+        token_offsets : list of int
+            Character offsets of tokens.
+        """
+        return self.token_table().tokenized()
+
+    def text(self):
+        """Return original text of document.
+        """
+        text = [elem.text for elem in self.tree.xpath('//ORIGINAL_TEXT')]
+        text = u' '.join(text)
+        return text
+
+
+class LAFDocument(Tree):
+    """Supports reading/writing of LCTL annotation format (LAF) files.
+    Inputs
+    ------
+    xmlf : str, optional
+        LAF XML file to read. If not provided, the document will be initialized
+        from supplied mentions.
+    mentions : list of tuples, optional
+        List of mention tuples. For format, see mentions method docstring.
+    lang : str, optional
+        Document language.
+    doc_id : str, optional
+        Document id.
+    Attributes
+    ----------
+    tree : lxml.etree.ElementTree
+        ElementTree representing the XML document.
+    xml_version : str
+        XML version of document.
+    doc_type : str
+        XML document type declaration.
+    doc_id : str
+        Document id.
+    lang : str
+        Document language.
+    """
+    def __init__(self, xmlf=None, mentions=None, lang=None, doc_id=None):
+        def xor(a, b):
+            return a + b == 1
+        assert(xor(xmlf is not None, mentions is not None))
+        if not xmlf is None:
+            tree = etree.parse(xmlf)
+        else:
+            base_xml = """<?xml version='1.0' encoding='UTF-8'?>
+                          <!DOCTYPE LCTL_ANNOTATIONS SYSTEM "laf.v1.2.dtd">
+                          <LCTL_ANNOTATIONS/>
+                       """
+
+            # Create and set attributes on root node.
+            tree = etree.parse(StringIO.StringIO(base_xml))
+            root = tree.getroot()
+            root.set('lang', lang)
+
+            # Create and set attributes on doc node.
+            doc = etree.SubElement(root, 'DOC')
+            doc.set('id', doc_id)
+            doc.set('lang', lang)
+
+            # And for all the mentions.
+            for entity_id, type, extent, start_char, end_char in mentions:
+                # <ANNOTATION>...</ANNOTATION>
+                annotation = etree.SubElement(doc, 'ANNOTATION')
+                annotation.set('id', entity_id)
+                annotation.set('task', 'NE')  # move to constant or arg?
+                annotation.set('type', type)
+                # <EXTENT>...</EXTENT>
+                extent_elem = etree.SubElement(annotation, 'EXTENT')
+                extent_elem.text = extent
+                extent_elem.set('start_char', str(start_char))
+                extent_elem.set('end_char', str(end_char))
+
+        super(LAFDocument, self).__init__(tree)
+
+    def annotations(self):
+        """Lazily generate annotations present in LAF document.
+        Outputs
+        -------
+        annotations : lxml.etree.ElementTree generator
+            Generator for annotations, each represented by an ElementTree.
+        """
+        for annotation in self.tree.xpath('//ANNOTATION'):
+            yield annotation
+    def mentions(self):
+        """Extract mentions.
+        Returns a list of mention tuples, each of the form:
+        (entity_id, tag, extent, start_char, end_char)
+        where entity_id is the entity id, tag the annotation tag,
+        extent the text extent (a string) of the mention in the underlying
+        RSD file, start_char the character onset (0-indexed) of the mention,
+        and end_char the character offset (0-indexed) of the mention.
+        """
+        mentions = []
+        for mention_ in self.tree.xpath('//ANNOTATION'):
+            entity_id = mention_.get('id')
+            type = mention_.get('type')
+            extent = mention_.xpath('EXTENT')[0]
+            start_char = int(extent.get('start_char'))
+            end_char = int(extent.get('end_char'))
+
+            mention = [entity_id,
+                       type,
+                       extent,
+                       start_char,
+                       end_char]
+            mentions.append(mention)
+
+        return mentions
+
+
+def load_doc(xmlf, cls):
+    """Parse xml file and return document.
+    This is a helper function intended to help debugging.
+    Inputs
+    ------
+    xmlf : str
+        XML file to open.
+    cls : Tree class
+        Subclass of Tree.
+    logger : logging.Logger
+        Logger instance.
+    """
+    try:
+        assert(os.path.exists(xmlf))
+        doc = cls(xmlf)
+    except KeyError:
+        doc = None
+    return doc
+
+
+def segment_name(doc_id, seg_id, prefix_doc_id=True):
+    """Name of the files of a segment, doc_id + '_' + seg_id or seg_id alone."""
+    if prefix_doc_id:
+        return doc_id + '_' + seg_id
+    return seg_id
+
+
+def split_segments(segments, doc_id, lang, mentions_of, ltf_split_result_path, laf_split_result_path,
+                   keep_bytes=False, clock=None, prefix_doc_id=True):
+    """Write one ltf and one laf file for each segment.
+
+    Inputs
+    ------
+    segments : iterable of lxml.etree.Element
+        SEG elements of the document.
+    doc_id : str
+        Id of the LTF document.
+    lang : str
+        Language of the LAF document.
+    mentions_of : callable
+        mentions_of(segment) -> mentions [entity_id, type, extent, start_char,
+        end_char] of a segment, e.g. the MentionIndex.segment_mentions of the
+        mentions of the document, or at least of these segments.
+    ltf_split_result_path : str
+        Directory for the segment LTF files.
+    laf_split_result_path : str
+        Directory for the segment LAF files.
+    keep_bytes : bool, optional
+        Return the content of the files instead of writing them, see shards.py.
+    clock : instrument.StageClock, optional
+        Clock the stages are timed on, a new one by default.
+    prefix_doc_id : bool, optional
+        Name the segment files doc_id + '_' + seg_id rather than seg_id, see
+        segment_name.
+
+    Outputs
+    -------
+    summary : dict
+        doc_id, the emitted ltf_files and laf_files, the number of segments,
+        tokens and mentions written, and the seconds spent in each stage
+        (and their peak memory with --profile-memory, see instrument.py).
+        With keep_bytes, also ltf_records and laf_records, lists of
+        (path, bytes).
+    """
+    ltf_files = []
+    laf_files = []
+    ltf_records = []
+    laf_records = []
+    n_mentions = 0
+    n_tokens = 0
+    if clock is None:
+        clock = new_clock()
+    debug = log.isEnabledFor(logging.DEBUG)  # keep string formatting out of the loop
+    j = 0
+    for segment in segments:
+        clock.lap('ltf_parse')  # producing the segment, lazily with --stream
+        if debug:
+            log.debug('j: %d', j)
+        name = segment_name(doc_id, segment.get('id'), prefix_doc_id)
+        ltff = ltf_split_result_path+'/'+name+'.'+'ltf.xml'
+        laff = laf_split_result_path+'/'+name+'.'+'laf.xml'
+        ltf_data = ltf_bytes(name, segment)
+        if ltf_data is None:  # segment without tail, leave the indenting to lxml
+            ltf_data = LTFDocument(xmlf=None, segment=segment, doc_id=name).to_bytes()
+
+        clock.lap('serialize')
+        mentions = mentions_of(segment)
+        n_tokens += len(segment.findall('TOKEN'))
+        clock.lap('assign')
+        if debug:
+            for entity_id, type, extent_text, laf_start_char, laf_end_char in mentions:
+                log.debug('this is ltf_start_char%s', segment.get('start_char'))
+                log.debug('this is ltf_end_char%s', segment.get('end_char'))
+                log.debug('this is laf_start_char%s', laf_start_char)
+                log.debug('this is laf_end_char%s', laf_end_char)
+        laf_data = laf_bytes(name, lang, mentions)
+        clock.lap('serialize')
+        if keep_bytes:
+            ltf_records.append((ltff, ltf_data))
+            laf_records.append((laff, laf_data))
+        else:
+            write_bytes(ltff, ltf_data)  # finish ltf file
+            write_bytes(laff, laf_data)
+        clock.lap('write')
+        ltf_files.append(ltff)
+        laf_files.append(laff)
+        n_mentions += len(mentions)
+        j += 1
+    summary = {'doc_id': doc_id, 'ltf_files': ltf_files, 'laf_files': laf_files, 'mentions': n_mentions,
+               'segments': j, 'tokens': n_tokens}
+    summary.update(clock.summary())
+    if keep_bytes:
+        summary['ltf_records'] = ltf_records
+        summary['laf_records'] = laf_records
+    return summary
+
+
+def load_mentions(laf_path, stream=False):
+    """Load a LAF document and index its mentions, returns (laf_doc, mention_index)."""
+    if stream:
+        laf_doc = load_doc(laf_path, StreamingLAFDocument)
+        mention_index = MentionIndex.from_mentions(laf_doc.iter_mentions())
+    else:
+        laf_doc = load_doc(laf_path, LAFDocument)
+        mention_index = MentionIndex(laf_doc.annotations())  # parse every mention offset once
+    return laf_doc, mention_index
+
+
+def split_pair(ltf_path, laf_path, ltf_split_result_path, laf_split_result_path, stream=False,
+               keep_bytes=False, prefix_doc_id=True):
+    """Split one ltf/laf document pair into one ltf and one laf file per segment.
+
+    Inputs
+    ------
+    ltf_path : str
+        LTF document to split.
+    laf_path : str
+        LAF document holding the mentions of ltf_path.
+    ltf_split_result_path : str
+        Directory for the segment LTF files.
+    laf_split_result_path : str
+        Directory for the segment LAF files.
+    stream : bool, optional
+        Read both documents with iterparse instead of loading whole trees.
+    keep_bytes : bool, optional
+        Return the content of the files instead of writing them.
+    prefix_doc_id : bool, optional
+        See split_segments.
+
+    Outputs
+    -------
+    summary : dict
+        See split_segments, with laf_digests, the laf_diff.laf_digests of
+        the LAF document for the run state.
+    """
+    return split_loaded(read_pair(ltf_path, laf_path, stream), ltf_split_result_path, laf_split_result_path,
+                        keep_bytes, prefix_doc_id)
+
+
+def read_pair(ltf_path, laf_path, stream=False):
+    """Load an ltf/laf document pair, the reading stage of split_pair.
+
+    Outputs
+    -------
+    loaded : tuple
+        (ltf_doc, laf_doc, mention_index, clock), clock holding the parse times.
+    """
+    clock = new_clock()
+    ltf_doc = load_doc(ltf_path, StreamingLTFDocument if stream else LTFDocument)
+    clock.lap('ltf_parse')
+    laf_doc, mention_index = load_mentions(laf_path, stream)
+    clock.lap('laf_parse')
+    return ltf_doc, laf_doc, mention_index, clock
+
+
+def split_loaded(loaded, ltf_split_result_path, laf_split_result_path, keep_bytes=False, prefix_doc_id=True):
+    """Split a pair loaded by read_pair, the rest of split_pair, see pipeline.py."""
+    ltf_doc, laf_doc, mention_index, clock = loaded
+    clock.resume()
+    segments = ltf_doc.segments()   # load the ltf and laf files and the segments in ltf file
+    summary = split_segments(segments, ltf_doc.doc_id, laf_doc.lang, mention_index.segment_mentions,
+                             ltf_split_result_path, laf_split_result_path, keep_bytes, clock, prefix_doc_id)
+    summary['laf_digests'] = laf_digests(laf_doc, mention_index.mentions())
+    return summary
+
+
+def split_range(ltf_path, byte_start, byte_end, doc_id, lang, mention_index,
+                ltf_split_result_path, laf_split_result_path, keep_bytes=False, prefix_doc_id=True):
+    """Split the segments held in a byte range of an LTF document, see ltf_ranges.byte_ranges."""
+    clock = new_clock()
+    segments = segments_in_range(ltf_path, byte_start, byte_end)
+    clock.lap('ltf_parse')
+    return split_segments(segments, doc_id, lang, mention_index.segment_mentions, ltf_split_result_path,
+                          laf_split_result_path, keep_bytes, clock, prefix_doc_id)
+
+
+def split_large_pair(ltf_path, laf_path, ltf_split_result_path, laf_split_result_path, stream=False,
+                     keep_bytes=False, workers=1, chunksize=1, prefix_doc_id=True):
+    """Split one large ltf/laf document pair with its segments spread over a process pool.
+
+    The LTF file is cut into byte ranges on SEG boundaries, each range gets
+    only the mentions lying within its character span, and the per range
+    summaries are merged back in file order, so the files written are the
+    same as with split_pair.
+
+    Outputs
+    -------
+    summary : dict
+        See split_pair.
+    """
+    clock = new_clock()
+    ltf_doc = StreamingLTFDocument(ltf_path)
+    clock.lap('ltf_parse')
+    laf_doc, mention_index = load_mentions(laf_path, stream)
+    clock.lap('laf_parse')
+    jobs = []
+    for byte_start, byte_end, start_char, end_char in byte_ranges(ltf_path, workers * chunksize):
+        jobs.append((ltf_path, byte_start, byte_end, ltf_doc.doc_id, laf_doc.lang,
+                     mention_index.subset(start_char, end_char), ltf_split_result_path, laf_split_result_path,
+                     keep_bytes, prefix_doc_id))
+    clock.lap('ltf_parse')  # scanning the byte ranges
+    summary = {'doc_id': ltf_doc.doc_id, 'ltf_files': [], 'laf_files': [], 'mentions': 0,
+               'segments': 0, 'tokens': 0}
+    if keep_bytes:
+        summary['ltf_records'] = []
+        summary['laf_records'] = []
+    for args, result, error, seconds in run_jobs(split_range, jobs, workers, 1):
+        if error is not None:
+            raise RuntimeError('byte range %d-%d failed\n%s' % (args[1], args[2], error))
+        summary['ltf_files'].extend(result['ltf_files'])
+        summary['laf_files'].extend(result['laf_files'])
+        summary['mentions'] += result['mentions']
+        summary['segments'] += result['segments']
+        summary['tokens'] += result['tokens']
+        clock.merge(result)
+        if keep_bytes:
+            summary['ltf_records'].extend(result['ltf_records'])
+            summary['laf_records'].extend(result['laf_records'])
+    summary.update(clock.summary())
+    summary['laf_digests'] = laf_digests(laf_doc, mention_index.mentions())
+    return summary
+
+
+def main(argv, tool, module, single_dir=False, relabel_prefix=None):
+    """Command line of a split script: split every document pair of the input directories.
+
+    Inputs
+    ------
+    argv : list of str
+        sys.argv of the script, options included.
+    tool : str
+        Name of the script, for the usage and the run state.
+    module : module
+        The script, giving split_pair, read_pair and split_loaded, and
+        split_large_pair when it supports --split-large.
+    single_dir : bool, optional
+        The ltf and laf files come from one input directory.
+    relabel_prefix : bool, optional
+        With --state, rewrite only the affected LAF files of the pairs whose
+        LAF alone changed, see laf_diff.relabel_changed, with this
+        prefix_doc_id. None splits them again, for token anchored mentions.
+    """
+    split_large_pair = getattr(module, 'split_large_pair', None)
+    stream = pop_flag(argv, '--stream')  # iterparse ltf and laf files instead of loading whole trees, see streaming.py
+    workers = pop_option(argv, '--workers', 1, int)  # split documents in a process pool, see parallel.py
+    chunksize = pop_option(argv, '--chunksize', 1, int)
+    manifest_path = pop_option(argv, '--manifest')
+    split_large = None
+    if split_large_pair is not None:
+        split_large = pop_option(argv, '--split-large', None, int)  # bytes, spread bigger ltf files by segment
+    shard_size = pop_option(argv, '--shard-size', None, int)  # bytes, bundle segment files, see shards.py
+    state_path = pop_option(argv, '--state')  # skip pairs an earlier run completed, see run_state.py
+    log_level = pop_option(argv, '--log-level', 'info')  # debug shows every segment and mention
+    stats_path = pop_option(argv, '--stats')  # stage timing report, .json or .prom, see instrument.py
+    memory = pop_flag(argv, '--profile-memory')  # peak rss and top allocations per document
+    stages = pop_flag(argv, '--profile-stages')  # and per stage, probing at every segment, slow
+    pair_cache = pop_option(argv, '--pair-cache')  # skip the directory scan while the dirs are unchanged
+    depth = pop_option(argv, '--pipeline', None, int)  # documents read ahead, files written by threads
+    writers = pop_option(argv, '--writers', 2, int)  # writer threads of --pipeline, see pipeline.py
+    if len(argv) != (4 if single_dir else 5):
+        print 'USAGE: python %s.py [--stream] [--workers N] [--chunksize N] [--manifest file] %s[--shard-size bytes] [--state file] [--log-level level] [--stats file] [--profile-memory] [--profile-stages] [--pair-cache file] [--pipeline depth] [--writers N] %s' % (
+            tool, '' if split_large_pair is None else '[--split-large bytes] ',
+            '<input dir> <ltf_split file> <laf_split file>' if single_dir else '<ltf dir> <laf dir><ltf_split file> <laf_split file>')
+        print 'this script will split LDC ltf and laf document file to sentences, it is suitable for yoruba and tamil'
+        return
+    if single_dir:
+        argv = argv[:2] + argv[1:]
+    ltf_dir = argv[1]
+    laf_dir = argv[2]
+    ltf_split_result_path = argv[3]
+    laf_split_result_path = argv[4]
+    setup_logging(log_level)
+    if (memory or stages) and depth is not None:
+        log.warning('ignoring --pipeline, the peaks of documents read ahead would overlap')
+        depth = None
+    profile_memory(memory or stages, stages)
+    start = time.time()
+    pairs, ltf_orphans, laf_orphans, cached = discover_pairs(ltf_dir, laf_dir, pair_cache)
+    if cached:
+        log.debug('pairs read from %s', pair_cache)
+    for f in ltf_orphans + laf_orphans:
+        log.warning('no matching file for %s', f)
+    ltf_files = [ltf for ltf, laf in pairs]
+    laf_files = [laf for ltf, laf in pairs]
+    log.debug('%s', ltf_files)
+    discovery_seconds = time.time() - start
+    keep_bytes = shard_size is not None
+    jobs = [(ltf_files[k], laf_files[k], ltf_split_result_path, laf_split_result_path, stream, keep_bytes)
+            for k in range(len(ltf_files))]
+    todo = jobs
+    results = []
+    state = None
+    if state_path is not None and keep_bytes:
+        log.warning('ignoring --state, shards are written again on every run')
+    elif state_path is not None:
+        state = RunState(state_path, tool, mentions=relabel_prefix is not None)
+        todo, results, changed = state.split(jobs)
+        if relabel_prefix is not None:
+            relabeled, failed = relabel_changed(state, changed, relabel_prefix, workers, chunksize)  # only the laf changed
+            results.extend(relabeled)
+            redo = set(todo + failed)
+            todo = [job for job in jobs if job in redo]
+    large = set()
+    if split_large is not None:
+        large = set(job for job in todo if os.path.getsize(job[0]) > split_large)
+    if depth is not None and (keep_bytes or workers > 1):
+        log.warning('ignoring --pipeline, it runs in a single process and writes the files itself')
+        depth = None
+    outcomes = iter([])
+    for is_large, group in itertools.groupby(todo, lambda job: job in large):  # outcomes stay in discovery order
+        group = list(group)
+        if is_large:  # one document at a time, its segments spread over the pool
+            group_outcomes = iter_jobs(split_large_pair, [job + (workers, chunksize) for job in group])
+        elif depth is not None:
+            group_outcomes = iter_pipeline(lambda job: module.read_pair(job[0], job[1], job[4]),
+                                           lambda loaded, job: module.split_loaded(loaded, job[2], job[3], True),
+                                           group, depth, writers)
+        else:
+            group_outcomes = iter_jobs(module.split_pair, group, workers, chunksize)
+        outcomes = itertools.chain(outcomes, group_outcomes)
+    if keep_bytes:
+        ltf_shards = ShardWriter(ltf_split_result_path, 'ltf', shard_size)
+        laf_shards = ShardWriter(laf_split_result_path, 'laf', shard_size)
+    for outcome in outcomes:
+        if keep_bytes and outcome[1] is not None:
+            shard_records(outcome[1], ltf_shards, laf_shards)
+        if state is not None and outcome[1] is not None:
+            state.done(outcome[0], outcome[1])
+        results.append(outcome)
+    if keep_bytes:
+        ltf_shards.close()
+        laf_shards.close()
+    if state is not None:
+        state.close()
+    order = dict((job, k) for k, job in enumerate(jobs))
+    results.sort(key=lambda result: order[result[0][:len(JOB_NAMES)]])  # back to discovery order
+    manifest = build_manifest(results, JOB_NAMES)
+    if manifest_path is not None:
+        write_manifest(manifest, manifest_path)
+    report = run_report(results, time.time() - start, discovery_seconds)
+    log_report(report)
+    if stats_path is not None:
+        write_report(report, stats_path)
+    if report_failures(manifest):
+        sys.exit(1)
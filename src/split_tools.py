@@ -0,0 +1,14 @@
+#-*- coding: utf-8 -*-
+import importlib
+
+# tool -> (module whose split_pair runs one document, whether its input is one dir holding both files,
+#          whether its segment files are named doc_id + '_' + seg_id for laf_diff.relabel_changed,
+#          None when its LAF files are not relabeled: transfer_yoruba anchors on tokens)
+SPLIT_TOOLS = {'trans_hau': ('trans_hau', False, True), 'trans_tur': ('trans_tur', False, True),
+               'trans_ben': ('trans_ben', False, False), 'transfer_yoruba': ('transfer_yoruba', True, None)}
+JOB_NAMES = ['ltf', 'laf', 'ltf_split', 'laf_split', 'stream', 'shards']
+
+
+def split_module(tool):
+    """Module of one of SPLIT_TOOLS, imported on first use so that the table does not pull lxml in."""
+    return importlib.import_module(SPLIT_TOOLS[tool][0])
@@ -0,0 +1,213 @@
+#-*- coding: utf-8 -*-
+import collections
+
+from lxml import etree
+
+from ltf_index import fetch_segment, load_index
+from token_table import TokenTable
+
+
+# Compact mention record, holds no reference to the LAF tree. start_attr and end_attr are the
+# start_char and end_char attributes as written in the LAF file, e.g. '007', written back as they were.
+Mention = collections.namedtuple('Mention', ['entity_id', 'type', 'extent', 'start_char', 'end_char',
+                                             'start_token', 'end_token', 'start_attr', 'end_attr'])
+
+
+def _rewind(xmlf):
+    """Seek file objects back to the start so a document can be streamed again."""
+    if hasattr(xmlf, 'seek'):
+        xmlf.seek(0)
+    return xmlf
+
+
+class StreamingLTFDocument(object):
+    """
+    Reads LCTL text format (LTF) files one segment at a time.
+
+    Unlike LTFDocument the whole tree is never held in memory: segments()
+    runs lxml.etree.iterparse over the file and drops every SEG once the
+    caller moves on to the next one, so peak memory depends on the largest
+    segment rather than on the size of the document.
+
+    Inputs
+    ------
+    xmlf : str or file
+        LTF XML file to read.
+
+    Attributes
+    ----------
+    doc_id : str
+        Document id.
+    lang : lang
+        Document language.
+    raw_text_md5 : str
+        raw_text_md5 attribute of the DOC element, None if absent.
+    """
+    def __init__(self, xmlf):
+        self.xmlf = xmlf
+        self.doc_id = None
+        self.lang = ''
+        self.raw_text_md5 = None
+        self._index = None
+        self._token_table = None
+        for event, doc_elem in etree.iterparse(_rewind(xmlf), events=('start',), tag='DOC'):
+            self.doc_id = doc_elem.get('id')
+            self.lang = doc_elem.get('lang')
+            if self.lang is None:
+                self.lang = ''  # some version can have no lang attribute
+            self.raw_text_md5 = doc_elem.get('raw_text_md5')
+            break
+        if self.doc_id is None:
+            raise KeyError('no DOC element in %s' % xmlf)
+
+    def segments(self):
+        """Lazily generate segments present in LTF document.
+
+        A segment is complete, tail included, when it is yielded, and it is
+        cleared as soon as the next one is requested. Copy it (or move it into
+        another tree) to keep it around.
+
+        Outputs
+        -------
+        segments : lxml.etree.Element generator
+            Generator for segments, each represented by an Element.
+        """
+        pending = None
+        for event, elem in etree.iterparse(_rewind(self.xmlf), events=('start', 'end'), tag=('SEG', 'TEXT')):
+            if pending is not None:
+                # the parser moved past the pending segment, so its tail is complete
+                parent = pending.getparent()
+                yield pending
+                if parent is not None and pending.getparent() is parent:
+                    # drop the segment and anything left before it, unless the caller moved it
+                    del parent[:parent.index(pending) + 1]
+                    pending.clear()
+                pending = None
+            if event == 'end' and elem.tag == 'SEG':
+                pending = elem
+        if pending is not None:
+            yield pending
+
+    def segment(self, seg_id):
+        """Return one segment by id, seeking to it through the sidecar index.
+
+        The index is read from xmlf + '.idx' (see ltf_index.py) and written
+        there first when it is missing or out of date. Only the bytes of the
+        segment are parsed.
+        """
+        if self._index is None:
+            self._index = load_index(self.xmlf)
+        return fetch_segment(self.xmlf, seg_id, self._index)
+
+    def token_table(self):
+        """Tokens of the document as a token_table.TokenTable, built on the first call only."""
+        if self._token_table is None:
+            self._token_table = TokenTable(self.segments())
+        return self._token_table
+
+    def tokenized(self):
+        """Extract tokens.
+
+        All returned indices assume 0-indexing.
+
+        Outputs
+        -------
+        tokens : list of str
+            Tokens.
+        token_ids : list of str
+            Token ids.
+        token_onsets : list of int
+            Character onsets of tokens.
+        token_offsets : list of int
+            Character offsets of tokens.
+        """
+        return self.token_table().tokenized()
+
+    def text(self):
+        """Return original text of document.
+        """
+        text = []
+        for seg_ in self.segments():
+            text.extend(elem.text for elem in seg_.xpath('.//ORIGINAL_TEXT'))
+        return u' '.join(text)
+
+
+class StreamingLAFDocument(object):
+    """
+    Reads LCTL annotation format (LAF) files one annotation at a time.
+
+    Every ANNOTATION is turned into a compact Mention record and freed as
+    soon as it has been read, so the records never keep the LAF tree alive
+    the way the EXTENT elements returned by LAFDocument.mentions() do.
+
+    Inputs
+    ------
+    xmlf : str or file
+        LAF XML file to read.
+
+    Attributes
+    ----------
+    doc_id : str
+        Document id.
+    lang : str
+        Document language.
+    """
+    def __init__(self, xmlf):
+        self.xmlf = xmlf
+        self.doc_id = None
+        self.lang = ''
+        for event, doc_elem in etree.iterparse(_rewind(xmlf), events=('start',), tag='DOC'):
+            self.doc_id = doc_elem.get('id')
+            self.lang = doc_elem.get('lang')
+            if self.lang is None:
+                self.lang = ''  # some version can have no lang attribute
+            break
+        if self.doc_id is None:
+            raise KeyError('no DOC element in %s' % xmlf)
+
+    def iter_mentions(self):
+        """Lazily generate the mentions of the LAF document.
+
+        Outputs
+        -------
+        mentions : Mention generator
+            Records (entity_id, type, extent, start_char, end_char, start_token,
+            end_token, start_attr, end_attr) in document order. extent is the
+            text of the EXTENT, offsets are ints and start_attr/end_attr the
+            offset strings of the file, start_token/end_token are None when the
+            annotation is not token anchored.
+        """
+        for event, annotation in etree.iterparse(_rewind(self.xmlf), events=('end',), tag='ANNOTATION'):
+            extent = annotation.find('EXTENT')
+            start_attr = extent.get('start_char')
+            end_attr = extent.get('end_char')
+            yield Mention(annotation.get('id'),
+                          annotation.get('type'),
+                          extent.text,
+                          int(start_attr),
+                          int(end_attr),
+                          annotation.get('start_token'),
+                          annotation.get('end_token'),
+                          start_attr,
+                          end_attr)
+            annotation.clear()
+            while annotation.getprevious() is not None:
+                del annotation.getparent()[0]
+
+    def mentions(self, sort=False):
+        """Extract mentions.
+
+        Inputs
+        ------
+        sort : bool, optional
+            Return the records sorted by (start_char, end_char) instead of in
+            document order, ready to be bisected on start_char.
+
+        Outputs
+        -------
+        mentions : list of Mention
+        """
+        mentions = list(self.iter_mentions())
+        if sort:
+            mentions.sort(key=lambda mention: (mention.start_char, mention.end_char))
+        return mentions
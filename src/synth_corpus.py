@@ -0,0 +1,168 @@
+#-*- coding: utf-8 -*-
+import hashlib
+import os
+import random
+import sys
+
+from cli_options import pop_flag, pop_option
+from serialize import escape_attribute, escape_text
+
+SYLLABLES = [u'ka', u'ri', u'na', u'da', u'ya', u'ba', u'ce', u'mu', u'so', u'te', u'gi', u'lo', u'fa', u'wa',
+             u'ʼya', u'ɗa', u'ƙa']
+TYPES = ['PER', 'ORG', 'LOC', 'GPE', 'TTL']
+SEGMENT_GAP = 2  # characters between segments in the raw text, as in the LDC files
+
+LTF_HEAD = (u'<?xml version="1.0" encoding="UTF-8"?>\n'
+            u'<!DOCTYPE LCTL_TEXT SYSTEM "ltf.v1.5.dtd">\n'
+            u'<LCTL_TEXT>\n'
+            u'<DOC id="%s" tokenization="tokenization_parameters.v2.0" grammar="none" '
+            u'raw_text_char_length="%d" raw_text_md5="%s">\n'
+            u'<TEXT>\n')
+LTF_TAIL = u'</TEXT>\n</DOC>\n</LCTL_TEXT>\n'
+LAF_HEAD = (u'<?xml version="1.0" encoding="UTF-8"?>\n'
+            u'<!DOCTYPE LCTL_ANNOTATIONS SYSTEM "laf.v1.2.dtd">\n'
+            u'<LCTL_ANNOTATIONS lang="%s">\n'
+            u'  <DOC id="%s" lang="%s">\n')
+LAF_TAIL = u'  </DOC>\n</LCTL_ANNOTATIONS>\n'
+
+
+def _escape_text(value):
+    return escape_text(value).decode('utf-8')
+
+
+def _escape_attribute(value):
+    return escape_attribute(value).decode('utf-8')
+
+
+def make_words(rng, n):
+    """n random words, some capitalized and the last one a full stop."""
+    words = []
+    for k in range(n - 1):
+        word = u''.join(rng.choice(SYLLABLES) for i in range(rng.randint(1, 4)))
+        if rng.random() < 0.2:
+            word = word[0].upper() + word[1:]
+        words.append(word)
+    words.append(u'.')
+    return words
+
+
+def make_document(doc_id, segments, tokens, density, rng, lang='HAU', token_anchored=True):
+    """Generate one LTF/LAF document pair.
+
+    Inputs
+    ------
+    doc_id : str
+        Document id.
+    segments : int
+        Number of segments.
+    tokens : int
+        Tokens per segment, at least 1: the last token of a segment is its
+        full stop.
+    density : float
+        Probability that a token starts a mention, mentions span 1 to 3
+        tokens of a segment and never overlap.
+    rng : random.Random
+        Source of randomness, seeded by the caller for reproducible corpora.
+    lang : str, optional
+        Language code written in the LAF document.
+    token_anchored : bool, optional
+        Give every ANNOTATION start_token and end_token attributes, as in the
+        Yoruba data, see transfer_yoruba.py.
+
+    Outputs
+    -------
+    ltf : bytes
+    laf : bytes
+    counts : dict
+        Number of segments, tokens and mentions written.
+    """
+    if tokens < 1:
+        raise ValueError('a segment has at least 1 token, got %d' % tokens)
+    seg_parts = []
+    laf_parts = []
+    raw_text = []
+    offset = 0
+    n_mentions = 0
+    for s in range(segments):
+        words = make_words(rng, tokens)
+        # character offsets of the tokens, end_char inclusive
+        spans = []
+        position = offset
+        for word in words:
+            spans.append((position, position + len(word) - 1))
+            position += len(word) + 1
+        text = u' '.join(words)
+        seg_parts.append(u'<SEG id="segment-%d" start_char="%d" end_char="%d">\n' % (s, offset, offset + len(text) - 1))
+        seg_parts.append(u'<ORIGINAL_TEXT>%s</ORIGINAL_TEXT>\n' % _escape_text(text))
+        for t, word in enumerate(words):
+            seg_parts.append(u'<TOKEN id="token-%d-%d" pos="word" morph="none" start_char="%d" end_char="%d">%s</TOKEN>\n'
+                             % (s, t, spans[t][0], spans[t][1], _escape_text(word)))
+        seg_parts.append(u'</SEG>\n')
+        t = 0
+        while t < len(words) - 1:
+            if rng.random() < density:
+                last = min(t + rng.randint(0, 2), len(words) - 2)
+                n_mentions += 1
+                anchors = u''
+                if token_anchored:
+                    anchors = u' start_token="token-%d-%d" end_token="token-%d-%d"' % (s, t, s, last)
+                laf_parts.append(u'    <ANNOTATION id="%s-ann-%d" task="NE" type="%s"%s>\n'
+                                 u'      <EXTENT start_char="%d" end_char="%d">%s</EXTENT>\n'
+                                 u'    </ANNOTATION>\n'
+                                 % (_escape_attribute(doc_id), n_mentions, rng.choice(TYPES), anchors,
+                                    spans[t][0], spans[last][1], _escape_text(u' '.join(words[t:last + 1]))))
+                t = last + 1
+            else:
+                t += 1
+        raw_text.append(text)
+        offset += len(text) + SEGMENT_GAP
+    raw_text = (u'\n' * SEGMENT_GAP).join(raw_text) + u'\n'
+    md5 = hashlib.md5(raw_text.encode('utf-8')).hexdigest()
+    ltf = LTF_HEAD % (_escape_attribute(doc_id), len(raw_text), md5) + u''.join(seg_parts) + LTF_TAIL
+    laf = (LAF_HEAD % (_escape_attribute(lang), _escape_attribute(doc_id), _escape_attribute(lang))
+           + u''.join(laf_parts) + LAF_TAIL)
+    counts = {'segments': segments, 'tokens': segments * tokens, 'mentions': n_mentions}
+    return ltf.encode('utf-8'), laf.encode('utf-8'), counts
+
+
+def make_corpus(outdir, documents, segments, tokens, density=0.1, seed=0, token_anchored=True):
+    """Write documents LTF/LAF pairs to outdir, both files of a pair side by side.
+
+    The layout suits every split script: pass outdir as both the ltf and the
+    laf directory of trans_hau.py, or as the input dir of transfer_yoruba.py.
+
+    Outputs
+    -------
+    counts : dict
+        Number of documents, segments, tokens and mentions written.
+    """
+    rng = random.Random(seed)
+    if not os.path.isdir(outdir):
+        os.makedirs(outdir)
+    totals = {'documents': documents, 'segments': 0, 'tokens': 0, 'mentions': 0}
+    for d in range(documents):
+        doc_id = 'SYN_%06d' % d
+        ltf, laf, counts = make_document(doc_id, segments, tokens, density, rng, token_anchored=token_anchored)
+        with open(os.path.join(outdir, doc_id + '.ltf.xml'), 'wb') as f:
+            f.write(ltf)
+        with open(os.path.join(outdir, doc_id + '.laf.xml'), 'wb') as f:
+            f.write(laf)
+        for key in counts:
+            totals[key] += counts[key]
+    return totals
+
+if __name__ == '__main__':
+    documents = pop_option(sys.argv, '--documents', 10, int)
+    segments = pop_option(sys.argv, '--segments', 20, int)
+    tokens = pop_option(sys.argv, '--tokens', 20, int)
+    density = pop_option(sys.argv, '--density', 0.1, float)
+    seed = pop_option(sys.argv, '--seed', 0, int)
+    offsets_only = pop_flag(sys.argv, '--offsets-only')  # no start_token/end_token on the annotations
+    if len(sys.argv) != 2 or tokens < 1:
+        if tokens < 1:
+            print '--tokens must be at least 1'
+        print 'USAGE: python synth_corpus.py [--documents N] [--segments N] [--tokens N] [--density p] [--seed N] [--offsets-only] <output dir>'
+        print 'this script will write a synthetic corpus of ltf and laf document pairs'
+    else:
+        totals = make_corpus(sys.argv[1], documents, segments, tokens, density, seed, not offsets_only)
+        print '%(documents)d documents, %(segments)d segments, %(tokens)d tokens, %(mentions)d mentions' % totals
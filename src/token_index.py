@@ -0,0 +1,102 @@
+#-*- coding: utf-8 -*-
+
+
+class TokenIndex(object):
+    """
+    Token id index of an LTF document, built once per document.
+
+    Maps every TOKEN id to the segment holding it and to its character
+    span, so annotations anchored on start_token/end_token resolve without
+    scanning the tokens of every segment.
+
+    Inputs
+    ------
+    segments : iterable of lxml.etree.Element
+        SEG elements, e.g. from LTFDocument.segments().
+
+    Attributes
+    ----------
+    tokens : dict
+        token id -> (segment id, start_char, end_char), offsets kept as the
+        strings found in the LTF file.
+    """
+    def __init__(self, segments):
+        self.tokens = {}
+        for segment in segments:
+            seg_id = segment.get('id')
+            for token_ in segment.xpath('.//TOKEN'):
+                self.tokens[token_.get('id')] = (seg_id, token_.get('start_char'), token_.get('end_char'))
+
+    def __len__(self):
+        return len(self.tokens)
+
+    def resolve(self, start_token, end_token):
+        """Resolve a token anchored span.
+
+        The offsets are compared as integers, and a span of one character
+        (end_char == start_char) is kept. The resolver this index replaced
+        compared the offset strings with end_char > start_char, so it
+        dropped single character spans and spans such as 92..111 whose
+        offsets do not sort as text.
+
+        Inputs
+        ------
+        start_token : str
+            Id of the first token of the span.
+        end_token : str
+            Id of the last token of the span.
+
+        Outputs
+        -------
+        seg_id : str or None
+            Id of the segment owning the span, None if it can not be resolved.
+        start_char : str
+            Character onset of the start token.
+        end_char : str
+            Character offset of the end token.
+        problem : str or None
+            Why the span could not be resolved.
+        """
+        start = self.tokens.get(start_token)
+        end = self.tokens.get(end_token)
+        if start is None:
+            return None, None, None, 'start token %s not found' % start_token
+        if end is None:
+            return None, None, None, 'end token %s not found' % end_token
+        if start[0] != end[0]:
+            return None, start[1], end[2], 'start token in %s, end token in %s' % (start[0], end[0])
+        if int(end[2]) < int(start[1]):
+            return None, start[1], end[2], 'end_char %s before start_char %s' % (end[2], start[1])
+        return start[0], start[1], end[2], None
+
+    def assign(self, annotations):
+        """Group token anchored annotations by their owning segment.
+
+        Inputs
+        ------
+        annotations : iterable of lxml.etree.Element
+            ANNOTATION elements, e.g. from LAFDocument.annotations().
+
+        Outputs
+        -------
+        segment_mentions : dict
+            segment id -> list of mentions [entity_id, type, extent, start_char, end_char]
+            in the order of the LAF document.
+        problems : list of tuples
+            (annotation id, problem) for every annotation that was not assigned.
+        """
+        segment_mentions = {}
+        problems = []
+        for annotation in annotations:
+            seg_id, start_char, end_char, problem = self.resolve(annotation.get('start_token'),
+                                                                 annotation.get('end_token'))
+            if problem is not None:
+                problems.append((annotation.get('id'), problem))
+                continue
+            mention = [annotation.get('id'),
+                       annotation.get('type'),
+                       annotation.xpath('EXTENT')[0].text,
+                       start_char,
+                       end_char]
+            segment_mentions.setdefault(seg_id, []).append(mention)
+        return segment_mentions, problems
@@ -0,0 +1,116 @@
+#-*- coding: utf-8 -*-
+from array import array
+
+MISSING = -1  # onset or offset of a token without start_char or end_char
+INT32 = 'i'
+# bits of TokenTable.present, telling a missing attribute from one holding MISSING or ''
+HAS_ID = 1
+HAS_ONSET = 2
+HAS_OFFSET = 4
+
+
+class TokenTable(object):
+    """
+    Tokens of an LTF document in columns, built in one pass over its segments.
+
+    Offsets are kept in int32 arrays, about 4 bytes a value where a list of
+    int objects takes 32, and the token texts and ids in one string each,
+    cut by an array of boundaries. numpy.frombuffer(table.onsets, 'int32')
+    views a column without copying it.
+
+    Inputs
+    ------
+    segments : iterable of lxml.etree.Element
+        SEG elements, e.g. from LTFDocument.segments().
+
+    Attributes
+    ----------
+    onsets : array.array
+        Character onset of every token, MISSING when the LTF file has none.
+    offsets : array.array
+        Character offset of every token, MISSING when the LTF file has none.
+    present : array.array
+        HAS_ID, HAS_ONSET and HAS_OFFSET of every token, one byte each, set
+        when its TOKEN has the attribute, even as id="" or start_char="-1".
+    segment : array.array
+        Index in seg_ids of the segment of every token.
+    seg_ids : list of str
+        Segment ids in document order.
+    seg_starts : array.array
+        Index of the first token of every segment, and the number of
+        tokens last.
+    text : unicode
+        Token texts one after the other, ' ' for an empty token.
+    text_starts : array.array
+        Where the text of every token starts in text, and len(text) last.
+    ids : unicode
+        Token ids one after the other.
+    id_starts : array.array
+        Same as text_starts for ids.
+    """
+    def __init__(self, segments):
+        self.onsets = array(INT32)
+        self.offsets = array(INT32)
+        self.present = array('B')
+        self.segment = array(INT32)
+        self.seg_ids = []
+        self.seg_starts = array(INT32)
+        self.text_starts = array(INT32)
+        self.id_starts = array(INT32)
+        texts = []
+        ids = []
+        text_length = 0
+        id_length = 0
+        for seg_ in segments:
+            k = len(self.seg_ids)
+            self.seg_ids.append(seg_.get('id'))
+            self.seg_starts.append(len(self.onsets))
+            for token_ in seg_.iter('TOKEN'):
+                text = token_.text
+                if text is None:
+                    text = u' '
+                token_id = token_.get('id')
+                onset = token_.get('start_char')
+                offset = token_.get('end_char')
+                self.onsets.append(MISSING if onset is None else int(onset))
+                self.offsets.append(MISSING if offset is None else int(offset))
+                self.present.append((token_id is not None and HAS_ID) | (onset is not None and HAS_ONSET) |
+                                    (offset is not None and HAS_OFFSET))
+                token_id = token_id or u''
+                self.segment.append(k)
+                self.text_starts.append(text_length)
+                self.id_starts.append(id_length)
+                texts.append(text)
+                ids.append(token_id)
+                text_length += len(text)
+                id_length += len(token_id)
+        self.seg_starts.append(len(self.onsets))
+        self.text_starts.append(text_length)
+        self.id_starts.append(id_length)
+        self.text = u''.join(texts)
+        self.ids = u''.join(ids)
+
+    def __len__(self):
+        return len(self.onsets)
+
+    def token(self, k):
+        """Text of token k."""
+        return self.text[self.text_starts[k]:self.text_starts[k + 1]]
+
+    def token_id(self, k):
+        """Id of token k, u'' when it has none."""
+        return self.ids[self.id_starts[k]:self.id_starts[k + 1]]
+
+    def segment_range(self, s):
+        """(first, past the last) token index of segment s."""
+        return self.seg_starts[s], self.seg_starts[s + 1]
+
+    def tokenized(self):
+        """The columns as LTFDocument.tokenized() returns them: lists, None for missing ids and offsets."""
+        n = len(self)
+        present = self.present
+        tokens = [self.token(k) for k in range(n)]
+        token_ids = [self.token_id(k) if present[k] & HAS_ID else None for k in range(n)]
+        token_onsets = [self.onsets[k] if present[k] & HAS_ONSET else None for k in range(n)]
+        token_offsets = [self.offsets[k] if present[k] & HAS_OFFSET else None for k in range(n)]
+        return tokens, token_ids, token_onsets, token_offsets
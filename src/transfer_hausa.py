@@ -8,6 +8,12 @@ import StringIO
 
 from lxml import etree
 
+from cli_options import pop_option
+from discovery import LAF_SUFFIX, LTF_SUFFIX, list_documents
+from parallel import build_manifest, report_failures, run_jobs, write_manifest
+from serialize import ltf_bytes, write_bytes
+from token_table import TokenTable
+
 
 class Tree(object):
     """
@@ -91,6 +97,7 @@ class LTFDocument(Tree):
 
 
         super(LTFDocument, self).__init__(tree)
+        self._token_table = None
 
     def segments(self):
         """Lazily generate segments present in LTF document.
@@ -102,6 +109,12 @@ class LTFDocument(Tree):
         for segment in self.tree.xpath('//SEG'):
             yield segment
 
+    def token_table(self):
+        """Tokens of the document as a token_table.TokenTable, built on the first call only."""
+        if self._token_table is None:
+            self._token_table = TokenTable(self.segments())
+        return self._token_table
+
     def tokenized(self):
         """Extract tokens.
         All returned indices assume 0-indexing.
@@ -116,20 +129,7 @@ class LTFDocument(Tree):
         token_offsets : list of int
             Character offsets of tokens.
         """
-        tokens = []
-        token_ids = []
-        token_onsets = []
-        token_offsets = []
-        for seg_ in self.segments():
-            for token_ in seg_.xpath('.//TOKEN'):
-                tokens.append(token_.text)
-                token_ids.append(token_.get('id'))
-                token_onsets.append(token_.get('start_char'))
-                token_offsets.append(token_.get('end_char'))
-        tokens = [' ' if token is None else token for token in tokens]
-        token_onsets = [token_onset if token_onset is None else int(token_onset) for token_onset in token_onsets]
-        token_offsets = [token_offset if token_offset is None else int(token_offset) for token_offset in token_offsets]
-        return tokens, token_ids, token_onsets, token_offsets
+        return self.token_table().tokenized()
 
     def text(self):
         """Return original text of document.
@@ -257,51 +257,66 @@ def load_doc(xmlf, cls):
         doc = None
     return doc
 
+
+def split_document(lxf_path, flag, outdir):
+    """Split one ltf or laf document into one file per segment.
+
+    Inputs
+    ------
+    lxf_path : str
+        Document to split.
+    flag : str
+        'ltf' or 'laf', the kind of document.
+    outdir : str
+        Directory for the segment files.
+
+    Outputs
+    -------
+    summary : dict
+        doc_id and the emitted files, under ltf_files or laf_files.
+    """
+    if flag == 'ltf':
+        lxf_doc = load_doc(lxf_path, LTFDocument)
+    elif flag == 'laf':
+        lxf_doc = load_doc(lxf_path, LAFDocument)
+    segments = lxf_doc.segments()   # load the ltf and laf files and the segments in ltf file
+    outputs = []
+    j = 0
+    for segment in segments:
+        doc_id = lxf_doc.doc_id
+        if flag == 'ltf':
+            ltff = outdir+'/'+ doc_id +'_'+segment.get('id')+'.'+'ltf.xml'
+            ltf_data = ltf_bytes(doc_id +'_'+segment.get('id'), segment)
+            if ltf_data is None:  # segment without tail, leave the indenting to lxml
+                ltf_temp = LTFDocument(xmlf=None, segment=segment, doc_id=doc_id +'_'+segment.get('id'))
+                ltf_temp.write_to_file(ltff)
+            else:
+                write_bytes(ltff, ltf_data)
+            outputs.append(ltff)
+        elif flag == 'laf':
+            laff = outdir+'/'+ doc_id +'_'+segment.get('id')+'.'+'laf.xml'
+            laf_temp = LAFDocument(xmlf=None, segment=segment, doc_id= doc_id +'_'+segment.get('id'))
+            laf_temp.write_to_file(laff)
+            outputs.append(laff)
+        j += 1
+    return {'doc_id': lxf_doc.doc_id, flag + '_files': outputs}
+
 if __name__ == '__main__':
+    workers = pop_option(sys.argv, '--workers', 1, int)  # split documents in a process pool, see parallel.py
+    chunksize = pop_option(sys.argv, '--chunksize', 1, int)
+    manifest_path = pop_option(sys.argv, '--manifest')
     if len(sys.argv) != 4:
-        print 'USAGE: python transfer_hausa.py ltf_or_laf <input dir> <output dir>'
+        print 'USAGE: python transfer_hausa.py [--workers N] [--chunksize N] [--manifest file] ltf_or_laf <input dir> <output dir>'
         print 'split document to sentences for hausa and turkeish'
     else:
         flag = sys.argv[1]
         indir = sys.argv[2]
         outdir = sys.argv[3]
-        lxf_files = []
-        for root, dirs, files in os.walk(indir):
-            for f in files:
-                if flag == 'ltf':
-                    if f.find('ltf') > 0:
-                        temp = indir+'/'+f
-                        lxf_files.append(temp)
-                elif flag == 'laf':
-                    if f.find('laf') > 0:
-                        temp = indir+'/'+f
-                        lxf_files.append(temp)
-
-        for k in range(len(lxf_files)):
-            print 'k: ' + str(k)
-            lxf_path = lxf_files[k]
-            if flag == 'ltf':
-                lxf_doc = load_doc(lxf_path, LTFDocument)
-            elif flag == 'laf':
-                lxf_doc = load_doc(lxf_path, LAFDocument)
-            segments = lxf_doc.segments()   # load the ltf and laf files and the segments in ltf file
-            j = 0
-            for segment in segments:
-                doc_id = lxf_doc.doc_id
-                if flag == 'ltf':
-                    ltff = outdir+'/'+ doc_id +'_'+segment.get('id')+'.'+'ltf.xml'
-                    ltf_temp = LTFDocument(xmlf=None, segment=segment, doc_id= doc_id +'_'+segment.get('id'))
-                    ltf_temp.write_to_file(ltff)
-                elif flag == 'laf':
-                    laff = outdir+'/'+ doc_id +'_'+segment.get('id')+'.'+'laf.xml'
-                    laf_temp = LAFDocument(xmlf=None, segment=segment, doc_id= doc_id +'_'+segment.get('id'))
-                    laf_temp.write_to_file(laff)
-
-
-
-                
-
-
-
-
-
+        lxf_files = list_documents(indir, LTF_SUFFIX if flag == 'ltf' else LAF_SUFFIX)
+        jobs = [(lxf_path, flag, outdir) for lxf_path in lxf_files]
+        results = run_jobs(split_document, jobs, workers, chunksize)
+        manifest = build_manifest(results, ['lxf', 'flag', 'outdir'])
+        if manifest_path is not None:
+            write_manifest(manifest, manifest_path)
+        if report_failures(manifest):
+            sys.exit(1)
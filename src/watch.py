@@ -0,0 +1,362 @@
+#-*- coding: utf-8 -*-
+import ctypes
+import ctypes.util
+import errno
+import os
+import select
+import struct
+import sys
+import time
+
+from cli_options import pop_flag, pop_option
+from discovery import LAF_SUFFIX, LTF_SUFFIX, file_names
+from instrument import log, setup_logging
+from laf_diff import relabel_changed
+from parallel import build_manifest, iter_jobs, write_manifest
+from run_state import RunState
+from split_tools import JOB_NAMES, SPLIT_TOOLS, split_module
+
+RETRY_SECONDS = 5.0  # wait before splitting a failed pair again, doubled at every failure
+RETRY_MAX_SECONDS = 600.0
+
+# inotify(7) event masks
+IN_MODIFY = 0x2
+IN_ATTRIB = 0x4
+IN_CLOSE_WRITE = 0x8
+IN_MOVED_FROM = 0x40
+IN_MOVED_TO = 0x80
+IN_CREATE = 0x100
+IN_DELETE = 0x200
+IN_Q_OVERFLOW = 0x4000
+IN_CLOEXEC = 0o2000000
+WATCH_MASK = IN_MODIFY | IN_ATTRIB | IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO | IN_CREATE | IN_DELETE
+EVENT = struct.Struct('iIII')  # wd, mask, cookie, length of the name that follows
+
+
+def doc_id_of(name):
+    """Document id of an LTF or LAF file name, None for other files."""
+    for suffix in (LTF_SUFFIX, LAF_SUFFIX):
+        if name.endswith(suffix):
+            return name[:-len(suffix)]
+    return None
+
+
+class Inotify(object):
+    """
+    Names of the files changing in some directories, from the inotify calls of libc.
+
+    Inputs
+    ------
+    paths : list of str
+        Directories to watch, not recursively.
+
+    Raises OSError when the platform has no inotify.
+    """
+    def __init__(self, paths):
+        name = ctypes.util.find_library('c')
+        if name is None:
+            raise OSError(errno.ENOSYS, 'no libc')
+        libc = ctypes.CDLL(name, use_errno=True)
+        if not hasattr(libc, 'inotify_init1'):
+            raise OSError(errno.ENOSYS, 'no inotify in ' + name)
+        self.fd = libc.inotify_init1(IN_CLOEXEC)
+        if self.fd < 0:
+            raise OSError(ctypes.get_errno(), 'inotify_init1 failed')
+        for path in paths:
+            if libc.inotify_add_watch(self.fd, path, WATCH_MASK) < 0:
+                error = ctypes.get_errno()
+                os.close(self.fd)
+                raise OSError(error, 'cannot watch ' + path)
+
+    def read(self, timeout):
+        """Wait up to timeout seconds for changes.
+
+        Outputs
+        -------
+        names : set of str or None
+            Names of the changed files, empty when nothing changed, None when
+            the kernel dropped events and every file has to be checked.
+        """
+        readable, _, _ = select.select([self.fd], [], [], timeout)
+        if not readable:
+            return set()
+        data = os.read(self.fd, 65536)
+        names = set()
+        k = 0
+        while k + EVENT.size <= len(data):
+            wd, mask, cookie, length = EVENT.unpack_from(data, k)
+            k += EVENT.size
+            if mask & IN_Q_OVERFLOW:
+                return None
+            names.add(data[k:k + length].rstrip('\0'))
+            k += length
+        return names
+
+    def close(self):
+        os.close(self.fd)
+
+
+class PairWatcher(object):
+    """
+    LTF/LAF pairs that appeared or changed and are ready to be split.
+
+    A pair is ready when both of its files are there and neither changed in
+    the last settle seconds, so that files still being copied or written are
+    not split half way; their size and mtime are checked again at every
+    call until they settle. A pair is given once per change of its files,
+    and again after a backoff when its split failed, see failed.
+
+    Inputs
+    ------
+    ltf_dir : str
+    laf_dir : str
+        Can be ltf_dir, the files of a pair telling apart by their suffix.
+    settle : float, optional
+        Seconds without a change before a pair is ready.
+
+    Attributes
+    ----------
+    pending : dict
+        doc_id -> signature of the pairs waiting to settle or to be retried.
+    given : dict
+        doc_id -> signature of the pairs given since they last changed.
+    retry : dict
+        doc_id -> (signature, failures, time of the next try) of the pairs
+        whose split failed.
+    """
+    def __init__(self, ltf_dir, laf_dir, settle=1.0):
+        self.ltf_dir = ltf_dir
+        self.laf_dir = laf_dir
+        self.settle = settle
+        self.pending = {}
+        self.given = {}
+        self.retry = {}
+
+    def _signature(self, doc_id):
+        """(size, mtime) of both files of a pair, None when one is missing."""
+        try:
+            ltf = os.stat(os.path.join(self.ltf_dir, doc_id + LTF_SUFFIX))
+            laf = os.stat(os.path.join(self.laf_dir, doc_id + LAF_SUFFIX))
+        except OSError:
+            return None
+        return ltf.st_size, ltf.st_mtime, laf.st_size, laf.st_mtime
+
+    def all_doc_ids(self):
+        """Ids of every LTF and LAF file in the directories."""
+        names = set(file_names(self.ltf_dir))
+        if self.laf_dir != self.ltf_dir:
+            names.update(file_names(self.laf_dir))
+        return set(doc_id_of(name) for name in names) - set([None])
+
+    def check(self, doc_ids=None, now=None):
+        """Ready pairs among doc_ids and the ones still settling.
+
+        Inputs
+        ------
+        doc_ids : iterable of str, optional
+            Documents whose files changed, every document of the directories
+            when None, as a polling scan does.
+        now : float, optional
+            Current time.
+
+        Outputs
+        -------
+        ready : list of tuples
+            (ltf, laf) paths, sorted by doc_id.
+        """
+        if now is None:
+            now = time.time()
+        if doc_ids is None:
+            doc_ids = self.all_doc_ids()
+        ready = []
+        for doc_id in sorted(set(doc_ids) | set(self.pending)):
+            signature = self._signature(doc_id)
+            retry = self.retry.get(doc_id)
+            if retry is not None and retry[0] != signature:  # changed since it failed, a new split
+                del self.retry[doc_id]
+                retry = None
+            if signature is None:  # half a pair, or removed
+                self.pending.pop(doc_id, None)
+                self.given.pop(doc_id, None)
+            elif signature == self.given.get(doc_id):
+                self.pending.pop(doc_id, None)
+            elif now - max(signature[1], signature[3]) < self.settle or (retry is not None and now < retry[2]):
+                self.pending[doc_id] = signature
+            else:
+                self.pending.pop(doc_id, None)
+                self.given[doc_id] = signature
+                ready.append((os.path.join(self.ltf_dir, doc_id + LTF_SUFFIX),
+                              os.path.join(self.laf_dir, doc_id + LAF_SUFFIX)))
+        return ready
+
+    def failed(self, doc_id, now=None):
+        """Give a pair again once its split failed, after RETRY_SECONDS doubled at every failure.
+
+        A change of its files makes it a new pair, given once it settles.
+        Returns the delay, None when the pair was not given.
+        """
+        if now is None:
+            now = time.time()
+        signature = self.given.pop(doc_id, None)
+        if signature is None:
+            return
+        retry = self.retry.get(doc_id)
+        failures = retry[1] + 1 if retry is not None else 1
+        delay = min(RETRY_SECONDS * 2 ** (failures - 1), RETRY_MAX_SECONDS)
+        self.retry[doc_id] = (signature, failures, now + delay)
+        self.pending[doc_id] = signature
+        return delay
+
+
+def split_ready(tool, jobs, state=None, workers=1):
+    """Split some pairs with a split script, as its main loop would.
+
+    Inputs
+    ------
+    tool : str
+        One of split_tools.SPLIT_TOOLS.
+    jobs : list of tuples
+        (ltf, laf, ltf_split, laf_split, stream, False) job arguments.
+    state : run_state.RunState, optional
+        Skips the pairs split before with the same content, and rewrites only
+        the affected LAF files of the pairs whose LAF alone changed.
+    workers : int, optional
+        See parallel.iter_jobs.
+
+    Outputs
+    -------
+    results : list of tuples
+        (args, summary, error, seconds) for every job.
+    """
+    module = split_module(tool)
+    relabel_prefix = SPLIT_TOOLS[tool][2]
+    todo = jobs
+    results = []
+    if state is not None:
+        todo, results, changed = state.split(jobs)
+        if relabel_prefix is not None:
+            relabeled, failed = relabel_changed(state, changed, relabel_prefix, workers)
+            results.extend(relabeled)
+            todo = todo + failed
+    for outcome in iter_jobs(module.split_pair, todo, workers):
+        if state is not None and outcome[1] is not None:
+            state.done(outcome[0], outcome[1])
+        results.append(outcome)
+    return results
+
+
+def watch(tool, ltf_dir, laf_dir, ltf_split_result_path, laf_split_result_path, stream=False, interval=2.0,
+          settle=1.0, state_path=None, manifest_path=None, workers=1, poll=False, once=False):
+    """Split the pairs of two directories as they arrive or change, until interrupted.
+
+    Changes are noticed through inotify on Linux, as soon as they happen,
+    and by scanning the directories every interval seconds elsewhere or with
+    poll. Every pair is split once it has settled, see PairWatcher, and the
+    manifest is rewritten after every batch with the latest result of every
+    pair seen.
+
+    Inputs
+    ------
+    tool : str
+        One of split_tools.SPLIT_TOOLS.
+    ltf_dir, laf_dir, ltf_split_result_path, laf_split_result_path : str
+        As the split scripts take them, laf_dir being ltf_dir for transfer_yoruba.
+    stream : bool, optional
+        See streaming.py.
+    interval : float, optional
+        Seconds between scans when polling.
+    settle : float, optional
+        See PairWatcher.
+    state_path : str, optional
+        Run state, see run_state.py, to skip the pairs an earlier run split.
+    manifest_path : str, optional
+        Manifest file, see parallel.build_manifest.
+    workers : int, optional
+        See parallel.iter_jobs.
+    poll : bool, optional
+        Scan even where inotify works.
+    once : bool, optional
+        Return once every pair there is split, rather than wait for more.
+
+    Outputs
+    -------
+    results : dict
+        (ltf, laf) -> latest (args, summary, error, seconds), once returned.
+    """
+    watcher = PairWatcher(ltf_dir, laf_dir, settle)
+    state = None
+    if state_path is not None:
+        state = RunState(state_path, tool, mentions=SPLIT_TOOLS[tool][2] is not None)
+    source = None
+    if not poll and not once:
+        try:
+            source = Inotify(sorted(set([ltf_dir, laf_dir])))
+        except OSError as e:
+            log.info('polling every %gs, no inotify: %s', interval, e)
+    results = {}
+    doc_ids = None  # scan everything first
+    try:
+        while True:
+            ready = watcher.check(doc_ids)
+            if ready:
+                start = time.time()
+                jobs = [(ltf, laf, ltf_split_result_path, laf_split_result_path, stream, False) for ltf, laf in ready]
+                batch = split_ready(tool, jobs, state, workers)
+                for outcome in batch:
+                    results[tuple(outcome[0][:2])] = outcome
+                    if outcome[2] is not None:
+                        log.error('failed to split %s:\n%s', outcome[0][0], outcome[2])
+                        if not once:
+                            delay = watcher.failed(doc_id_of(os.path.basename(outcome[0][0])))
+                            if delay is not None:  # None: not given by the watcher, nothing to retry
+                                log.info('retrying %s in %gs', outcome[0][0], delay)
+                    elif outcome[1].get('resumed'):
+                        log.debug('%s unchanged since the last run', outcome[0][0])
+                    else:
+                        log.info('split %s in %.3fs', outcome[0][0], outcome[3])
+                if manifest_path is not None:
+                    manifest = build_manifest([results[key] for key in sorted(results)], JOB_NAMES)
+                    write_manifest(manifest, manifest_path)
+                log.info('%d pairs in %.3fs, %d waiting to settle or retry', len(batch), time.time() - start,
+                         len(watcher.pending))
+            if once and not watcher.pending:
+                return results
+            timeout = settle if watcher.pending else interval
+            if source is None:
+                time.sleep(timeout)
+                doc_ids = None
+            else:
+                names = source.read(timeout if watcher.pending else None)
+                doc_ids = None if names is None else set(doc_id_of(name) for name in names) - set([None])
+    finally:
+        if source is not None:
+            source.close()
+        if state is not None:
+            state.close()
+
+if __name__ == '__main__':
+    tool = pop_option(sys.argv, '--tool', 'trans_hau')  # split script whose split_pair runs, see split_tools.py
+    stream = pop_flag(sys.argv, '--stream')  # iterparse ltf and laf files instead of loading whole trees, see streaming.py
+    workers = pop_option(sys.argv, '--workers', 1, int)  # split a batch of arrived pairs in a process pool
+    interval = pop_option(sys.argv, '--interval', 2.0, float)  # seconds between scans when polling
+    settle = pop_option(sys.argv, '--settle', 1.0, float)  # seconds without a change before a pair is split
+    poll = pop_flag(sys.argv, '--poll')  # scan the directories even where inotify works
+    once = pop_flag(sys.argv, '--once')  # split what is there and exit
+    manifest_path = pop_option(sys.argv, '--manifest')
+    state_path = pop_option(sys.argv, '--state')  # skip pairs an earlier run completed, see run_state.py
+    log_level = pop_option(sys.argv, '--log-level', 'info')
+    single_dir = tool in SPLIT_TOOLS and SPLIT_TOOLS[tool][1]
+    if tool not in SPLIT_TOOLS or len(sys.argv) != (4 if single_dir else 5):
+        print 'USAGE: python watch.py [--tool trans_hau|trans_tur|trans_ben] [--stream] [--workers N] [--interval s] [--settle s] [--poll] [--once] [--manifest file] [--state file] [--log-level level] <ltf dir> <laf dir> <ltf_split dir> <laf_split dir>'
+        print '       python watch.py --tool transfer_yoruba [options] <input dir> <ltf_split dir> <laf_split dir>'
+        print 'this script will split ltf and laf document files as they arrive in the input directories, until interrupted'
+    else:
+        setup_logging(log_level)
+        args = sys.argv[1:]
+        if single_dir:
+            args = [args[0]] + args
+        try:
+            watch(tool, args[0], args[1], args[2], args[3], stream, interval, settle, state_path, manifest_path,
+                  workers, poll, once)
+        except KeyboardInterrupt:
+            pass
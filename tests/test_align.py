@@ -0,0 +1,61 @@
+#-*- coding: utf-8 -*-
+import os
+import random
+import sys
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir, 'src'))
+
+import align
+from align import END_OFF, NO_TOKEN, START_OFF, _align_bisect, align_spans
+from token_table import MISSING
+
+
+def random_tokens(rng, n):
+    """Onsets and offsets of n tokens out of order, some without offsets."""
+    onsets = []
+    offsets = []
+    position = 0
+    for k in range(n):
+        length = rng.randint(1, 5)
+        onsets.append(position)
+        offsets.append(position + length - 1)
+        position += length + rng.randint(0, 2)
+    order = range(n)
+    rng.shuffle(order)
+    onsets = [onsets[k] for k in order]
+    offsets = [offsets[k] for k in order]
+    for k in rng.sample(range(n), n // 10):
+        if rng.random() < 0.5:
+            onsets[k] = None
+        else:
+            offsets[k] = MISSING
+    return onsets, offsets, position
+
+
+class AlignTest(unittest.TestCase):
+    def test_flags(self):
+        onsets = [0, 4, 9]
+        offsets = [2, 7, 11]
+        positions, first, last, flags = _align_bisect(onsets, offsets, [0, 5, 3, 20, 0], [7, 11, 3, 25, 11])
+        self.assertEqual(list(positions), [0, 1, 2])
+        self.assertEqual(list(first), [0, 1, -1, -1, 0])
+        self.assertEqual(list(last), [1, 2, -1, -1, 2])
+        self.assertEqual(list(flags), [0, START_OFF, NO_TOKEN, NO_TOKEN, 0])
+
+    @unittest.skipIf(align.numpy is None, 'numpy is not installed')
+    def test_numpy_as_bisect(self):
+        rng = random.Random(0)
+        for n in [0, 1, 5, 200]:
+            onsets, offsets, length = random_tokens(rng, n)
+            starts = [rng.randint(0, length + 2) for k in range(300)]
+            ends = [start + rng.randint(-1, 8) for start in starts]
+            expected = _align_bisect(onsets, offsets, starts, ends)
+            got = align_spans(onsets, offsets, starts, ends)
+            for column, value in zip(expected, got):
+                self.assertEqual(list(column), [int(v) for v in value])
+            self.assertTrue(n == 0 or any(flag & END_OFF for flag in expected[3]))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,52 @@
+#-*- coding: utf-8 -*-
+import os
+import sys
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir, 'src'))
+
+import instrument
+from instrument import MemoryClock, run_report
+
+
+class MemoryClockTest(unittest.TestCase):
+    def setUp(self):
+        self.resets = 0
+        self.reset_peak_rss = instrument.reset_peak_rss
+
+        def count_reset():
+            self.resets += 1
+            return True
+        instrument.reset_peak_rss = count_reset
+
+    def tearDown(self):
+        instrument.reset_peak_rss = self.reset_peak_rss
+
+    def split(self, clock, segments=20):
+        for k in range(segments):
+            for stage in ['ltf_parse', 'assign', 'serialize', 'write']:
+                clock.lap(stage)
+        return clock.summary()
+
+    def test_reset_once_per_document(self):
+        summary = self.split(MemoryClock())
+        self.assertEqual(self.resets, 1)
+        self.assertTrue(summary['memory']['peak'] > 0)
+        self.assertFalse('peak_kb' in summary['memory'])
+
+    def test_stages(self):
+        summary = self.split(MemoryClock(stages=True))
+        self.assertEqual(self.resets, 1 + 20 * 4)
+        self.assertTrue(summary['memory']['peak_kb']['assign'] > 0)
+        self.assertEqual(summary['memory']['peak'], max(summary['memory']['peak_kb'].values()))
+
+    def test_report(self):
+        results = [(None, dict(self.split(MemoryClock(stages)), doc_id='D%d' % stages), None, 0.0)
+                   for stages in [False, True]]
+        report = run_report(results, 1.0)
+        self.assertTrue(report['memory']['peak_kb']['write'] > 0)
+        self.assertTrue(report['memory']['largest'][0] in ['D0', 'D1'])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,63 @@
+#-*- coding: utf-8 -*-
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir, 'src'))
+
+from materialize import SAME, materialize, place_file
+
+
+class MaterializeTest(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp()
+        self.src = self.write('src', 'content')
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp)
+
+    def write(self, name, data):
+        path = os.path.join(self.tmp, name)
+        with open(path, 'w') as f:
+            f.write(data)
+        return path
+
+    def read(self, path):
+        with open(path) as f:
+            return f.read()
+
+    def test_same_file_is_kept(self):
+        for mode in ('copy', 'hardlink', 'symlink', 'clone'):
+            self.assertEqual(place_file(self.src, self.src, mode), SAME)
+            self.assertEqual(self.read(self.src), 'content')
+
+    def test_existing_hardlink_is_kept(self):
+        dst = os.path.join(self.tmp, 'dst')
+        os.link(self.src, dst)
+        self.assertEqual(place_file(self.src, dst, 'copy'), SAME)
+        self.assertEqual(self.read(self.src), 'content')
+
+    def test_symlink_into_the_source_is_replaced(self):
+        dst = os.path.join(self.tmp, 'dst')
+        os.symlink(self.src, dst)
+        self.assertEqual(place_file(self.src, dst, 'copy'), 'copy')
+        self.assertFalse(os.path.islink(dst))
+        self.assertEqual(self.read(self.src), 'content')
+
+    def test_duplicate_destinations_place_the_last_source(self):
+        other = self.write('other', 'other content')
+        dst = os.path.join(self.tmp, 'dst')
+        for mode in ('copy', 'hardlink'):
+            summary = materialize([(self.src, dst), (other, dst)] * 20, mode, threads=8)
+            self.assertEqual((summary['failed'], summary['duplicates']), ([], 39))
+            self.assertEqual(self.read(dst), 'other content')
+
+    def test_placing_into_the_split_dir(self):
+        summary = materialize([(self.src, self.src)], 'copy', threads=1)
+        self.assertEqual(summary['placed'][SAME], 1)
+        self.assertEqual(self.read(self.src), 'content')
+
+if __name__ == '__main__':
+    unittest.main()
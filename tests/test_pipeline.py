@@ -0,0 +1,71 @@
+#-*- coding: utf-8 -*-
+import os
+import random
+import shutil
+import sys
+import tempfile
+import time
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir, 'src'))
+
+import pipeline
+from pipeline import iter_pipeline
+
+
+class PipelineTest(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp()
+        self.batch = pipeline.WRITE_BATCH
+        self.write_bytes = pipeline.write_bytes
+
+    def tearDown(self):
+        pipeline.WRITE_BATCH = self.batch
+        pipeline.write_bytes = self.write_bytes
+        shutil.rmtree(self.tmp)
+
+    def run_jobs(self, jobs, files, writers=4, delay=0.0):
+        def read(job):
+            time.sleep(delay * (job % 3))
+            return job
+
+        def split(loaded, job):
+            records = [(os.path.join(self.tmp, name), data % job) for name, data in files]
+            return {'ltf_records': records, 'laf_records': [], 'job': job}
+        return list(iter_pipeline(read, split, jobs, depth=2, writers=writers))
+
+    def test_job_order(self):
+        jobs = range(20)
+        outcomes = self.run_jobs(jobs, [('%d' % k, '%%d-%d' % k) for k in range(10)], delay=0.01)
+        self.assertEqual([outcome[0] for outcome in outcomes], jobs)
+        self.assertEqual([outcome[1]['job'] for outcome in outcomes], jobs)
+        self.assertTrue(all(outcome[2] is None for outcome in outcomes))
+
+    def test_last_document_wins(self):
+        # every document writes the same names, as trans_ben.py does for colliding segment ids
+        pipeline.WRITE_BATCH = 1
+        rng = random.Random(0)
+
+        def slow_write(path, data):
+            time.sleep(rng.random() * 0.005)
+            self.write_bytes(path, data)
+        pipeline.write_bytes = slow_write
+        names = ['seg%d.xml' % k for k in range(3)]
+        self.run_jobs(range(40), [(name, name + ' of %d') for name in names], writers=8)
+        for name in names:
+            with open(os.path.join(self.tmp, name)) as f:
+                self.assertEqual(f.read(), name + ' of 39')
+
+    def test_read_error(self):
+        def read(job):
+            if job == 1:
+                raise ValueError('bad document')
+            return job
+        outcomes = list(iter_pipeline(read, lambda loaded, job: {'ltf_records': [], 'laf_records': []}, [0, 1, 2]))
+        self.assertEqual([outcome[0] for outcome in outcomes], [0, 1, 2])
+        self.assertTrue('bad document' in outcomes[1][2])
+        self.assertEqual(outcomes[1][1], None)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,102 @@
+#-*- coding: utf-8 -*-
+import filecmp
+import os
+import re
+import shutil
+import sys
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir, 'src'))
+
+from instrument import run_report
+from laf_diff import relabel_changed
+from run_state import RunState
+from synth_corpus import make_corpus
+import trans_hau
+
+
+class RelabelTest(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp()
+        self.indir = os.path.join(self.tmp, 'in')
+        make_corpus(self.indir, 2, 6, 10, density=0.5)
+        self.ltf = os.path.join(self.indir, 'SYN_000001.ltf.xml')
+        self.laf = os.path.join(self.indir, 'SYN_000001.laf.xml')
+        self.state_path = os.path.join(self.tmp, 'state')
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp)
+
+    def outdirs(self, name):
+        ltf_out = os.path.join(self.tmp, name + '_ltf')
+        laf_out = os.path.join(self.tmp, name + '_laf')
+        os.makedirs(ltf_out)
+        os.makedirs(laf_out)
+        return ltf_out, laf_out
+
+    def split(self, state, job):
+        todo, resumed, changed = state.split([job])
+        for args in todo:
+            state.done(args, trans_hau.split_pair(*args))
+        return todo, resumed, changed
+
+    def test_done_keeps_digests_out_of_the_summary(self):
+        ltf_out, laf_out = self.outdirs('out')
+        job = (self.ltf, self.laf, ltf_out, laf_out, False, False)
+        state = RunState(self.state_path, 'trans_hau', mentions=True)
+        state.split([job])
+        summary = trans_hau.split_pair(*job)
+        self.assertIn('laf_digests', summary)
+        state.done(job, summary)
+        state.close()
+        record = RunState(self.state_path, 'trans_hau', mentions=True).records[state.key(job)]
+        self.assertNotIn('laf_digests', record['summary'])
+        self.assertEqual(record['laf_digests']['doc'], ['SYN_000001', 'HAU'])
+        self.assertEqual(len(record['laf_digests']['mentions']), summary['mentions'])
+        self.assertEqual(len(record['laf_digests']['mentions'][0]), 4)  # id, digest and offsets, no mention text
+
+    def change_laf(self, change):
+        """Split the pair with a run state, change its LAF file, and relabel it."""
+        ltf_out, laf_out = self.outdirs('out')
+        job = (self.ltf, self.laf, ltf_out, laf_out, False, False)
+        state = RunState(self.state_path, 'trans_hau', mentions=True)
+        self.split(state, job)
+        with open(self.laf) as f:
+            laf = f.read()
+        with open(self.laf, 'w') as f:
+            f.write(change(laf))
+        os.utime(self.laf, (0, 0))  # a new mtime, whatever the clock resolution
+        todo, resumed, changed = state.split([job])
+        self.assertEqual((todo, len(changed)), ([], 1))
+        results, failed = relabel_changed(state, changed, True)
+        return job, results, failed
+
+    def assert_as_new_split(self, laf_out):
+        ref_ltf, ref_laf = self.outdirs('ref')
+        trans_hau.split_pair(self.ltf, self.laf, ref_ltf, ref_laf)
+        match, mismatch, errors = filecmp.cmpfiles(ref_laf, laf_out, os.listdir(ref_laf), shallow=False)
+        self.assertEqual((mismatch, errors), ([], []))
+
+    def test_relabel_matches_a_new_split_and_leaves_the_input_alone(self):
+        inputs = sorted(os.listdir(self.indir))
+        job, results, failed = self.change_laf(lambda laf: re.sub(r'type="\w+"', 'type="XYZ"', laf, count=1))
+        self.assertEqual(failed, [])
+        self.assertEqual(sorted(os.listdir(self.indir)), inputs)
+        report = run_report(results, 1.0)
+        self.assertEqual((report['relabeled'], report['counts']['documents']), (1, 0))
+        self.assert_as_new_split(job[3])
+
+    def test_doc_attributes_changed(self):
+        job, results, failed = self.change_laf(lambda laf: laf.replace('lang="HAU"', 'lang="hau"'))
+        self.assertEqual((results, failed), ([], [job]))
+
+    def test_mentions_reordered(self):
+        def swap(laf):
+            annotations = re.findall(r'    <ANNOTATION .*?</ANNOTATION>\n', laf, re.S)
+            return laf.replace(annotations[0] + annotations[1], annotations[1] + annotations[0])
+        job, results, failed = self.change_laf(swap)
+        self.assertEqual((results, failed), ([], [job]))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,57 @@
+#-*- coding: utf-8 -*-
+import copy
+import os
+import sys
+import unittest
+
+from lxml import etree
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir, 'src'))
+
+from serialize import laf_bytes, ltf_bytes
+from split_driver import LAFDocument, LTFDocument
+
+LTF = u'''<?xml version='1.0' encoding='UTF-8'?>
+<LCTL_TEXT><DOC id="D" lang="yor"><TEXT>
+<SEG id="segment-0" start_char="0" end_char="17" note="ọ̀nà &amp; &lt;&quot;x&quot; 'y'">
+<ORIGINAL_TEXT>Ọ̀nà &amp; &lt;b&gt; "c" 'd'</ORIGINAL_TEXT>
+<TOKEN id="token-0-0" start_char="0" end_char="2" pos="ọ̀">Ọ̀nà</TOKEN>
+<TOKEN id="token-0-1" start_char="4" end_char="4">&amp;</TOKEN>
+</SEG>
+<SEG id="segment-1" start_char="19" end_char="20"><ORIGINAL_TEXT>ab</ORIGINAL_TEXT></SEG>
+</TEXT></DOC></LCTL_TEXT>
+'''.encode('utf-8')
+
+MENTIONS = [
+    (u'ọ̀-1', u'PER', u'Ọ̀nà', 0, 2),
+    ('m&2', 'L<OC', '&amp; <b> "c"', 4, 4),
+    ('m"3', "O'RG", u"'d' ẹ", 17, 17),
+    ('m4', 'GPE', None, 5, 6),
+    ('m5', 'GPE', '', 7, 8),
+]
+
+
+class SerializeTest(unittest.TestCase):
+    def segments(self):
+        return etree.fromstring(LTF).xpath('//SEG')
+
+    def test_ltf_as_document(self):
+        for segment in self.segments():
+            data = ltf_bytes(u'D_ọ̀ & "<x>"', segment)
+            document = LTFDocument(xmlf=None, segment=copy.deepcopy(segment), doc_id=u'D_ọ̀ & "<x>"')
+            self.assertEqual(data, document.to_bytes())
+
+    def test_ltf_without_tail(self):
+        segment = self.segments()[-1]
+        segment.tail = None
+        self.assertIsNone(ltf_bytes('D', segment))
+
+    def test_laf_as_document(self):
+        for mentions in [MENTIONS, MENTIONS[3:], []]:
+            data = laf_bytes(u'D_ọ̀ & "<x>"', u"yọ'r", mentions)
+            document = LAFDocument(mentions=mentions, lang=u"yọ'r", doc_id=u'D_ọ̀ & "<x>"')
+            self.assertEqual(data, document.to_bytes())
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,75 @@
+#-*- coding: utf-8 -*-
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir, 'src'))
+
+from shards import ShardReader, ShardWriter, shard_records
+from split_driver import main
+from synth_corpus import make_corpus
+import trans_ben
+import trans_hau
+
+
+class ShardTest(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp)
+
+    def test_repeated_keys_keep_every_record(self):
+        with ShardWriter(self.tmp, 'laf', max_bytes=8) as writer:
+            writer.add('segment-0', 'first document')
+            writer.add('segment-1', 'other')
+            writer.add('segment-0', 'second document')
+        reader = ShardReader(self.tmp, 'laf')
+        self.assertEqual(list(reader), [('segment-0', 'first document'), ('segment-1', 'other'),
+                                        ('segment-0', 'second document')])
+        self.assertEqual(len(reader), 3)
+        self.assertEqual(reader.keys(), ['segment-0', 'segment-1', 'segment-0'])
+        self.assertEqual(reader.get('segment-0'), 'second document')
+
+    def test_summary_points_at_the_shards(self):
+        summary = {'ltf_files': ['out/d_s.ltf.xml'], 'laf_files': ['out/d_s.laf.xml'],
+                   'ltf_records': [('out/d_s.ltf.xml', 'ltf')], 'laf_records': [('out/d_s.laf.xml', 'laf')]}
+        with ShardWriter(self.tmp, 'ltf') as ltf_shards:
+            with ShardWriter(self.tmp, 'laf') as laf_shards:
+                shard_records(summary, ltf_shards, laf_shards)
+        self.assertEqual(summary, {'ltf_files': [os.path.join(self.tmp, 'ltf-00000.shard') + '@0'],
+                                   'laf_files': [os.path.join(self.tmp, 'laf-00000.shard') + '@0']})
+
+    def split_sharded(self, module, tool, split_large=False):
+        indir = os.path.join(self.tmp, 'in')
+        ltf_out = os.path.join(self.tmp, 'ltf')
+        laf_out = os.path.join(self.tmp, 'laf')
+        for path in (ltf_out, laf_out):
+            os.makedirs(path)
+        make_corpus(indir, 4, 3, 5, density=0.5)
+        make_corpus(os.path.join(self.tmp, 'large'), 2, 30, 5, density=0.5)
+        for suffix in ('.ltf.xml', '.laf.xml'):  # the second document only goes over --split-large
+            shutil.copy(os.path.join(self.tmp, 'large', 'SYN_000001' + suffix), indir)
+        options = []
+        if split_large:
+            options = ['--split-large', str(2 * os.path.getsize(os.path.join(indir, 'SYN_000000.ltf.xml')))]
+        main([tool + '.py', '--shard-size', '100000', '--log-level', 'error'] + options +
+             [indir, indir, ltf_out, laf_out], tool, module, relabel_prefix=module.PREFIX_DOC_ID)
+        return ShardReader(ltf_out, 'ltf')
+
+    def test_shards_follow_discovery_order_with_split_large(self):
+        reader = self.split_sharded(trans_hau, 'trans_hau', split_large=True)
+        doc_ids = [key.split('_segment')[0] for key in reader.keys()]
+        self.assertEqual(doc_ids, sorted(doc_ids))
+        self.assertEqual(len(reader), 3 + 30 + 3 + 3)
+
+    def test_colliding_segment_names(self):
+        reader = self.split_sharded(trans_ben, 'trans_ben')
+        self.assertEqual(len(reader), 39)
+        self.assertEqual(len(set(reader.keys())), 30)
+        self.assertEqual(len(set(data for key, data in reader)), 39)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,75 @@
+#-*- coding: utf-8 -*-
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+
+from lxml import etree
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir, 'src'))
+
+from split_driver import LTFDocument
+from streaming import StreamingLAFDocument
+import trans_hau
+
+LTF = b'''<?xml version='1.0' encoding='UTF-8'?>
+<LCTL_TEXT><DOC id="D" lang="hau"><TEXT>
+<SEG id="segment-0" start_char="0" end_char="20">
+<ORIGINAL_TEXT>abc defg hij</ORIGINAL_TEXT>
+<TOKEN id="token-0-0" start_char="0" end_char="2">abc</TOKEN>
+<TOKEN id="token-0-1" start_char="4" end_char="7">defg</TOKEN>
+<TOKEN id="token-0-2" start_char="9" end_char="11">hij</TOKEN>
+</SEG>
+</TEXT></DOC></LCTL_TEXT>
+'''
+
+LAF = b'''<?xml version='1.0' encoding='UTF-8'?>
+<LCTL_ANNOTATIONS lang="hau"><DOC id="D" lang="hau">
+<ANNOTATION id="m0" type="PER"><EXTENT start_char="004" end_char="07">defg</EXTENT></ANNOTATION>
+<ANNOTATION id="m1" type="LOC"><EXTENT start_char="9" end_char="+11">hij</EXTENT></ANNOTATION>
+</DOC></LCTL_ANNOTATIONS>
+'''
+
+
+class StreamingTest(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp()
+        self.ltf = self.write('D.ltf.xml', LTF)
+        self.laf = self.write('D.laf.xml', LAF)
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp)
+
+    def write(self, name, data):
+        path = os.path.join(self.tmp, name)
+        with open(path, 'wb') as f:
+            f.write(data)
+        return path
+
+    def split(self, stream):
+        out = os.path.join(self.tmp, 'stream' if stream else 'tree')
+        os.mkdir(out)
+        trans_hau.split_pair(self.ltf, self.laf, out, out, stream)
+        with open(os.path.join(out, 'D_segment-0.laf.xml'), 'rb') as f:
+            return f.read()
+
+    def test_offsets_kept(self):
+        mentions = StreamingLAFDocument(self.laf).mentions()
+        self.assertEqual([(m.start_char, m.end_char) for m in mentions], [(4, 7), (9, 11)])
+        self.assertEqual([(m.start_attr, m.end_attr) for m in mentions], [('004', '07'), ('9', '+11')])
+
+    def test_segment_by_id(self):
+        doc = LTFDocument(self.ltf)
+        segment = doc.segment('segment-0')
+        self.assertEqual(etree.tostring(segment), etree.tostring(next(doc.segments())))
+        self.assertTrue(os.path.exists(self.ltf + '.idx'))
+
+    def test_stream_as_tree(self):
+        tree = self.split(False)
+        self.assertTrue(b'start_char="004"' in tree)
+        self.assertEqual(self.split(True), tree)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,27 @@
+#-*- coding: utf-8 -*-
+import os
+import random
+import sys
+import unittest
+
+from lxml import etree
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir, 'src'))
+
+from synth_corpus import make_document
+
+
+class SynthCorpusTest(unittest.TestCase):
+    def test_counts(self):
+        for tokens in [1, 2, 7]:
+            ltf, laf, counts = make_document('D', 3, tokens, 0.5, random.Random(0))
+            self.assertEqual(counts['tokens'], 3 * tokens)
+            self.assertEqual(len(etree.fromstring(ltf).findall('.//TOKEN')), 3 * tokens)
+            self.assertEqual(len(etree.fromstring(laf).findall('.//ANNOTATION')), counts['mentions'])
+
+    def test_no_token(self):
+        self.assertRaises(ValueError, make_document, 'D', 3, 0, 0.5, random.Random(0))
+
+
+if __name__ == '__main__':
+    unittest.main()
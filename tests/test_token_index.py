@@ -0,0 +1,41 @@
+#-*- coding: utf-8 -*-
+import os
+import sys
+import unittest
+
+from lxml import etree
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir, 'src'))
+
+from token_index import TokenIndex
+
+LTF = b'''<LCTL_TEXT><DOC id="D"><TEXT>
+<SEG id="s0" start_char="0" end_char="111">
+<TOKEN id="t0" start_char="0" end_char="0">a</TOKEN>
+<TOKEN id="t1" start_char="92" end_char="95">bcde</TOKEN>
+<TOKEN id="t2" start_char="97" end_char="111">fghijklmnopqrst</TOKEN>
+</SEG>
+<SEG id="s1" start_char="113" end_char="120">
+<TOKEN id="t3" start_char="113" end_char="120">uvwxyzab</TOKEN>
+</SEG>
+</TEXT></DOC></LCTL_TEXT>'''
+
+
+class TokenIndexTest(unittest.TestCase):
+    def setUp(self):
+        self.index = TokenIndex(etree.fromstring(LTF).findall('.//SEG'))
+
+    def test_resolve(self):
+        self.assertEqual(len(self.index), 4)
+        self.assertEqual(self.index.resolve('t1', 't2'), ('s0', '92', '111', None))  # not in text order
+        self.assertEqual(self.index.resolve('t0', 't0'), ('s0', '0', '0', None))  # one character
+
+    def test_problems(self):
+        self.assertEqual(self.index.resolve('t9', 't0')[0], None)
+        self.assertEqual(self.index.resolve('t0', 't9')[3], 'end token t9 not found')
+        self.assertEqual(self.index.resolve('t2', 't3'), (None, '97', '120', 'start token in s0, end token in s1'))
+        self.assertEqual(self.index.resolve('t2', 't1')[3], 'end_char 95 before start_char 97')
+
+
+if __name__ == '__main__':
+    unittest.main()
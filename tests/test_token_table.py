@@ -0,0 +1,62 @@
+#-*- coding: utf-8 -*-
+import os
+import sys
+import unittest
+
+from lxml import etree
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir, 'src'))
+
+from token_table import MISSING, TokenTable
+
+LTF = b'''<LCTL_TEXT><DOC id="D"><TEXT>
+<SEG id="s0" start_char="0" end_char="20">
+<TOKEN id="t0" start_char="0" end_char="2">ab</TOKEN>
+<TOKEN id="" start_char="-1" end_char="-1">cd</TOKEN>
+<TOKEN start_char="4">\xc3\xa9f</TOKEN>
+<TOKEN id="t3" end_char="9"></TOKEN>
+</SEG>
+<SEG id="s1" start_char="21" end_char="30">
+<TOKEN id="t4" start_char="21" end_char="23">gh</TOKEN>
+</SEG>
+</TEXT></DOC></LCTL_TEXT>'''
+
+
+def baseline_tokenized(segments):
+    """LTFDocument.tokenized() before TokenTable."""
+    tokens, token_ids, token_onsets, token_offsets = [], [], [], []
+    for seg_ in segments:
+        for token_ in seg_.xpath('.//TOKEN'):
+            tokens.append(' ' if token_.text is None else token_.text)
+            token_ids.append(token_.get('id'))
+            onset = token_.get('start_char')
+            offset = token_.get('end_char')
+            token_onsets.append(onset if onset is None else int(onset))
+            token_offsets.append(offset if offset is None else int(offset))
+    return tokens, token_ids, token_onsets, token_offsets
+
+
+class TokenTableTest(unittest.TestCase):
+    def setUp(self):
+        self.segments = etree.fromstring(LTF).findall('.//SEG')
+        self.table = TokenTable(self.segments)
+
+    def test_tokenized(self):
+        self.assertEqual(self.table.tokenized(), baseline_tokenized(self.segments))
+        tokens, token_ids, token_onsets, token_offsets = self.table.tokenized()
+        self.assertEqual(token_ids[1:4], [u'', None, u't3'])
+        self.assertEqual(token_onsets[1:4], [-1, 4, None])
+        self.assertEqual(token_offsets[1:4], [-1, None, 9])
+
+    def test_columns(self):
+        self.assertEqual(len(self.table), 5)
+        self.assertEqual(list(self.table.onsets), [0, MISSING, 4, MISSING, 21])
+        self.assertEqual(self.table.token(2), u'\xe9f')
+        self.assertEqual(self.table.token(3), u' ')
+        self.assertEqual(self.table.token_id(2), u'')
+        self.assertEqual(self.table.seg_ids, ['s0', 's1'])
+        self.assertEqual(self.table.segment_range(1), (4, 5))
+
+
+if __name__ == '__main__':
+    unittest.main()
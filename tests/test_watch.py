@@ -0,0 +1,82 @@
+#-*- coding: utf-8 -*-
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir, 'src'))
+
+from watch import RETRY_SECONDS, PairWatcher
+
+
+class PairWatcherTest(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp()
+        self.watcher = PairWatcher(self.tmp, self.tmp, settle=1.0)
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp)
+
+    def write(self, name, data, mtime):
+        path = os.path.join(self.tmp, name)
+        with open(path, 'w') as f:
+            f.write(data)
+        os.utime(path, (mtime, mtime))
+        return path
+
+    def pair(self, doc_id, mtime, data='x'):
+        return (self.write(doc_id + '.ltf.xml', data, mtime), self.write(doc_id + '.laf.xml', data, mtime))
+
+    def test_settle(self):
+        pair = self.pair('A', 100.0)
+        self.write('B.ltf.xml', 'x', 100.0)  # half a pair
+        self.assertEqual(self.watcher.check(now=100.5), [])
+        self.assertEqual(self.watcher.pending.keys(), ['A'])
+        self.assertEqual(self.watcher.check(now=101.5), [pair])
+        self.assertEqual(self.watcher.check(now=102.0), [])
+        self.assertEqual(self.watcher.pending, {})
+
+    def test_changed(self):
+        pair = self.pair('A', 100.0)
+        self.assertEqual(self.watcher.check(now=200.0), [pair])
+        self.pair('A', 300.0, 'changed')
+        self.assertEqual(self.watcher.check(['A'], now=300.5), [])
+        self.assertEqual(self.watcher.check([], now=301.5), [pair])
+
+    def test_removed(self):
+        pair = self.pair('A', 100.0)
+        self.assertEqual(self.watcher.check(now=200.0), [pair])
+        os.remove(pair[1])
+        self.assertEqual(self.watcher.check(['A'], now=201.0), [])
+        self.write('A.laf.xml', 'x', 100.0)  # back as it was, a new pair
+        self.assertEqual(self.watcher.check(['A'], now=202.0), [pair])
+
+    def test_failed_retried(self):
+        pair = self.pair('A', 100.0)
+        self.assertEqual(self.watcher.check(now=200.0), [pair])
+        self.assertEqual(self.watcher.failed('A', now=200.0), RETRY_SECONDS)
+        self.assertEqual(self.watcher.check([], now=200.0 + RETRY_SECONDS / 2), [])
+        self.assertEqual(self.watcher.check([], now=200.0 + RETRY_SECONDS), [pair])
+        self.assertEqual(self.watcher.failed('A', now=300.0), 2 * RETRY_SECONDS)
+        self.assertEqual(self.watcher.check([], now=300.0 + RETRY_SECONDS), [])
+        self.assertEqual(self.watcher.check([], now=300.0 + 2 * RETRY_SECONDS), [pair])
+        self.assertEqual(self.watcher.check([], now=400.0), [])
+
+    def test_failed_not_given(self):
+        self.pair('A', 100.0)
+        self.assertIsNone(self.watcher.failed('A', now=200.0))
+        self.assertEqual(self.watcher.retry, {})
+        self.assertEqual(self.watcher.pending, {})
+
+    def test_failed_then_changed(self):
+        pair = self.pair('A', 100.0)
+        self.assertEqual(self.watcher.check(now=200.0), [pair])
+        self.watcher.failed('A', now=200.0)
+        self.pair('A', 200.0, 'fixed')
+        self.assertEqual(self.watcher.check(['A'], now=201.5), [pair])
+        self.assertEqual(self.watcher.retry, {})
+
+
+if __name__ == '__main__':
+    unittest.main()